@@ -0,0 +1,88 @@
+"""Shared setup for the benchmark scripts: a bare app on a scratch database,
+bulk seeding of users and alumni, and timing helpers.
+
+Run the scripts from the api/ directory, e.g. ``python benchmarks/search_bench.py``.
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from src.models.user import User, UserRole, UserStatus, db  # noqa: E402
+from src.models.alumni import Alumni  # noqa: E402
+# Every model, so the mappers and foreign keys resolve as they do in src.index
+from src.models import (  # noqa: E402,F401
+    background_task, donation, event, institution, invite_token, job, message, stats, student
+)
+
+FIRST_NAMES = ['john', 'maria', 'wei', 'ahmed', 'olga', 'pedro', 'aisha', 'kenji', 'fatima', 'liam', 'sofia', 'raj']
+LAST_NAMES = ['smith', 'garcia', 'chen', 'khan', 'ivanova', 'silva', 'okafor', 'tanaka', 'muller', 'novak']
+COMPANIES = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Stark Industries', 'Wayne Enterprises', 'Cyberdyne']
+POSITIONS = ['Software Engineer', 'Data Scientist', 'Product Manager', 'Designer', 'Consultant', 'Analyst']
+DEPARTMENTS = ['Computer Science', 'Economics', 'Mechanical Engineering', 'Biology', 'History', 'Mathematics']
+SKILLS = ['python', 'sql', 'java', 'react', 'excel', 'leadership', 'statistics', 'go', 'rust', 'figma']
+
+SEED_BATCH = 10000
+
+
+def make_app(database_url=None):
+    """A Flask app with the models' tables on ``database_url`` (default: a new SQLite file)"""
+    if database_url is None:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench-'), 'bench.db')}"
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def alumni_count():
+    return db.session.query(db.func.count(Alumni.id)).scalar()
+
+
+def seed_alumni(total, seed=42):
+    """Bulk insert users with alumni profiles until there are ``total``.
+
+    Core inserts, so no ORM hooks run: search indexes must be rebuilt by
+    the caller. Returns the number of rows added.
+    """
+    start = alumni_count()
+    rng = random.Random(seed + start)
+    now = time.strftime('%Y-%m-%d %H:%M:%S')
+    for offset in range(start, total, SEED_BATCH):
+        stop = min(offset + SEED_BATCH, total)
+        users, alumni = [], []
+        for n in range(offset, stop):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            users.append({
+                'id': n + 1, 'username': f'bench{n}', 'email': f'bench{n}@example.edu',
+                'role': UserRole.ALUMNI, 'status': UserStatus.ACTIVE, 'first_name': first, 'last_name': last
+            })
+            alumni.append({
+                'id': n + 1, 'user_id': n + 1, 'first_name': f'{first}{n % 997}', 'last_name': last,
+                'graduation_year': 1980 + n % 45, 'department': rng.choice(DEPARTMENTS),
+                'current_company': rng.choice(COMPANIES), 'current_position': rng.choice(POSITIONS),
+                'location': 'Springfield', 'bio': f'{first} {last} works at {rng.choice(COMPANIES)}',
+                'skills': rng.sample(SKILLS, 3), 'profile_completeness': rng.randrange(101),
+                'networking_score': rng.randrange(100), 'is_mentor': n % 7 == 0,
+            })
+        db.session.execute(User.__table__.insert(), users)
+        db.session.execute(Alumni.__table__.insert(), alumni)
+        db.session.commit()
+    return total - start
+
+
+def timed(function, repeat=5):
+    """Median wall time of ``function()`` over ``repeat`` runs, in ms, and its last result"""
+    times, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times), result
@@ -0,0 +1,134 @@
+"""Bulk import: wall time and peak memory for 10k/100k/1M-row uploads.
+
+Generates alumni upload files, then imports each one in its own process
+the way import_batch_task does: open_rows() streams the file in
+READ_CHUNK-row chunks through clean_and_validate_data() and run_import(),
+which writes the invite tokens (no mail is queued). Reports wall time,
+rows per second and peak RSS over the process's RSS before the import.
+
+    python benchmarks/import_bench.py --rows 10000 100000 1000000
+    python benchmarks/import_bench.py --rows 10000 --format xlsx
+    python benchmarks/import_bench.py generate --rows 50000 --out alumni.csv
+"""
+import argparse
+import csv
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import COMPANIES, DEPARTMENTS, FIRST_NAMES, LAST_NAMES, POSITIONS, SKILLS
+
+COLUMNS = ['first_name', 'last_name', 'email', 'graduation_year', 'department', 'degree_type', 'major',
+           'current_company', 'current_position', 'location', 'skills']
+# One row in this many is invalid (no email), so the error path is exercised too
+INVALID_EVERY = 100
+
+
+def generate_rows(count, seed=42):
+    rng = random.Random(seed)
+    for n in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield [
+            first.title(), last.title(), '' if n % INVALID_EVERY == 0 else f'{first}.{last}.{n}@example.edu',
+            1980 + n % 45, rng.choice(DEPARTMENTS), 'BSc', rng.choice(DEPARTMENTS), rng.choice(COMPANIES),
+            rng.choice(POSITIONS), 'Springfield', ', '.join(rng.sample(SKILLS, 3))
+        ]
+
+
+def generate(path, count):
+    if path.endswith('.xlsx'):
+        from openpyxl import Workbook
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(COLUMNS)
+        for row in generate_rows(count):
+            sheet.append(row)
+        workbook.save(path)
+    else:
+        with open(path, 'w', newline='') as stream:
+            writer = csv.writer(stream)
+            writer.writerow(COLUMNS)
+            writer.writerows(generate_rows(count))
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+
+
+def import_file(path, database_url):
+    """Import ``path`` into a fresh database; prints one result line"""
+    from common import make_app
+    from src.models.institution import DataUploadBatch, Institution
+    from src.models.user import User, UserRole, UserStatus, db
+    from src.routes.data_import import PANDAS_AVAILABLE, clean_and_validate_data
+    from src.utils.import_engine import READ_CHUNK, run_import
+    from src.utils.import_readers import open_rows
+
+    app = make_app(database_url)
+    with app.app_context():
+        institution = Institution(name='Bench University', code='BENCH', email_domain='example.edu',
+                                  admin_email='admin@example.edu')
+        admin = User(username='bench-admin', email='admin@example.edu', role=UserRole.INSTITUTION_ADMIN,
+                     status=UserStatus.ACTIVE)
+        db.session.add_all([institution, admin])
+        db.session.flush()
+        batch = DataUploadBatch(institution_id=institution.id, batch_type='alumni',
+                                filename=os.path.basename(path), uploaded_by=admin.id)
+        db.session.add(batch)
+        db.session.commit()
+
+        seen_emails = set()
+        baseline = peak_rss_mb()
+        started = time.perf_counter()
+        with open(path, 'rb') as stream:
+            reader = open_rows(stream, path)
+            result = run_import(
+                batch,
+                reader.frames(READ_CHUNK) if PANDAS_AVAILABLE else reader.chunks(READ_CHUNK),
+                lambda chunk: clean_and_validate_data(chunk, 'alumni', seen_emails),
+                'alumni',
+                created_by=admin.id
+            )
+        elapsed = time.perf_counter() - started
+        rows = result.successful + result.failed
+        print(f'{rows:>9}  {os.path.splitext(path)[1][1:]:<6}{elapsed:>9.1f}{rows / elapsed:>10.0f}'
+              f'{peak_rss_mb() - baseline:>+12.1f}{result.successful:>10}{result.failed:>8}', flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', nargs='?', default='bench', choices=['bench', 'generate', 'import'])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--format', choices=['csv', 'xlsx'], default='csv')
+    parser.add_argument('--out', help='file to write (generate) or read (import)')
+    parser.add_argument('--database', help='SQLAlchemy URL of an empty database (default: a new SQLite file each)')
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        generate(args.out, args.rows[0])
+        return
+    if args.command == 'import':
+        import_file(args.out, args.database)
+        return
+
+    workdir = tempfile.mkdtemp(prefix='import-bench-')
+    print(f"{'rows':>9}  {'format':<6}{'wall s':>9}{'rows/s':>10}{'peak RSS MB':>12}{'imported':>10}{'failed':>8}")
+    for count in args.rows:
+        path = os.path.join(workdir, f'alumni-{count}.{args.format}')
+        generate(path, count)
+        # One process per file, so each peak RSS is that import's alone
+        command = [sys.executable, os.path.abspath(__file__), 'import', '--out', path]
+        if args.database:
+            command += ['--database', args.database]
+        subprocess.run(command, check=True)
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
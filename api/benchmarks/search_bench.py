@@ -0,0 +1,68 @@
+"""Alumni search: the LIKE fallback against the database's full-text engine.
+
+Seeds N alumni (cumulatively, smallest N first) and times a ranked top-50
+search for a few terms with LikeSearchBackend and with the engine the app
+would pick for the database: SQLite FTS5, or tsvector + pg_trgm on
+PostgreSQL. Only ids are fetched, so the times are the search itself.
+
+    python benchmarks/search_bench.py --rows 10000 100000 1000000
+    python benchmarks/search_bench.py --database postgresql://user@host/db
+
+Use an empty database: the script creates tables and fills them.
+"""
+import argparse
+
+from common import alumni_count, make_app, seed_alumni, timed
+from sqlalchemy import text
+from src.models.alumni import Alumni
+from src.models.user import db
+from src.utils.alumni_search import LikeSearchBackend, PostgresSearchBackend, SqliteFtsSearchBackend
+
+# A surname, a full name, a skill, company + role, and a misspelt first name
+TERMS = ['garcia', 'maria garcia', 'python', 'acme engineer', 'mraia']
+LIMIT = 50
+
+
+def engine_backend(connection):
+    if connection.dialect.name == 'postgresql':
+        backend = PostgresSearchBackend()
+        backend.install(connection)
+        connection.execute(text('ANALYZE alumni'))
+    else:
+        backend = SqliteFtsSearchBackend()
+        backend.install(connection)
+        backend.rebuild(connection)
+    return backend
+
+
+def search(backend, term):
+    query = backend.apply(db.session.query(Alumni.id), term, ranked=True).limit(LIMIT)
+    rows = query.all()
+    db.session.commit()  # ends the transaction, as a request would
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--database', help='SQLAlchemy URL of an empty database (default: a new SQLite file)')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = make_app(args.database)
+    with app.app_context():
+        print(f'{db.engine.dialect.name}, top {LIMIT}, median of {args.repeat}')
+        print(f"{'rows':>9}  {'term':<16}{'like ms':>10}{'engine ms':>11}{'like hits':>11}{'engine hits':>13}")
+        like = LikeSearchBackend()
+        for rows in sorted(args.rows):
+            seed_alumni(rows)
+            with db.engine.begin() as connection:
+                backend = engine_backend(connection)
+            for term in TERMS:
+                like_ms, like_hits = timed(lambda: search(like, term), args.repeat)
+                engine_ms, engine_hits = timed(lambda: search(backend, term), args.repeat)
+                print(f'{alumni_count():>9}  {term:<16}{like_ms:>10.1f}{engine_ms:>11.1f}{like_hits:>11}{engine_hits:>13}')
+
+
+if __name__ == '__main__':
+    main()
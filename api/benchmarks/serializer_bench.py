@@ -0,0 +1,67 @@
+"""Alumni list serialisation: to_dict() + the stdlib JSON provider against
+the compiled serialiser + FastJSONProvider (orjson).
+
+Seeds N alumni and times each path in three phases: loading the rows
+through the ORM (the compiled path with its load_only()), building the
+dicts, and encoding the response body. The two bodies are checked to decode
+to the same document.
+
+    python benchmarks/serializer_bench.py --rows 100000
+"""
+import argparse
+import json
+import time
+
+from common import make_app, seed_alumni
+from flask.json.provider import DefaultJSONProvider
+from src.models.alumni import Alumni
+from src.models.user import db
+from src.utils.serializers import ALUMNI_SERIALIZER, ORJSON_AVAILABLE, FastJSONProvider
+
+
+def run(load, serialize, provider):
+    """Time one path; returns (load, serialize, encode) seconds and the body"""
+    db.session.expunge_all()
+    started = time.perf_counter()
+    rows = load()
+    loaded = time.perf_counter()
+    payload = {'success': True, 'alumni': serialize(rows)}
+    serialized = time.perf_counter()
+    body = provider.response(payload).get_data()
+    encoded = time.perf_counter()
+    db.session.commit()
+    return (loaded - started, serialized - loaded, encoded - serialized), body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--database', help='SQLAlchemy URL of an empty database (default: a new SQLite file)')
+    args = parser.parse_args()
+
+    app = make_app(args.database)
+    with app.app_context(), app.test_request_context():
+        seed_alumni(args.rows)
+        compiled = ALUMNI_SERIALIZER.compile()
+
+        before, old_body = run(
+            lambda: Alumni.query.all(),
+            lambda rows: [row.to_dict() for row in rows],
+            DefaultJSONProvider(app))
+        after, new_body = run(
+            lambda: Alumni.query.options(compiled.load_only()).all(),
+            compiled.many,
+            FastJSONProvider(app))
+
+        if json.loads(old_body) != json.loads(new_body):
+            raise SystemExit('compiled serialiser output differs from to_dict()')
+
+        print(f'{args.rows} alumni on {db.engine.dialect.name}, orjson {"on" if ORJSON_AVAILABLE else "off"}')
+        print(f"{'path':<28}{'load s':>9}{'serialize s':>13}{'encode s':>10}{'body MB':>9}")
+        for name, (load, serialize, encode), body in (
+                ('to_dict + stdlib json', before, old_body), ('compiled + FastJSONProvider', after, new_body)):
+            print(f'{name:<28}{load:>9.2f}{serialize:>13.2f}{encode:>10.2f}{len(body) / 2 ** 20:>9.1f}')
+
+
+if __name__ == '__main__':
+    main()
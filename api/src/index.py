@@ -3,6 +3,10 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
+import tempfile
+import threading
+import time
+import click
 from flask import Flask, session
 from flask_cors import CORS
 from flask_socketio import SocketIO, join_room, leave_room, emit, disconnect
@@ -13,9 +17,11 @@ from src.models.invite_token import InviteToken, EmailVerification
 from src.models.alumni import Alumni, AlumniExperience
 from src.models.student import Student, StudentAchievement
 from src.models.event import Event, EventRegistration
-from src.models.message import Message, ForumPost
+from src.models.message import Message, ForumPost, Conversation, ConversationParticipant
 from src.models.job import Job, JobApplication
 from src.models.donation import Donation, DonationCampaign
+from src.models.stats import StatCounter
+from src.models.background_task import BackgroundTask
 
 # Import all blueprints
 from src.routes.user import user_bp
@@ -29,6 +35,16 @@ from src.routes.institutions import institutions_bp
 from src.routes.account_creation import account_creation_bp
 from src.routes.data_import import data_import_bp
 from src.routes.alumni_claim import alumni_claim_bp
+from src.utils.alumni_search import init_alumni_search
+from src.utils.activity_tracker import init_activity_tracker
+from src.utils.dashboard_stats import recompute_stats
+from src.utils.donation_queue import get_donation_queue, init_donation_queue
+from src.utils.metrics import init_metrics
+from src.utils.http_cache import init_http_cache
+from src.utils.schema_upgrades import upgrade_schema
+from src.utils.serializers import init_serializers
+from src.utils.task_queue import get_task_queue, init_task_queue
+from src.utils.principal_cache import current_principal, get_principal_cache, init_principal_cache, touch_last_active
 
 app = Flask(__name__)
 
@@ -93,7 +109,7 @@ if postgres_url:
 else:
     # Use SQLite for local development with optimizations
     basedir = os.path.abspath(os.path.dirname(__file__))
-    db_path = os.path.join(basedir, "alumni.db")
+    db_path = os.environ.get('SQLITE_PATH', os.path.join(basedir, "alumni.db"))
     app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}?timeout=20'
     
     # SQLite optimizations
@@ -106,6 +122,11 @@ else:
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SQLALCHEMY_RECORD_QUERIES'] = os.environ.get('FLASK_DEBUG', 'False').lower() == 'true'
 
+# Alumni search engine: auto (by database dialect), postgres, sqlite_fts, memory or like
+app.config['ALUMNI_SEARCH_BACKEND'] = os.environ.get('ALUMNI_SEARCH_BACKEND', 'auto')
+# Rebuild interval for the in-memory index, to pick up other workers' writes (0 = never)
+app.config['ALUMNI_SEARCH_REFRESH_SECONDS'] = int(os.environ.get('ALUMNI_SEARCH_REFRESH_SECONDS', '0'))
+
 db.init_app(app)
 # --- END OF DATABASE CONFIGURATION ---
 
@@ -122,10 +143,58 @@ app.register_blueprint(account_creation_bp, url_prefix='/api')
 app.register_blueprint(data_import_bp, url_prefix='/api')
 app.register_blueprint(alumni_claim_bp, url_prefix='/alumni-claim')
 
+# orjson-backed JSON responses when available (before init_metrics, which keeps this provider)
+init_serializers(app)
+
+# Per-endpoint latency, query count, DB and serialisation time, served at /metrics
+app.config['SLOW_REQUEST_MS'] = int(os.environ.get('SLOW_REQUEST_MS', '1000'))
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+init_metrics(app, db)
+
+# Signed-in user snapshots shared by the auth decorators and Socket.IO handlers
+app.config['PRINCIPAL_CACHE_TTL_SECONDS'] = int(os.environ.get('PRINCIPAL_CACHE_TTL_SECONDS', '30'))
+app.config['PRINCIPAL_CACHE_SIZE'] = int(os.environ.get('PRINCIPAL_CACHE_SIZE', '10000'))
+init_principal_cache(app)
+
+# Write-behind last_active/last_login; 0 writes through, as Vercel freezes idle processes
+app.config['ACTIVITY_FLUSH_SECONDS'] = float(
+    os.environ.get('ACTIVITY_FLUSH_SECONDS', '0' if os.environ.get('VERCEL') else '10')
+)
+init_activity_tracker(app)
+
+# Donations: 'direct' commits each one, 'buffered' journals locally and commits in batches
+app.config['DONATION_INGEST_MODE'] = os.environ.get('DONATION_INGEST_MODE', 'direct')
+app.config['DONATION_QUEUE_PATH'] = os.environ.get(
+    'DONATION_QUEUE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'donation_queue.db')
+)
+app.config['DONATION_BATCH_SIZE'] = int(os.environ.get('DONATION_BATCH_SIZE', '500'))
+app.config['DONATION_FLUSH_SECONDS'] = float(os.environ.get('DONATION_FLUSH_SECONDS', '1'))
+init_donation_queue(app)
+
+# Background tasks (data imports, invitation mail): 'threads' runs workers in each web
+# process, 'inline' in the enqueuing request (Vercel), 'external' only via `flask run-tasks`
+app.config['TASK_QUEUE_MODE'] = os.environ.get('TASK_QUEUE_MODE', 'inline' if os.environ.get('VERCEL') else 'threads')
+app.config['TASK_WORKERS'] = int(os.environ.get('TASK_WORKERS', '2'))
+app.config['TASK_POLL_SECONDS'] = float(os.environ.get('TASK_POLL_SECONDS', '2'))
+app.config['TASK_LEASE_SECONDS'] = int(os.environ.get('TASK_LEASE_SECONDS', '300'))
+# Uploaded import files, kept for the import task and retries; must be shared by all workers
+# (Vercel can only write to /tmp, which does not outlive the instance)
+app.config['IMPORT_UPLOAD_DIR'] = os.environ.get('IMPORT_UPLOAD_DIR', os.path.join(
+    tempfile.gettempdir() if os.environ.get('VERCEL') else os.path.dirname(os.path.abspath(__file__)), 'uploads'
+))
+init_task_queue(app)
+
+# ETags for read-mostly endpoints; seconds a table fingerprint is reused before re-reading it
+app.config['HTTP_CACHE_FINGERPRINT_TTL'] = float(os.environ.get('HTTP_CACHE_FINGERPRINT_TTL', '2'))
+init_http_cache(app, db)
+
 # Create database tables within app context
 with app.app_context():
     try:
         db.create_all()
+        # create_all never alters existing tables; add columns and indexes models gained since
+        upgrade_schema()
+        init_alumni_search(app)
         
         # Create super admin user if it doesn't exist
         super_admin = User.query.filter_by(role=UserRole.SUPER_ADMIN).first()
@@ -156,6 +225,89 @@ with app.app_context():
         print(f"Database initialization error: {e}")
         # Don't fail completely, but log the error
 
+# --- CLI commands ---
+@app.cli.command('backfill-conversations')
+def backfill_conversations_command():
+    """Rebuild conversation summaries from existing messages"""
+    created = Conversation.backfill()
+    print(f"Backfilled {created} conversations")
+
+@app.cli.command('reconcile-event-counts')
+def reconcile_event_counts_command():
+    """Recount event registrations and repair drifted counters"""
+    corrected = Event.reconcile_registration_counts()
+    print(f"Corrected registration counts on {corrected} events")
+
+@app.cli.command('recompute-profile-completeness')
+def recompute_profile_completeness_command():
+    """Recompute alumni profile completeness, e.g. after a bulk import"""
+    changed = Alumni.recompute_profile_completeness()
+    print(f"Updated profile completeness on {changed} alumni")
+    rescored = Alumni.refresh_networking_scores()
+    print(f"Updated networking score on {rescored} alumni")
+
+@app.cli.command('refresh-networking-scores')
+def refresh_networking_scores_command():
+    """Nightly: recompute alumni networking scores so the recency bonus decays"""
+    rescored = Alumni.refresh_networking_scores()
+    print(f"Updated networking score on {rescored} alumni")
+
+@app.cli.command('recompute-stats')
+def recompute_stats_command():
+    """Rebuild the dashboard counters, e.g. after bulk SQL writes"""
+    written = recompute_stats()
+    print(f"Rebuilt {written} dashboard counters")
+
+@app.cli.command('flush-donations')
+def flush_donations_command():
+    """Commit everything waiting in the buffered donation queue"""
+    queue = get_donation_queue()
+    if queue is None:
+        print("DONATION_INGEST_MODE is not 'buffered'; nothing to flush")
+        return
+    inserted = queue.flush()
+    print(f"Committed {inserted} queued donations; queue stats: {queue.stats()}")
+
+@app.cli.command('run-tasks')
+@click.option('--workers', default=1, show_default=True, help='Worker threads in this process')
+@click.option('--once', is_flag=True, help='Run whatever is due, then exit (e.g. from cron)')
+def run_tasks_command(workers, once):
+    """Run background tasks (imports, invitation mail) until interrupted"""
+    queue = get_task_queue()
+    if once:
+        ran = queue.run_pending()
+        print(f"Ran {ran} background tasks; queue stats: {queue.stats()}")
+        return
+
+    stop = threading.Event()
+
+    def work(name):
+        with app.app_context():
+            try:
+                queue.work(queue.worker_id(name), stop=stop)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=work, args=(f'cli-{n}',), daemon=True) for n in range(workers)]
+    for thread in threads:
+        thread.start()
+    print(f"Running background tasks with {workers} workers; Ctrl+C to stop")
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Stopping after the tasks in progress")
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+@app.cli.command('prune-tasks')
+@click.option('--days', default=7, show_default=True, help='Keep tasks that finished more recently than this')
+def prune_tasks_command(days):
+    """Delete finished background tasks older than --days"""
+    deleted = get_task_queue().prune(days)
+    print(f"Deleted {deleted} finished background tasks")
+
 # --- Socket.IO Events ---
 @socketio.on('connect')
 def handle_connect(auth):
@@ -167,13 +319,13 @@ def handle_connect(auth):
         return False
     
     # Verify user exists and is active
-    user = User.query.get(user_id)
+    user = current_principal()
     if not user or user.status != UserStatus.ACTIVE:
         disconnect()
         return False
     
     # Update user's last active time
-    user.update_last_active()
+    touch_last_active(user)
     
     emit('connected', {
         'message': 'Connected to WebSocket',
@@ -188,7 +340,7 @@ def on_join(data):
     if not user_id:
         return
     
-    user = User.query.get(user_id)
+    user = current_principal()
     if not user or user.status != UserStatus.ACTIVE:
         return
     
@@ -204,7 +356,7 @@ def on_join(data):
                 return  # User not part of this conversation
         
         join_room(room)
-        user.update_last_active()
+        touch_last_active(user)
         emit('joined', {'room': room}, room=room)
 
 @socketio.on('leave')
@@ -226,7 +378,7 @@ def on_typing(data):
     if not user_id:
         return
     
-    user = User.query.get(user_id)
+    user = current_principal()
     if not user or user.status != UserStatus.ACTIVE:
         return
     
@@ -243,7 +395,7 @@ def handle_message(data):
     if not user_id:
         return
     
-    user = User.query.get(user_id)
+    user = current_principal()
     if not user or user.status != UserStatus.ACTIVE:
         return
     
@@ -256,7 +408,7 @@ def handle_message(data):
         return
     
     # Validate recipient exists and user can message them
-    recipient = User.query.get(recipient_id)
+    recipient = get_principal_cache().get(recipient_id)
     if not recipient:
         emit('error', {'message': 'Recipient not found'})
         return
@@ -275,10 +427,11 @@ def handle_message(data):
             message_type='direct'
         )
         db.session.add(msg)
+        Conversation.record_message(msg)
         db.session.commit()
         
         # Update user activity
-        user.update_last_active()
+        touch_last_active(user)
         
         payload = {
             'id': msg.id,
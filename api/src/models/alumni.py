@@ -1,9 +1,28 @@
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from datetime import datetime, timedelta
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 from src.models.user import db
 
+# Profile fields counted towards profile_completeness
+COMPLETENESS_FIELDS = [
+    'first_name', 'last_name', 'graduation_year', 'department', 'current_position',
+    'current_company', 'location', 'bio', 'skills', 'linkedin_url', 'profile_image'
+]
+
+# Fields feeding networking_score besides profile_completeness
+NETWORKING_SCORE_FIELDS = [
+    'profile_completeness', 'is_mentor', 'last_profile_update',
+    'linkedin_url', 'twitter_url', 'github_url', 'personal_website'
+]
+
 class Alumni(db.Model):
     __tablename__ = 'alumni'
+    __table_args__ = (
+        # "Top mentors": is_mentor = true ORDER BY networking_score DESC, id DESC
+        db.Index('ix_alumni_mentor_networking_score', 'is_mentor', 'networking_score', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, unique=True, index=True)
@@ -62,7 +81,9 @@ class Alumni(db.Model):
     
     # Engagement and activity
     last_profile_update = db.Column(db.DateTime)
-    profile_completeness = db.Column(db.Integer, default=0)  # Percentage 0-100
+    profile_completeness = db.Column(db.Integer, default=0, index=True)  # Percentage 0-100, kept current on flush
+    # Materialised get_networking_score(); refreshed on flush and by the nightly batch
+    networking_score = db.Column(db.Integer, nullable=False, default=0, server_default='0', index=True)
     is_verified = db.Column(db.Boolean, default=False)  # Verified alumni status
     
     # Media
@@ -86,24 +107,47 @@ class Alumni(db.Model):
         return current_year - self.graduation_year
     
     def calculate_profile_completeness(self):
-        """Calculate profile completeness percentage"""
-        fields = [
-            self.first_name, self.last_name, self.graduation_year, self.department,
-            self.current_position, self.current_company, self.location, self.bio,
-            self.skills, self.linkedin_url, self.profile_image
-        ]
+        """Calculate profile completeness percentage.
+
+        Updates the attribute in the current unit of work but never commits;
+        the before_flush hook below calls this for every changed profile.
+        """
+        fields = [getattr(self, name) for name in COMPLETENESS_FIELDS]
         
         completed_fields = sum(1 for field in fields if field is not None and field != '' and field != [])
         completeness = int((completed_fields / len(fields)) * 100)
         
-        # Update the database field
         if self.profile_completeness != completeness:
             self.profile_completeness = completeness
             self.last_profile_update = datetime.utcnow()
-            db.session.commit()
         
         return completeness
     
+    @classmethod
+    def recompute_profile_completeness(cls):
+        """Recompute every profile's completeness in one set-based UPDATE.
+
+        For use after bulk imports that bypass the ORM. Returns the number of
+        rows whose score changed.
+        """
+        def filled(name):
+            column = getattr(cls, name)
+            if name == 'skills':
+                # JSON column: compare its text form, which also covers JSON null
+                return db.and_(column.isnot(None), db.cast(column, db.Text).notin_(['[]', 'null', '""', '']))
+            if isinstance(column.type, db.String):
+                return db.and_(column.isnot(None), column != '')
+            return column.isnot(None)
+        
+        completed = sum(db.case((filled(name), 1), else_=0) for name in COMPLETENESS_FIELDS)
+        completeness = (completed * 100) // len(COMPLETENESS_FIELDS)
+        
+        changed = cls.query.filter(
+            db.or_(cls.profile_completeness.is_(None), cls.profile_completeness != completeness)
+        ).update({cls.profile_completeness: completeness}, synchronize_session=False)
+        db.session.commit()
+        return changed
+    
     def get_networking_score(self):
         """Calculate networking score based on profile activity"""
         score = 0
@@ -129,6 +173,39 @@ class Alumni(db.Model):
         
         return min(score, 100)  # Cap at 100
     
+    @classmethod
+    def refresh_networking_scores(cls, now=None):
+        """Recompute every stored networking_score in one set-based UPDATE.
+
+        Mirrors get_networking_score; run nightly so the recency bonus decays
+        for profiles nobody has touched. Returns the number of rows changed.
+        """
+        now = now or datetime.utcnow()
+        # get_networking_score counts whole days, so "<= 30 days" is anything newer than 31 days ago
+        within_30_days = db.bindparam('within_30_days', now - timedelta(days=31), type_=db.DateTime)
+        within_90_days = db.bindparam('within_90_days', now - timedelta(days=91), type_=db.DateTime)
+        
+        score = (
+            db.func.coalesce(cls.profile_completeness, 0)
+            + db.case((cls.is_mentor.is_(True), 20), else_=0)
+            + db.case(
+                (cls.last_profile_update > within_30_days, 15),
+                (cls.last_profile_update > within_90_days, 10),
+                else_=0
+            )
+            + sum(
+                db.case((db.and_(link.isnot(None), link != ''), 5), else_=0)
+                for link in (cls.linkedin_url, cls.twitter_url, cls.github_url, cls.personal_website)
+            )
+        )
+        capped = db.case((score > 100, 100), else_=score)
+        
+        changed = cls.query.filter(
+            db.or_(cls.networking_score.is_(None), cls.networking_score != capped)
+        ).update({cls.networking_score: capped}, synchronize_session=False)
+        db.session.commit()
+        return changed
+    
     def can_be_contacted_by(self, user):
         """Check if user can contact this alumni"""
         if not self.allow_messages:
@@ -145,9 +222,16 @@ class Alumni(db.Model):
         return False
     
     def update_last_activity(self):
-        """Update last profile activity"""
-        self.last_profile_update = datetime.utcnow()
-        db.session.commit()
+        """Update last profile activity via the write-behind activity tracker"""
+        from src.utils.activity_tracker import get_activity_tracker
+
+        now = datetime.utcnow()
+        if self in db.session.new:
+            self.last_profile_update = now
+            return
+
+        set_committed_value(self, 'last_profile_update', now)
+        get_activity_tracker().record_alumni_activity(self.id, now)
     
     def to_dict(self, include_private=False, viewer_role=None):
         """Convert to dictionary with privacy controls"""
@@ -178,7 +262,7 @@ class Alumni(db.Model):
             'allow_messages': self.allow_messages,
             'allow_job_offers': self.allow_job_offers,
             'profile_completeness': self.profile_completeness or 0,
-            'networking_score': self.get_networking_score(),
+            'networking_score': self.networking_score or 0,
             'is_verified': self.is_verified,
             'profile_image': self.profile_image,
             'cover_image': self.cover_image,
@@ -290,3 +374,21 @@ class AlumniExperience(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+
+@event.listens_for(Session, 'before_flush')
+def _refresh_profile_scores(session, flush_context, instances):
+    """Keep profile_completeness and networking_score in step with the write that changes the profile"""
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Alumni):
+            continue
+        if obj in session.new:
+            obj.calculate_profile_completeness()
+            obj.networking_score = obj.get_networking_score()
+            continue
+        state = inspect(obj)
+        if any(state.attrs[name].history.has_changes() for name in COMPLETENESS_FIELDS):
+            obj.calculate_profile_completeness()
+        if any(state.attrs[name].history.has_changes() for name in NETWORKING_SCORE_FIELDS):
+            score = obj.get_networking_score()
+            if obj.networking_score != score:
+                obj.networking_score = score
@@ -0,0 +1,57 @@
+from datetime import datetime
+from src.models.user import db
+
+class BackgroundTask(db.Model):
+    """One unit of deferred work, e.g. importing an uploaded batch.
+
+    Workers lease a task by moving it to 'running' with ``leased_until`` in
+    the future; a worker that dies stops renewing the lease, and the task
+    is picked up again once it expires. Failures go back to 'queued' with
+    ``run_after`` pushed out (exponential backoff) until ``max_attempts``.
+    See src/utils/task_queue.py.
+    """
+    __tablename__ = 'background_tasks'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    leased_by = db.Column(db.String(100))
+    leased_until = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)  # start of the latest attempt
+    finished_at = db.Column(db.DateTime)
+    duration_seconds = db.Column(db.Float)  # of the latest attempt
+
+    __table_args__ = (
+        # Workers look for due work: status = 'queued' AND run_after <= now
+        db.Index('ix_background_tasks_status_run_after', 'status', 'run_after'),
+    )
+
+    def __repr__(self):
+        return f'<BackgroundTask {self.id} {self.kind} - {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            # Not the whole payload: invitation tasks carry raw invite tokens
+            'batch_id': (self.payload or {}).get('batch_id'),
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_after': self.run_after.isoformat() if self.run_after else None,
+            'leased_by': self.leased_by,
+            'leased_until': self.leased_until.isoformat() if self.leased_until else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'duration_seconds': self.duration_seconds
+        }
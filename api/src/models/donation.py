@@ -19,6 +19,18 @@ class DonationCampaign(db.Model):
     def __repr__(self):
         return f'<DonationCampaign {self.title}>'
 
+    @classmethod
+    def add_to_total(cls, campaign_id, amount):
+        """Atomically add ``amount`` to a campaign's current_amount.
+
+        A single UPDATE ... SET current_amount = current_amount + :amount, so
+        concurrent donations never overwrite each other's additions. Returns
+        False if there is no such campaign.
+        """
+        return cls.query.filter_by(id=campaign_id).update({
+            cls.current_amount: db.func.coalesce(cls.current_amount, 0) + amount
+        }, synchronize_session=False) > 0
+
     def to_dict(self):
         progress_percentage = (self.current_amount / self.goal_amount * 100) if self.goal_amount > 0 else 0
         return {
@@ -38,6 +50,13 @@ class DonationCampaign(db.Model):
         }
 
 class Donation(db.Model):
+    __table_args__ = (
+        # Recent completed donations for the dashboard, newest first
+        db.Index('ix_donation_status_donated_at', 'status', 'donated_at'),
+        # Idempotency key for /donate retries and the buffered ingestion queue
+        db.Index('uq_donation_transaction_id', 'transaction_id', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     donor_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     campaign_id = db.Column(db.Integer, db.ForeignKey('donation_campaign.id'))
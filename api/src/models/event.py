@@ -15,12 +15,56 @@ class Event(db.Model):
     organizer_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     event_type = db.Column(db.String(50))  # reunion, networking, workshop, etc.
     status = db.Column(db.String(20), default='active')  # active, cancelled, completed
+    # Denormalised count of 'registered' registrations, kept in step by
+    # adjust_registration_count and repaired by reconcile_registration_counts
+    registration_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     def __repr__(self):
         return f'<Event {self.title}>'
 
+    @classmethod
+    def adjust_registration_count(cls, event_id, delta):
+        """Atomically add ``delta`` to an event's registration counter"""
+        cls.query.filter_by(id=event_id).update({
+            cls.registration_count: cls.registration_count + delta
+        }, synchronize_session=False)
+
+    @classmethod
+    def reserve_seat(cls, event_id):
+        """Take one seat if any are left, returning False when the event is full.
+
+        The capacity check and the increment are a single conditional UPDATE,
+        so concurrent registrations can never oversell the event.
+        """
+        reserved = cls.query.filter(
+            cls.id == event_id,
+            db.or_(
+                cls.max_attendees.is_(None),
+                cls.max_attendees == 0,
+                cls.registration_count < cls.max_attendees
+            )
+        ).update({
+            cls.registration_count: cls.registration_count + 1
+        }, synchronize_session=False)
+        return reserved == 1
+
+    @classmethod
+    def reconcile_registration_counts(cls):
+        """Recount every event from its registrations, returning how many were corrected"""
+        actual = db.func.coalesce(
+            db.select(db.func.count(EventRegistration.id))
+            .where(EventRegistration.event_id == cls.id, EventRegistration.status == 'registered')
+            .scalar_subquery(),
+            0
+        )
+        corrected = cls.query.filter(cls.registration_count != actual).update(
+            {cls.registration_count: actual}, synchronize_session=False
+        )
+        db.session.commit()
+        return corrected
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -35,20 +79,70 @@ class Event(db.Model):
             'organizer_id': self.organizer_id,
             'event_type': self.event_type,
             'status': self.status,
+            'registration_count': self.registration_count or 0,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
 class EventRegistration(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('event_id', 'user_id', name='uq_event_registration_user'),
+        db.Index('ix_event_registration_event_status', 'event_id', 'status', 'registration_date'),
+    )
+
+    # Waitlisted registrations tried per freed seat before giving up
+    PROMOTION_ATTEMPTS = 5
+
     id = db.Column(db.Integer, primary_key=True)
     event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     registration_date = db.Column(db.DateTime, default=datetime.utcnow)
-    status = db.Column(db.String(20), default='registered')  # registered, attended, cancelled
+    status = db.Column(db.String(20), default='registered')  # registered, waitlisted, attended, cancelled
 
     def __repr__(self):
         return f'<EventRegistration {self.user_id} -> {self.event_id}>'
 
+    @classmethod
+    def promote_from_waitlist(cls, event_id):
+        """Give a freed seat to the longest-waiting registration.
+
+        Returns the promoted registration id, or None when nobody is waiting
+        or the event has no room. Each promotion reserves the seat and flips
+        the status with conditional UPDATEs, so two concurrent unregisters
+        never promote the same person or overfill the event.
+        """
+        waiting = db.session.query(cls.id).filter_by(
+            event_id=event_id,
+            status='waitlisted'
+        ).order_by(cls.registration_date.asc(), cls.id.asc()).limit(cls.PROMOTION_ATTEMPTS).all()
+
+        for (registration_id,) in waiting:
+            if not Event.reserve_seat(event_id):
+                return None
+            promoted = cls.query.filter_by(id=registration_id, status='waitlisted').update({
+                cls.status: 'registered'
+            }, synchronize_session=False)
+            if promoted:
+                return registration_id
+            # Someone else promoted or removed this entry first; hand the seat back
+            Event.adjust_registration_count(event_id, -1)
+        return None
+
+    def waitlist_position(self):
+        """1-based place in the event's waitlist, or None if not waitlisted"""
+        if self.status != 'waitlisted':
+            return None
+        ahead = EventRegistration.query.filter(
+            EventRegistration.event_id == self.event_id,
+            EventRegistration.status == 'waitlisted',
+            db.or_(
+                EventRegistration.registration_date < self.registration_date,
+                db.and_(EventRegistration.registration_date == self.registration_date,
+                        EventRegistration.id < self.id)
+            )
+        ).count()
+        return ahead + 1
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -104,6 +104,16 @@ class DataUploadBatch(db.Model):
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
     processed_at = db.Column(db.DateTime)
     
+    # Stored copy of the upload, read by the import task and by retries
+    file_path = db.Column(db.String(500))
+    file_hash = db.Column(db.String(64))  # SHA-256 of the stored file
+    # Data rows before this one are fully imported; a retry of the same file resumes here
+    checkpoint_row = db.Column(db.Integer, default=0)
+    
+    # Import throughput, filled in by the import engine
+    processing_seconds = db.Column(db.Float)
+    rows_per_second = db.Column(db.Float)
+    
     def __repr__(self):
         return f'<DataUploadBatch {self.filename} - {self.status}>'
     
@@ -122,5 +132,8 @@ class DataUploadBatch(db.Model):
             'uploaded_by': self.uploaded_by,
             'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None,
             'processed_at': self.processed_at.isoformat() if self.processed_at else None,
+            'processing_seconds': self.processing_seconds,
+            'rows_per_second': self.rows_per_second,
+            'checkpoint_row': self.checkpoint_row,
             'error_log': self.error_log
         }
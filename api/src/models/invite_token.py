@@ -34,22 +34,33 @@ class InviteToken(db.Model):
     used_at = db.Column(db.DateTime)
     created_by = db.Column(db.Integer, db.ForeignKey('users.id'))  # Institution admin who created this
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'))  # User who used this token
+    upload_batch_id = db.Column(db.Integer, db.ForeignKey('data_upload_batches.id'))  # Data import that created this
     
     # Security tracking
     ip_address = db.Column(db.String(45))  # IP address when token was used
     user_agent = db.Column(db.String(500))  # Browser info when token was used
     
+    __table_args__ = (
+        # A resumed import looks up which of its emails it already invited
+        db.Index('ix_invite_tokens_upload_batch_email', 'upload_batch_id', 'email'),
+    )
+    
     def __repr__(self):
         return f'<InviteToken {self.email} - {self.user_type}>'
     
+    @staticmethod
+    def new_token():
+        """A fresh random token and its SHA-256 hash"""
+        raw_token = secrets.token_urlsafe(32)
+        return raw_token, hashlib.sha256(raw_token.encode()).hexdigest()
+    
     @classmethod
     def generate_token(cls, institution_id, email, user_type, graduation_year=None, 
                       student_id=None, department=None, profile_data=None, 
                       created_by=None, expires_in_days=30):
         """Generate a secure invite token"""
         # Generate a secure random token
-        raw_token = secrets.token_urlsafe(32)
-        token_hash = hashlib.sha256(raw_token.encode()).hexdigest()
+        raw_token, token_hash = cls.new_token()
         
         # Set expiration
         expires_at = datetime.utcnow() + timedelta(days=expires_in_days)
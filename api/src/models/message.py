@@ -1,8 +1,14 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy.exc import IntegrityError
 from src.models.user import db
 
 class Message(db.Model):
+    __table_args__ = (
+        # Serves both directions of a conversation: (a -> b) and (b -> a), newest first
+        db.Index('ix_message_sender_recipient_created', 'sender_id', 'recipient_id', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     sender_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     recipient_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -27,6 +33,179 @@ class Message(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class Conversation(db.Model):
+    """Denormalised summary of a direct conversation between two users.
+
+    Maintained in the same transaction as each new Message (see
+    record_message) so the inbox never has to scan the message table.
+    """
+    __tablename__ = 'conversations'
+    __table_args__ = (
+        db.UniqueConstraint('user_low_id', 'user_high_id', name='uq_conversation_pair'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # The pair is stored ordered so each conversation has exactly one row
+    user_low_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    user_high_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    last_message_id = db.Column(db.Integer, db.ForeignKey('message.id'))
+    last_activity = db.Column(db.DateTime, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    participants = db.relationship('ConversationParticipant', backref='conversation', lazy='select')
+    last_message = db.relationship('Message', foreign_keys=[last_message_id], lazy='joined')
+
+    def __repr__(self):
+        return f'<Conversation {self.user_low_id} <-> {self.user_high_id}>'
+
+    @classmethod
+    def get_or_create(cls, user_id, other_user_id):
+        """Return the conversation for a pair of users, creating it and its participants if needed"""
+        low, high = min(user_id, other_user_id), max(user_id, other_user_id)
+        conversation = cls.query.filter_by(user_low_id=low, user_high_id=high).first()
+        if conversation:
+            return conversation
+
+        try:
+            with db.session.begin_nested():
+                conversation = cls(user_low_id=low, user_high_id=high)
+                db.session.add(conversation)
+                db.session.flush()
+                db.session.add(ConversationParticipant(conversation_id=conversation.id, user_id=low, other_user_id=high))
+                if high != low:
+                    db.session.add(ConversationParticipant(conversation_id=conversation.id, user_id=high, other_user_id=low))
+        except IntegrityError:
+            # Another request created it concurrently
+            conversation = cls.query.filter_by(user_low_id=low, user_high_id=high).one()
+        return conversation
+
+    @classmethod
+    def record_message(cls, message):
+        """Fold a newly added message into its conversation summary.
+
+        Must be called in the transaction that inserts the message. The
+        counters are bumped with UPDATE ... SET x = x + 1 so concurrent
+        senders never lose increments.
+        """
+        db.session.flush()
+        conversation = cls.get_or_create(message.sender_id, message.recipient_id)
+
+        cls.query.filter_by(id=conversation.id).update({
+            cls.last_message_id: message.id,
+            cls.last_activity: message.created_at
+        }, synchronize_session=False)
+        ConversationParticipant.query.filter_by(conversation_id=conversation.id).update({
+            ConversationParticipant.last_activity: message.created_at,
+            ConversationParticipant.unread_count: db.case(
+                (ConversationParticipant.user_id == message.recipient_id,
+                 ConversationParticipant.unread_count + 1),
+                else_=ConversationParticipant.unread_count
+            )
+        }, synchronize_session=False)
+        return conversation
+
+    @classmethod
+    def backfill(cls, batch_size=1000):
+        """Rebuild every conversation summary from the existing messages.
+
+        Returns the number of conversations created.
+        """
+        ConversationParticipant.query.delete(synchronize_session=False)
+        cls.query.delete(synchronize_session=False)
+
+        low = db.case((Message.sender_id < Message.recipient_id, Message.sender_id), else_=Message.recipient_id)
+        high = db.case((Message.sender_id < Message.recipient_id, Message.recipient_id), else_=Message.sender_id)
+
+        def unread_for(user_column):
+            return db.func.sum(db.case(
+                ((Message.recipient_id == user_column) & (Message.is_read == False), 1), else_=0
+            )).over(partition_by=(low, high))
+
+        ranked = db.session.query(
+            Message.id.label('message_id'),
+            Message.created_at.label('created_at'),
+            low.label('low_id'),
+            high.label('high_id'),
+            db.func.row_number().over(
+                partition_by=(low, high),
+                order_by=(Message.created_at.desc(), Message.id.desc())
+            ).label('position'),
+            unread_for(low).label('low_unread'),
+            unread_for(high).label('high_unread')
+        ).subquery()
+
+        summaries = db.session.query(ranked).filter(ranked.c.position == 1).yield_per(batch_size)
+
+        created = 0
+        batch = []
+        for row in summaries:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                created += cls._insert_backfill_batch(batch)
+                batch = []
+        if batch:
+            created += cls._insert_backfill_batch(batch)
+
+        db.session.commit()
+        return created
+
+    @classmethod
+    def _insert_backfill_batch(cls, rows):
+        conversations = [
+            cls(user_low_id=row.low_id, user_high_id=row.high_id,
+                last_message_id=row.message_id, last_activity=row.created_at)
+            for row in rows
+        ]
+        db.session.add_all(conversations)
+        db.session.flush()
+
+        participants = []
+        for conversation, row in zip(conversations, rows):
+            participants.append({
+                'conversation_id': conversation.id, 'user_id': row.low_id, 'other_user_id': row.high_id,
+                'unread_count': int(row.low_unread or 0), 'last_activity': row.created_at
+            })
+            if row.high_id != row.low_id:
+                participants.append({
+                    'conversation_id': conversation.id, 'user_id': row.high_id, 'other_user_id': row.low_id,
+                    'unread_count': int(row.high_unread or 0), 'last_activity': row.created_at
+                })
+        db.session.execute(db.insert(ConversationParticipant), participants)
+        return len(conversations)
+
+class ConversationParticipant(db.Model):
+    """Per-user view of a conversation: the inbox row and its unread counter"""
+    __tablename__ = 'conversation_participants'
+    __table_args__ = (
+        db.UniqueConstraint('conversation_id', 'user_id', name='uq_conversation_participant'),
+        db.Index('ix_conversation_participants_inbox', 'user_id', 'last_activity'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    other_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    unread_count = db.Column(db.Integer, nullable=False, default=0)
+    last_activity = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<ConversationParticipant {self.user_id} in {self.conversation_id}>'
+
+    @classmethod
+    def mark_read(cls, user_id, other_user_id, count):
+        """Take ``count`` messages off the user's unread counter for one conversation"""
+        if not count:
+            return
+        cls.query.filter_by(user_id=user_id, other_user_id=other_user_id).update({
+            cls.unread_count: db.case((cls.unread_count > count, cls.unread_count - count), else_=0)
+        }, synchronize_session=False)
+
+    @classmethod
+    def total_unread(cls, user_id):
+        return db.session.query(db.func.coalesce(db.func.sum(cls.unread_count), 0)).filter(
+            cls.user_id == user_id
+        ).scalar()
+
 class ForumPost(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     author_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
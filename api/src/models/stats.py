@@ -0,0 +1,147 @@
+import random
+from datetime import datetime
+from sqlalchemy import bindparam, text
+from src.models.user import db
+
+class StatCounter(db.Model):
+    """One named running total, e.g. ('alumni_by_year', '2015') -> 240.
+
+    Counters are adjusted in the same transaction as the rows they count
+    (see src/utils/dashboard_stats.py), so reading a dashboard is a lookup
+    of a handful of rows instead of aggregating the source tables.
+    """
+    __tablename__ = 'stat_counters'
+
+    scope = db.Column(db.String(50), primary_key=True)
+    key = db.Column(db.String(255), primary_key=True)
+    value = db.Column(db.Float, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<StatCounter {self.scope}:{self.key}={self.value}>'
+
+    @classmethod
+    def increment(cls, connection, deltas):
+        """Add each ``(scope, key) -> delta`` to its counter, creating missing ones.
+
+        Runs on ``connection`` so the counters commit or roll back together
+        with the write being counted.
+        """
+        # Always lock counter rows in the same order, so two transactions
+        # touching the same counters cannot deadlock
+        params = [
+            {'counter_scope': scope, 'counter_key': key, 'delta': delta, 'touched_at': datetime.utcnow()}
+            for (scope, key), delta in sorted(deltas.items()) if delta
+        ]
+        if not params:
+            return
+        upsert = _upsert(connection.dialect.name)
+        if upsert is not None:
+            connection.execute(upsert, params)
+            return
+        for entry in params:
+            cls._increment_portable(connection, entry)
+
+    @classmethod
+    def increment_returning(cls, connection, scope, key, delta):
+        """Add ``delta`` to one counter and return its new value"""
+        entry = {'counter_scope': scope, 'counter_key': key, 'delta': delta, 'touched_at': datetime.utcnow()}
+        upsert = _upsert(connection.dialect.name, returning=True)
+        if upsert is not None:
+            return connection.execute(upsert, entry).scalar()
+        return cls._increment_portable(connection, entry)
+
+    @classmethod
+    def _increment_portable(cls, connection, entry):
+        table = cls.__table__
+        match = (table.c.scope == entry['counter_scope']) & (table.c.key == entry['counter_key'])
+        updated = connection.execute(
+            table.update().where(match).values(value=table.c.value + entry['delta'], updated_at=entry['touched_at'])
+        ).rowcount
+        if not updated:
+            connection.execute(table.insert().values(
+                scope=entry['counter_scope'], key=entry['counter_key'],
+                value=entry['delta'], updated_at=entry['touched_at']
+            ))
+        return connection.execute(db.select(table.c.value).where(match)).scalar()
+
+    @classmethod
+    def read(cls, *scopes):
+        """``{scope: {key: value}}`` for the given scopes, one indexed query"""
+        result = {scope: {} for scope in scopes}
+        rows = db.session.query(cls.scope, cls.key, cls.value).filter(cls.scope.in_(scopes))
+        for scope, key, value in rows:
+            result[scope][key] = value
+        return result
+
+
+# SQLite and Postgres share the ON CONFLICT syntax. Plain text because the
+# dialect-specific on_conflict_do_update construct has no cache key, which
+# meant recompiling it on every donation.
+UPSERT_SQL = (
+    'INSERT INTO stat_counters (scope, "key", value, updated_at) '
+    'VALUES (:counter_scope, :counter_key, :delta, :touched_at) '
+    'ON CONFLICT (scope, "key") DO UPDATE SET '
+    'value = stat_counters.value + excluded.value, updated_at = excluded.updated_at'
+)
+UPSERT = text(UPSERT_SQL).bindparams(bindparam('touched_at', type_=db.DateTime))
+UPSERT_RETURNING = text(UPSERT_SQL + ' RETURNING value').bindparams(bindparam('touched_at', type_=db.DateTime))
+UPSERT_DIALECTS = ('postgresql', 'sqlite')
+
+
+def _upsert(dialect_name, returning=False):
+    if dialect_name not in UPSERT_DIALECTS:
+        return None
+    return UPSERT_RETURNING if returning else UPSERT
+
+
+class TableVersion(db.Model):
+    """Write counter for one table, for HTTP cache validators.
+
+    Every transaction that writes to a table adds 1 to one of its rows as
+    part of its own commit (see src/utils/http_cache.py), so the version
+    moves exactly when the write becomes visible, on any worker. Writes are
+    spread over ``VERSION_SHARDS`` rows per table so concurrent writers do
+    not queue on one row; a table's version is the sum of its shards.
+    """
+    __tablename__ = 'table_versions'
+
+    table_name = db.Column(db.String(64), primary_key=True)
+    shard = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<TableVersion {self.table_name}#{self.shard}={self.version}>'
+
+    @classmethod
+    def bump(cls, connection, table_names):
+        """Add 1 to a random shard of each table's version, on ``connection``"""
+        params = [
+            {'table_name': name, 'shard': random.randrange(VERSION_SHARDS), 'touched_at': datetime.utcnow()}
+            for name in sorted(table_names)
+        ]
+        if not params:
+            return
+        if connection.dialect.name in UPSERT_DIALECTS:
+            connection.execute(VERSION_UPSERT, params)
+            return
+        table = cls.__table__
+        for entry in params:
+            match = (table.c.table_name == entry['table_name']) & (table.c.shard == entry['shard'])
+            updated = connection.execute(
+                table.update().where(match).values(version=table.c.version + 1, updated_at=entry['touched_at'])
+            ).rowcount
+            if not updated:
+                connection.execute(table.insert().values(
+                    table_name=entry['table_name'], shard=entry['shard'], version=1, updated_at=entry['touched_at']
+                ))
+
+
+VERSION_SHARDS = 16
+VERSION_UPSERT = text(
+    'INSERT INTO table_versions (table_name, shard, version, updated_at) '
+    'VALUES (:table_name, :shard, 1, :touched_at) '
+    'ON CONFLICT (table_name, shard) DO UPDATE SET '
+    'version = table_versions.version + 1, updated_at = excluded.updated_at'
+).bindparams(bindparam('touched_at', type_=db.DateTime))
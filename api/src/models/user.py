@@ -1,6 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm.attributes import set_committed_value
 import enum
 
 db = SQLAlchemy()
@@ -88,18 +89,41 @@ class User(db.Model):
         return check_password_hash(self.password_hash, password)
     
     def update_last_login(self, ip_address=None):
-        """Update login tracking information"""
-        self.last_login = datetime.utcnow()
-        self.last_active = datetime.utcnow()
-        self.login_count += 1
+        """Update login tracking information.
+
+        Persistent users are recorded through the write-behind activity
+        tracker instead of committing here; the in-memory values are updated
+        without dirtying the session.
+        """
+        from src.utils.activity_tracker import get_activity_tracker
+
+        now = datetime.utcnow()
+        if self in db.session.new:
+            self.last_login = now
+            self.last_active = now
+            self.login_count = (self.login_count or 0) + 1
+            if ip_address:
+                self.last_ip = ip_address
+            return
+
+        set_committed_value(self, 'last_login', now)
+        set_committed_value(self, 'last_active', now)
+        set_committed_value(self, 'login_count', (self.login_count or 0) + 1)
         if ip_address:
-            self.last_ip = ip_address
-        db.session.commit()
+            set_committed_value(self, 'last_ip', ip_address)
+        get_activity_tracker().record_login(self.id, ip_address, now)
     
     def update_last_active(self):
-        """Update last activity timestamp"""
-        self.last_active = datetime.utcnow()
-        db.session.commit()
+        """Update last activity timestamp via the write-behind activity tracker"""
+        from src.utils.activity_tracker import get_activity_tracker
+
+        now = datetime.utcnow()
+        if self in db.session.new:
+            self.last_active = now
+            return
+
+        set_committed_value(self, 'last_active', now)
+        get_activity_tracker().record_active(self.id, now)
     
     def activate_account(self):
         """Activate the user account"""
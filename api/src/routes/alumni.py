@@ -1,9 +1,35 @@
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, Response, jsonify, request, session, stream_with_context
 from src.models.alumni import Alumni, db
 from src.models.user import User
+from src.models.stats import StatCounter
+from src.utils.alumni_search import get_search_backend
+from src.utils.dashboard_stats import alumni_stats
+from src.utils.http_cache import conditional_get
+from src.utils.pagination import InvalidCursor, decode_cursor, keyset_filter, keyset_page, parse_limit
+from src.utils.serializers import ALUMNI_SERIALIZER, FieldSelection, InvalidFields
+import json
 
 alumni_bp = Blueprint('alumni', __name__)
 
+# Keyset orderings supported by the directory listing: (columns, descending).
+# The trailing id keeps the ordering total so cursors are unambiguous.
+ALUMNI_SORTS = {
+    'graduation_year': ((Alumni.graduation_year, Alumni.id), True),
+    'last_name': ((Alumni.last_name, Alumni.id), False),
+    'networking_score': ((Alumni.networking_score, Alumni.id), True),
+}
+
+STREAM_BATCH_SIZE = 500
+
+def _stream_alumni(query, columns, descending, cursor, serialize):
+    """Yield matching alumni as NDJSON straight from a server-side cursor"""
+    if cursor:
+        query = query.filter(keyset_filter(columns, decode_cursor(cursor, len(columns)), descending))
+    ordering = [c.desc() if descending else c.asc() for c in columns]
+
+    for alum in query.order_by(*ordering).yield_per(STREAM_BATCH_SIZE):
+        yield json.dumps(serialize(alum)) + '\n'
+
 @alumni_bp.route('/alumni', methods=['GET'])
 def get_alumni():
     # Get query parameters for filtering
@@ -11,6 +37,9 @@ def get_alumni():
     graduation_year = request.args.get('graduation_year')
     location = request.args.get('location')
     search = request.args.get('search')
+    min_completeness = request.args.get('min_completeness', type=int)
+    max_completeness = request.args.get('max_completeness', type=int)
+    is_mentor = request.args.get('is_mentor')
     
     query = Alumni.query.join(User)
     
@@ -24,22 +53,62 @@ def get_alumni():
     if location and location != 'all':
         query = query.filter(Alumni.location.ilike(f'%{location}%'))
     
+    # Completeness range, served by the profile_completeness index
+    if min_completeness is not None:
+        query = query.filter(Alumni.profile_completeness >= min_completeness)
+    
+    if max_completeness is not None:
+        query = query.filter(Alumni.profile_completeness <= max_completeness)
+    
+    if is_mentor is not None and is_mentor != 'all':
+        query = query.filter(Alumni.is_mentor == (is_mentor.lower() == 'true'))
+    
     if search:
-        search_filter = (
-            Alumni.first_name.ilike(f'%{search}%') |
-            Alumni.last_name.ilike(f'%{search}%') |
-            Alumni.current_company.ilike(f'%{search}%') |
-            Alumni.current_position.ilike(f'%{search}%') |
-            Alumni.skills.ilike(f'%{search}%')
+        query = get_search_backend().apply(query, search)
+    
+    # Keyset pagination parameters
+    sort = request.args.get('sort', 'graduation_year')
+    if sort not in ALUMNI_SORTS:
+        return jsonify({'success': False, 'message': f'Unsupported sort: {sort}'}), 400
+    columns, descending = ALUMNI_SORTS[sort]
+    cursor = request.args.get('cursor')
+    
+    # Sparse fieldset (?fields=first_name,last_name,...); SELECT only the columns it needs
+    try:
+        selection = FieldSelection.parse(request.args.get('fields'), ALUMNI_SERIALIZER)
+    except InvalidFields as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    serialize = ALUMNI_SERIALIZER.compile(only=selection.only)
+    query = query.options(serialize.load_only(*columns))
+    
+    # NDJSON streaming mode: every matching row, never materialised as a list
+    if request.args.get('format') == 'ndjson':
+        try:
+            if cursor:
+                decode_cursor(cursor, len(columns))
+        except InvalidCursor as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        return Response(
+            stream_with_context(_stream_alumni(query, columns, descending, cursor, serialize)),
+            mimetype='application/x-ndjson'
         )
-        query = query.filter(search_filter)
     
-    alumni = query.all()
+    limit = parse_limit(request.args.get('limit'))
+    try:
+        alumni, next_cursor = keyset_page(query, columns, cursor=cursor, limit=limit, descending=descending)
+    except InvalidCursor as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     
     return jsonify({
         'success': True,
-        'alumni': [alum.to_dict() for alum in alumni],
-        'total': len(alumni)
+        'alumni': serialize.many(alumni),
+        'total': len(alumni),
+        'pagination': {
+            'sort': sort,
+            'limit': limit,
+            'next_cursor': next_cursor,
+            'has_next': next_cursor is not None
+        }
     }), 200
 
 @alumni_bp.route('/alumni/<int:alumni_id>', methods=['GET'])
@@ -91,30 +160,20 @@ def update_alumni_profile(alumni_id):
     }), 200
 
 @alumni_bp.route('/alumni/stats', methods=['GET'])
+@conditional_get(StatCounter, max_age=30)
 def get_alumni_stats():
-    total_alumni = Alumni.query.count()
-    mentors_count = Alumni.query.filter_by(is_mentor=True).count()
-    
-    # Get graduation year distribution
-    year_stats = db.session.query(
-        Alumni.graduation_year,
-        db.func.count(Alumni.id).label('count')
-    ).group_by(Alumni.graduation_year).all()
-    
-    # Get department distribution
-    dept_stats = db.session.query(
-        Alumni.department,
-        db.func.count(Alumni.id).label('count')
-    ).group_by(Alumni.department).all()
-    
+    # Maintained counters (see utils/dashboard_stats), not aggregates over alumni
     return jsonify({
         'success': True,
-        'stats': {
-            'total_alumni': total_alumni,
-            'mentors_count': mentors_count,
-            'graduation_years': [{'year': year, 'count': count} for year, count in year_stats],
-            'departments': [{'department': dept, 'count': count} for dept, count in dept_stats]
-        }
+        'stats': alumni_stats()
+    }), 200
+
+@alumni_bp.route('/alumni/search/stats', methods=['GET'])
+def get_search_stats():
+    """Report which search engine is active and, for the in-memory index, its size"""
+    return jsonify({
+        'success': True,
+        'stats': get_search_backend().stats()
     }), 200
 
 @alumni_bp.route('/alumni/search', methods=['POST'])
@@ -125,16 +184,6 @@ def search_alumni():
     
     query = Alumni.query.join(User)
     
-    if search_term:
-        search_filter = (
-            Alumni.first_name.ilike(f'%{search_term}%') |
-            Alumni.last_name.ilike(f'%{search_term}%') |
-            Alumni.current_company.ilike(f'%{search_term}%') |
-            Alumni.current_position.ilike(f'%{search_term}%') |
-            Alumni.skills.ilike(f'%{search_term}%')
-        )
-        query = query.filter(search_filter)
-    
     # Apply additional filters
     if filters.get('department'):
         query = query.filter(Alumni.department.ilike(f'%{filters["department"]}%'))
@@ -148,11 +197,18 @@ def search_alumni():
     if filters.get('is_mentor') is not None:
         query = query.filter(Alumni.is_mentor == filters['is_mentor'])
     
-    alumni = query.all()
+    # Ranked full-text match, best results first
+    if search_term:
+        query = get_search_backend().apply(query, search_term, ranked=True)
+    else:
+        query = query.order_by(Alumni.last_name, Alumni.id)
+    
+    serialize = ALUMNI_SERIALIZER.compile()
+    alumni = query.options(serialize.load_only()).limit(parse_limit(data.get('limit'))).all()
     
     return jsonify({
         'success': True,
-        'alumni': [alum.to_dict() for alum in alumni],
+        'alumni': serialize.many(alumni),
         'total': len(alumni)
     }), 200
 
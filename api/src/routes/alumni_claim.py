@@ -7,6 +7,7 @@ import hashlib
 from PIL import Image
 import io
 import sqlite3
+from src.utils.http_cache import conditional_get
 
 alumni_claim_bp = Blueprint('alumni_claim', __name__)
 
@@ -32,6 +33,7 @@ COLLEGES_LIST = [
 ]
 
 @alumni_claim_bp.route('/colleges', methods=['GET'])
+@conditional_get(max_age=86400)
 def get_colleges():
     """Get list of all colleges/institutions"""
     try:
@@ -1,17 +1,23 @@
-from flask import Blueprint, jsonify, request, session
+from flask import Blueprint, current_app, jsonify, request, session
 from src.models.user import User, UserRole, UserStatus, db
 from src.models.institution import Institution, DataUploadBatch
 from src.models.invite_token import InviteToken
 from src.utils.auth_decorators import require_role
 from src.utils.email_service import send_bulk_invitations
+from src.utils.import_engine import (
+    INVITE_MAIL_CHUNK, MAX_LOGGED_ERRORS, READ_CHUNK, ImportResult, chunked, resume_chunks, run_import
+)
+from src.utils.import_readers import file_sha256, open_rows
+from src.utils.import_validation import DUPLICATE_EMAIL_ERROR, EMAIL_PATTERN, claim_emails, validate_frame
+from src.utils.task_queue import LeaseLost, get_task_queue, task_handler
 from datetime import datetime, timedelta
 import json
-import io
+import logging
 import secrets
-import threading
 from werkzeug.utils import secure_filename
 import os
-import csv
+
+logger = logging.getLogger(__name__)
 
 # Try to import pandas, provide fallback if not available
 try:
@@ -37,57 +43,6 @@ if EXCEL_SUPPORT:
 else:
     ALLOWED_EXTENSIONS = {'csv'}
 
-def read_csv_file(file):
-    """Read CSV file with fallback for when pandas is not available"""
-    if PANDAS_AVAILABLE:
-        try:
-            return pd.read_csv(file, encoding='utf-8')
-        except Exception as e:
-            print(f"Pandas CSV read failed: {e}, falling back to manual CSV reading")
-    
-    # Fallback CSV reading
-    file.seek(0)
-    content = file.read().decode('utf-8')
-    lines = content.strip().split('\n')
-    
-    if not lines:
-        return None
-    
-    # Parse CSV manually
-    csv_reader = csv.DictReader(io.StringIO(content))
-    rows = list(csv_reader)
-    
-    if not rows:
-        return None
-    
-    # Create a simple DataFrame-like object
-    class SimpleDataFrame:
-        def __init__(self, data):
-            self.data = data
-            self.columns = list(data[0].keys()) if data else []
-        
-        def iterrows(self):
-            for i, row in enumerate(self.data):
-                yield i, row
-        
-        def empty(self):
-            return len(self.data) == 0
-        
-        def __len__(self):
-            return len(self.data)
-    
-    return SimpleDataFrame(rows)
-
-def read_excel_file(file):
-    """Read Excel file with pandas or fallback"""
-    if not EXCEL_SUPPORT:
-        raise ValueError("Excel files not supported - openpyxl not installed")
-    
-    if PANDAS_AVAILABLE:
-        return pd.read_excel(file)
-    else:
-        raise ValueError("Excel files require pandas - not available")
-
 def check_value_empty(value):
     """Check if a value is empty (works with pandas and regular values)"""
     if PANDAS_AVAILABLE:
@@ -99,8 +54,8 @@ def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def validate_required_columns(df, user_type):
-    """Validate that required columns are present in the dataframe"""
+def validate_required_columns(reader, user_type):
+    """Validate that required columns are present in the uploaded file"""
     if user_type == 'alumni':
         required_columns = ['first_name', 'last_name', 'email', 'graduation_year', 'department']
     else:  # student
@@ -108,17 +63,27 @@ def validate_required_columns(df, user_type):
     
     missing_columns = []
     for col in required_columns:
-        if col not in df.columns:
+        if col not in reader.columns:
             missing_columns.append(col)
     
     return missing_columns
 
-def clean_and_validate_data(df, user_type):
-    """Clean and validate the imported data"""
+def clean_and_validate_data(rows, user_type, seen_emails=None):
+    """Clean and validate one chunk of an upload: ``(index, row)`` pairs or a DataFrame.
+    
+    ``seen_emails`` holds emails claimed by earlier rows of the same file and
+    is updated in place, so repeats are reported across chunks. Uses the
+    columnar validator when pandas is available.
+    """
+    if seen_emails is None:
+        seen_emails = set()
+    if PANDAS_AVAILABLE:
+        return validate_frame(rows, user_type, seen_emails)
+    
     errors = []
     cleaned_data = []
     
-    for index, row in df.iterrows():
+    for index, row in rows:
         row_errors = []
         row_data = {}
         
@@ -138,10 +103,14 @@ def clean_and_validate_data(df, user_type):
             row_errors.append('Email is required')
         else:
             email = str(row['email']).strip().lower()
-            if '@' not in email:
+            if not EMAIL_PATTERN.match(email):
                 row_errors.append('Invalid email format')
             else:
                 row_data['email'] = email
+                if email in seen_emails:
+                    row_errors.append(DUPLICATE_EMAIL_ERROR)
+                else:
+                    seen_emails.add(email)
         
         # Department
         if check_value_empty(row.get('department')):
@@ -162,7 +131,12 @@ def clean_and_validate_data(df, user_type):
                 row_errors.append('Graduation year must be a valid number')
             
             # Optional alumni fields
-            row_data['graduation_month'] = int(row['graduation_month']) if not check_value_empty(row.get('graduation_month')) else None
+            row_data['graduation_month'] = None
+            if not check_value_empty(row.get('graduation_month')):
+                try:
+                    row_data['graduation_month'] = int(row['graduation_month'])
+                except (ValueError, TypeError):
+                    row_errors.append('Graduation month must be a valid number')
             row_data['degree_type'] = str(row['degree_type']).strip() if not check_value_empty(row.get('degree_type')) else None
             row_data['major'] = str(row['major']).strip() if not check_value_empty(row.get('major')) else None
             row_data['minor'] = str(row['minor']).strip() if not check_value_empty(row.get('minor')) else None
@@ -206,7 +180,12 @@ def clean_and_validate_data(df, user_type):
             
             # Optional student fields
             row_data['student_id'] = str(row['student_id']).strip() if not check_value_empty(row.get('student_id')) else None
-            row_data['current_year'] = int(row['current_year']) if not check_value_empty(row.get('current_year')) else None
+            row_data['current_year'] = None
+            if not check_value_empty(row.get('current_year')):
+                try:
+                    row_data['current_year'] = int(row['current_year'])
+                except (ValueError, TypeError):
+                    row_errors.append('Current year must be a valid number')
             row_data['current_semester'] = str(row['current_semester']).strip() if not check_value_empty(row.get('current_semester')) else None
             row_data['major'] = str(row['major']).strip() if not check_value_empty(row.get('major')) else None
             row_data['minor'] = str(row['minor']).strip() if not check_value_empty(row.get('minor')) else None
@@ -243,7 +222,7 @@ def clean_and_validate_data(df, user_type):
                 row_data['career_interests'] = []
         
         # Add row data and errors
-        row_data['row_number'] = index + 2  # +2 because pandas is 0-indexed and we skip header
+        row_data['row_number'] = index + 2  # +2 because index is 0-based and we skip header
         row_data['errors'] = row_errors
         
         if row_errors:
@@ -253,46 +232,206 @@ def clean_and_validate_data(df, user_type):
     
     return cleaned_data, errors
 
-def process_batch_async(batch_id):
-    """Process upload batch asynchronously"""
+def save_upload(file, filename):
+    """Store an upload under IMPORT_UPLOAD_DIR for the import task; returns its path"""
+    upload_dir = current_app.config['IMPORT_UPLOAD_DIR']
+    os.makedirs(upload_dir, exist_ok=True)
+    path = os.path.join(upload_dir, f'{secrets.token_hex(8)}_{filename}')
+    file.save(path)
+    return path
+
+def check_upload(reader, user_type, institution):
+    """Validate the shape of an upload before queueing it; returns ``(total_records, error_message)``"""
+    # Basic validation
+    if not reader.columns:
+        return 0, 'File is empty'
+    
+    # Check required columns
+    missing_columns = validate_required_columns(reader, user_type)
+    if missing_columns:
+        return 0, f'Missing required columns: {", ".join(missing_columns)}'
+    
+    total_records = reader.count()
+    if total_records == 0:
+        return 0, 'File is empty'
+    
+    # Check institution user limits
+    if not institution.can_add_users(total_records):
+        return total_records, f'Adding {total_records} users would exceed institution limit of {institution.max_users}'
+    
+    return total_records, None
+
+def enqueue_import(batch):
+    """Queue the import task for ``batch``; committed by the caller"""
+    get_task_queue().enqueue('import_batch', {'batch_id': batch.id})
+
+def record_task_error(batch, error):
+    """Note a failed import attempt in the batch's error_log, keeping the
+    checkpointed errors a resumed import carries on from"""
+    log = json.loads(batch.error_log) if batch.error_log else {}
+    log['task_error'] = error
+    batch.error_log = json.dumps(log)
+
+def mark_batch_failed(payload, error):
+    """The import task ran out of attempts; a retry resumes from the checkpoint"""
+    batch = DataUploadBatch.query.get(payload.get('batch_id'))
+    if not batch:
+        return
+    batch.status = 'failed'
+    batch.processed_at = datetime.utcnow()
+    record_task_error(batch, error)
+    db.session.commit()
+
+@task_handler('import_batch', on_failure=mark_batch_failed)
+def import_batch_task(run):
+    """Validate the stored upload of a batch and create its invite tokens"""
+    batch = DataUploadBatch.query.get(run.payload['batch_id'])
+    if not batch:
+        logger.warning(f"Import task {run.task_id}: batch {run.payload['batch_id']} no longer exists")
+        return
+    
+    # A retry, or a task taken over from a dead worker, carries on from the
+    # last checkpoint, provided the stored file is still the one it was
+    # taken on. A finished batch that is retried goes over the whole file.
+    start_row = batch.checkpoint_row or 0
+    if start_row and batch.file_hash and file_sha256(batch.file_path) != batch.file_hash:
+        logger.warning(f"Import batch {batch.id}: stored file changed since its checkpoint, starting over")
+        start_row = 0
+    if start_row >= (batch.total_records or 0):
+        start_row = 0
+    
+    if start_row:
+        result = ImportResult.from_checkpoint(batch, MAX_LOGGED_ERRORS)
+    else:
+        result = None
+        batch.successful_records = 0
+        batch.failed_records = 0
+        batch.error_log = None
+    batch.checkpoint_row = start_row
+    batch.processed_records = start_row
+    batch.status = 'processing'
+    db.session.commit()
+    
+    # Tokens from an earlier run must not be created (or mailed) twice
+    skip_invited = db.session.query(
+        InviteToken.query.filter_by(upload_batch_id=batch.id).exists()
+    ).scalar()
+    
+    institution_name = batch.institution.name
+    user_type = batch.batch_type
+    # Emails seen so far, so a repeat in a later chunk is still caught
+    seen_emails = set()
+    
+    def queue_invitations(invites):
+        # Committed together with the invite tokens they announce
+        for chunk in chunked(invites, INVITE_MAIL_CHUNK):
+            get_task_queue().enqueue('send_invites', {
+                'batch_id': batch.id,
+                'institution_name': institution_name,
+                'invites': chunk
+            })
+    
     try:
-        with db.session.begin():
-            batch = DataUploadBatch.query.get(batch_id)
-            if not batch:
-                return
-            
-            batch.status = 'processing'
-            batch.processed_at = datetime.utcnow()
-            db.session.commit()
-            
-            # Read the uploaded data (in production, you'd read from a file)
-            # For now, we'll simulate the processing
+        with open(batch.file_path, 'rb') as stream:
+            reader = open_rows(stream, batch.filename)
             
-            successful_invites = []
-            failed_records = []
-            
-            # Create invite tokens for valid records
-            institution = Institution.query.get(batch.institution_id)
-            admin_user = User.query.get(batch.uploaded_by)
-            
-            # In a real implementation, you'd read the cleaned data from storage
-            # For demo purposes, we'll update the batch status
-            
-            batch.successful_records = batch.total_records
-            batch.failed_records = 0
-            batch.status = 'completed'
-            db.session.commit()
+            def chunks():
+                for chunk in (reader.frames(READ_CHUNK) if PANDAS_AVAILABLE else reader.chunks(READ_CHUNK)):
+                    yield chunk
+                    # The previous chunk is committed; keep the lease for the next one
+                    run.heartbeat()
             
+            result = run_import(
+                batch,
+                resume_chunks(chunks(), start_row, on_skipped=lambda rows: claim_emails(rows, seen_emails)),
+                lambda chunk: clean_and_validate_data(chunk, user_type, seen_emails),
+                user_type,
+                created_by=batch.uploaded_by,
+                on_invites=queue_invitations,
+                expires_in_days=30,
+                result=result,
+                skip_invited=skip_invited
+            )
+    except LeaseLost:
+        raise
     except Exception as e:
-        # Update batch status to failed
-        batch.status = 'failed'
-        batch.error_log = str(e)
+        # Show the batch as waiting again while the task backs off; the
+        # chunks committed so far stay imported
+        db.session.rollback()
+        batch.status = 'pending'
+        record_task_error(batch, f'{type(e).__name__}: {e}')
         db.session.commit()
+        raise
+    
+    # Update batch statistics
+    batch.successful_records = result.successful
+    batch.failed_records = result.failed
+    batch.processed_records = batch.total_records
+    batch.status = 'completed' if result.successful else 'failed'
+    batch.processed_at = datetime.utcnow()
+    batch.error_log = json.dumps(result.error_log()) if result.failed else None
+    
+    db.session.commit()
+
+@task_handler('send_invites')
+def send_invites_task(run):
+    """Mail one chunk of a batch's invitations.
+    
+    Each address is recorded in the task as it goes out, with the lease
+    renewal, so a worker that takes the task over (or a retry) only mails
+    the ones still outstanding.
+    """
+    sent = list(run.payload.get('sent', []))
+    already_sent = set(sent)
+    pending = [invite for invite in run.payload['invites'] if invite['email'] not in already_sent]
+    
+    def record(invitation, success):
+        if success:
+            sent.append(invitation['email'])
+        run.heartbeat(progress={'sent': sent})
+    
+    result = send_bulk_invitations(pending, run.payload['institution_name'], on_sent=record)
+    if result['failed']:
+        raise RuntimeError(f"{result['failed']} of {len(pending)} invitation emails failed")
+
+def batch_result_response(batch):
+    """Response for an upload whose import already finished (inline task queue)"""
+    log = json.loads(batch.error_log) if batch.error_log else {}
+    errors = log.get('data_validation_errors', [])
+    
+    if batch.status == 'failed' and not errors:
+        return jsonify({
+            'success': False,
+            'batch_id': batch.id,
+            'message': f"Error processing file: {log.get('task_error', 'import failed')}"
+        }), 500
+    
+    if not batch.successful_records and errors:
+        return jsonify({
+            'success': False,
+            'batch_id': batch.id,
+            'message': 'No valid records found in the uploaded file',
+            'errors': errors[:10]  # Return first 10 errors
+        }), 400
+    
+    return jsonify({
+        'success': True,
+        'batch_id': batch.id,
+        'summary': {
+            'total_records': batch.total_records,
+            'successful_records': batch.successful_records,
+            'failed_records': batch.failed_records,
+            'invitation_emails_sent': batch.successful_records,
+            'rows_per_second': batch.rows_per_second
+        },
+        'errors': errors[:10],  # Return first 10 errors for review
+        'message': f'Processed {batch.successful_records} records successfully. Invitation emails are being sent.'
+    }), 200
 
 @data_import_bp.route('/data-import/upload', methods=['POST'])
 @require_role([UserRole.SUPER_ADMIN, UserRole.INSTITUTION_ADMIN])
 def upload_data():
-    """Upload and process alumni/student data from spreadsheet"""
+    """Upload alumni/student data from a spreadsheet and queue its import"""
     current_user = User.query.get(session.get('user_id'))
     
     # Check if file is present
@@ -327,146 +466,52 @@ def upload_data():
     if not institution:
         return jsonify({'success': False, 'message': 'Institution not found'}), 404
     
+    filename = secure_filename(file.filename)
+    file_path = None
+    queued = False
     try:
-        # Read file into dataframe
-        filename = secure_filename(file.filename)
-        
-        if filename.endswith('.csv'):
-            df = read_csv_file(file)
-        else:  # Excel file
-            df = read_excel_file(file)
-        
-        # Basic validation
-        if not df or (hasattr(df, 'empty') and df.empty) or len(df) == 0:
-            return jsonify({'success': False, 'message': 'File is empty'}), 400
-        
-        # Check required columns
-        missing_columns = validate_required_columns(df, user_type)
-        if missing_columns:
-            return jsonify({
-                'success': False,
-                'message': f'Missing required columns: {", ".join(missing_columns)}'
-            }), 400
-        
-        # Check institution user limits
-        potential_new_users = len(df)
-        if not institution.can_add_users(potential_new_users):
-            return jsonify({
-                'success': False,
-                'message': f'Adding {potential_new_users} users would exceed institution limit of {institution.max_users}'
-            }), 400
-        
-        # Clean and validate data
-        cleaned_data, errors = clean_and_validate_data(df, user_type)
-        
-        if not cleaned_data and errors:
-            return jsonify({
-                'success': False,
-                'message': 'No valid records found in the uploaded file',
-                'errors': errors[:10]  # Return first 10 errors
-            }), 400
+        # Keep the file for the import task; only its header and row count are read here
+        file_path = save_upload(file, filename)
+        with open(file_path, 'rb') as stream:
+            total_records, error = check_upload(open_rows(stream, filename), user_type, institution)
+        if error:
+            return jsonify({'success': False, 'message': error}), 400
         
-        # Create upload batch record
+        # Create upload batch record; it is queued in the same transaction
         batch = DataUploadBatch(
             institution_id=institution_id,
             batch_type=user_type,
             filename=filename,
-            total_records=len(df),
+            file_path=file_path,
+            file_hash=file_sha256(file_path),
+            total_records=total_records,
+            processed_records=0,
+            status='pending',
             uploaded_by=current_user.id
         )
         db.session.add(batch)
+        db.session.flush()
+        enqueue_import(batch)
         db.session.commit()
+        queued = True
+        get_task_queue().notify()
         
-        # Process valid records - create invite tokens
-        successful_invites = []
-        failed_invites = []
-        
-        for record in cleaned_data:
-            try:
-                # Check if user already exists
-                existing_user = User.query.filter_by(email=record['email']).first()
-                if existing_user:
-                    failed_invites.append({
-                        'email': record['email'],
-                        'error': 'User with this email already exists'
-                    })
-                    continue
-                
-                # Create invite token
-                graduation_year = record.get('graduation_year') or record.get('expected_graduation_year')
-                student_id = record.get('student_id', record['email'].split('@')[0])
-                
-                invite_token, raw_token = InviteToken.generate_token(
-                    institution_id=institution_id,
-                    email=record['email'],
-                    user_type=user_type,
-                    graduation_year=graduation_year,
-                    student_id=student_id,
-                    department=record['department'],
-                    profile_data=record,
-                    created_by=current_user.id,
-                    expires_in_days=30
-                )
-                
-                db.session.add(invite_token)
-                
-                successful_invites.append({
-                    'email': record['email'],
-                    'token': raw_token,
-                    'user_type': user_type
-                })
-                
-            except Exception as e:
-                failed_invites.append({
-                    'email': record['email'],
-                    'error': str(e)
-                })
-        
-        # Commit invite tokens
-        db.session.commit()
-        
-        # Update batch statistics
-        batch.successful_records = len(successful_invites)
-        batch.failed_records = len(failed_invites) + len(errors)
-        batch.processed_records = batch.total_records
-        batch.status = 'completed'
-        batch.processed_at = datetime.utcnow()
-        
-        if failed_invites or errors:
-            error_log = {
-                'data_validation_errors': errors,
-                'invite_creation_errors': failed_invites
-            }
-            batch.error_log = json.dumps(error_log)
-        
-        db.session.commit()
-        
-        # Send invitation emails asynchronously
-        if successful_invites:
-            # In production, you'd use a task queue like Celery
-            def send_invites():
-                send_bulk_invitations(successful_invites, institution.name)
-            
-            thread = threading.Thread(target=send_invites)
-            thread.daemon = True
-            thread.start()
+        if batch.status in ['completed', 'failed']:
+            return batch_result_response(batch)
         
         return jsonify({
             'success': True,
             'batch_id': batch.id,
-            'summary': {
-                'total_records': batch.total_records,
-                'successful_records': batch.successful_records,
-                'failed_records': batch.failed_records,
-                'invitation_emails_sent': len(successful_invites)
-            },
-            'errors': errors[:10] if errors else [],  # Return first 10 errors for review
-            'message': f'Processed {batch.successful_records} records successfully. Invitation emails are being sent.'
-        }), 200
+            'batch': batch.to_dict(),
+            'message': f'{total_records} records queued for import. Check the batch status for progress.'
+        }), 202
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': f'Error processing file: {str(e)}'}), 500
+    finally:
+        if file_path and not queued and os.path.exists(file_path):
+            os.remove(file_path)
 
 @data_import_bp.route('/data-import/template/<user_type>', methods=['GET'])
 @require_role([UserRole.SUPER_ADMIN, UserRole.INSTITUTION_ADMIN])
@@ -574,18 +619,37 @@ def retry_batch(batch_id):
     if batch.status not in ['failed', 'completed']:
         return jsonify({'success': False, 'message': 'Batch cannot be retried'}), 400
     
-    # Reset batch status
+    if not batch.file_path or not os.path.exists(batch.file_path):
+        return jsonify({'success': False, 'message': 'The uploaded file is no longer available. Please upload it again'}), 400
+    
+    # Queue the import again; it resumes from the batch's checkpoint
+    resume_row = batch.checkpoint_row or 0
     batch.status = 'pending'
     batch.processed_at = None
-    batch.error_log = None
+    enqueue_import(batch)
     db.session.commit()
+    get_task_queue().notify()
+    
+    if 0 < resume_row < batch.total_records:
+        message = f'Batch processing resumed from row {resume_row + 2}'
+    else:
+        message = 'Batch processing restarted'
     
-    # Start processing asynchronously
-    thread = threading.Thread(target=process_batch_async, args=(batch_id,))
-    thread.daemon = True
-    thread.start()
+    return jsonify({
+        'success': True,
+        'batch_id': batch.id,
+        'message': message
+    }), 200
+
+@data_import_bp.route('/data-import/tasks', methods=['GET'])
+@require_role([UserRole.SUPER_ADMIN])
+def get_task_queue_status():
+    """Background task queue depth, recent tasks and run times"""
+    queue = get_task_queue()
+    limit = min(request.args.get('limit', 50, type=int), 200)
     
     return jsonify({
         'success': True,
-        'message': 'Batch processing restarted'
+        'queue': queue.stats(),
+        'tasks': queue.recent(limit, status=request.args.get('status'))
     }), 200
@@ -1,12 +1,34 @@
 from flask import Blueprint, jsonify, request, session
 from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+import uuid
 from src.models.donation import Donation, DonationCampaign, db
 from src.models.user import User
 from src.models.alumni import Alumni
+from src.models.stats import StatCounter
+from src.utils.batch_loading import load_users_and_alumni
+from src.utils.dashboard_stats import donation_totals
+from src.utils.donation_queue import get_donation_queue
+from src.utils.http_cache import conditional_get
 
 donations_bp = Blueprint('donations', __name__)
 
+# Longest client-supplied transaction_id (the column holds 100 with the prefix)
+MAX_CLIENT_TRANSACTION_ID = 64
+
+def _transaction_id(user_id, supplied):
+    prefix = f"txn_{user_id}_"
+    if not supplied:
+        return prefix + uuid.uuid4().hex
+    supplied = str(supplied)
+    if supplied.startswith(prefix):
+        supplied = supplied[len(prefix):]
+    if len(supplied) > MAX_CLIENT_TRANSACTION_ID:
+        return None
+    return prefix + supplied
+
 @donations_bp.route('/campaigns', methods=['GET'])
+@conditional_get(DonationCampaign, Donation, max_age=30)
 def get_campaigns():
     category = request.args.get('category')
     status = request.args.get('status', 'active')
@@ -116,31 +138,96 @@ def make_donation():
     if not user_id:
         return jsonify({'success': False, 'message': 'Not authenticated'}), 401
     
-    data = request.json
-    
-    donation = Donation(
-        donor_id=user_id,
-        campaign_id=data.get('campaign_id'),
-        amount=float(data['amount']),
-        message=data.get('message'),
-        is_anonymous=data.get('is_anonymous', False),
-        payment_method=data.get('payment_method', 'credit_card'),
-        transaction_id=f"txn_{user_id}_{int(datetime.utcnow().timestamp())}"
-    )
+    data = request.json or {}
+    
+    try:
+        amount = float(data['amount'])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'A valid amount is required'}), 400
+    if amount <= 0:
+        return jsonify({'success': False, 'message': 'Amount must be positive'}), 400
+    
+    campaign_id = data.get('campaign_id')
+    if campaign_id and not db.session.query(DonationCampaign.id).filter_by(id=campaign_id).first():
+        return jsonify({'success': False, 'message': 'Campaign not found'}), 404
+    
+    # A client-supplied transaction_id makes retries idempotent; it is scoped
+    # to the donor so one user's ids can never clash with another's
+    transaction_id = _transaction_id(user_id, data.get('transaction_id'))
+    if transaction_id is None:
+        return jsonify({'success': False, 'message': 'transaction_id is too long'}), 400
+    
+    payload = {
+        'donor_id': user_id,
+        'campaign_id': campaign_id,
+        'amount': amount,
+        'message': data.get('message'),
+        'is_anonymous': data.get('is_anonymous', False),
+        'payment_method': data.get('payment_method', 'credit_card'),
+        'transaction_id': transaction_id,
+        'donated_at': datetime.utcnow().isoformat()
+    }
+    
+    # Buffered mode: journal locally and let the queue commit in batches
+    queue = get_donation_queue()
+    if queue is not None:
+        # A retry of an id that has already left the journal
+        replayed = data.get('transaction_id') and Donation.query.filter_by(transaction_id=transaction_id).first()
+        if replayed:
+            return jsonify({
+                'success': True,
+                'donation': replayed.to_dict(),
+                'message': 'Donation already received'
+            }), 200
+        if not queue.enqueue(payload):
+            return jsonify({
+                'success': True,
+                'donation': dict(payload, id=None, status='queued'),
+                'message': 'Donation already received'
+            }), 200
+        return jsonify({
+            'success': True,
+            'donation': dict(payload, id=None, status='queued'),
+            'message': 'Donation received'
+        }), 202
+    
+    existing = Donation.query.filter_by(transaction_id=transaction_id).first()
+    if existing:
+        return jsonify({
+            'success': True,
+            'donation': existing.to_dict(),
+            'message': 'Donation already received'
+        }), 200
+    
+    payload['donated_at'] = datetime.fromisoformat(payload['donated_at'])
+    donation = Donation(**payload)
     
     db.session.add(donation)
-    
-    # Update campaign current amount if campaign specified
+    try:
+        db.session.flush()
+    except IntegrityError:
+        # The same transaction_id was committed concurrently
+        db.session.rollback()
+        existing = Donation.query.filter_by(transaction_id=transaction_id).first()
+        return jsonify({
+            'success': True,
+            'donation': existing.to_dict() if existing else None,
+            'message': 'Donation already received'
+        }), 200
+    
+    # Update campaign current amount if campaign specified. Atomic increment
+    # rather than read-modify-write, issued last so the campaign row is
+    # locked only for the commit.
     if donation.campaign_id:
-        campaign = DonationCampaign.query.get(donation.campaign_id)
-        if campaign:
-            campaign.current_amount += donation.amount
+        DonationCampaign.add_to_total(donation.campaign_id, donation.amount)
     
+    # Serialised before the commit expires it, saving a reload per donation
+    donation_data = donation.to_dict()
     db.session.commit()
     
     return jsonify({
         'success': True,
-        'donation': donation.to_dict(),
+        'donation': donation_data,
         'message': 'Donation successful'
     }), 201
 
@@ -174,33 +261,38 @@ def get_my_donations():
     }), 200
 
 @donations_bp.route('/stats', methods=['GET'])
+# Keyed on the counters, not users/alumni: activity tracking rewrites those
+# tables constantly, and a new donation always moves a counter
+@conditional_get(StatCounter, DonationCampaign, max_age=30)
 def get_donation_stats():
-    # Total donations
-    total_donations = db.session.query(db.func.sum(Donation.amount)).filter_by(status='completed').scalar() or 0
-    
-    # Total donors
-    total_donors = db.session.query(db.func.count(db.func.distinct(Donation.donor_id))).filter_by(status='completed').scalar() or 0
+    # Totals are maintained counters (see utils/dashboard_stats)
+    totals = donation_totals()
     
-    # Active campaigns
-    active_campaigns = DonationCampaign.query.filter_by(status='active').count()
-    
-    # Recent donations
+    # Recent donations, served by ix_donation_status_donated_at
     recent_donations = Donation.query.filter_by(status='completed').order_by(Donation.donated_at.desc()).limit(5).all()
     
+    # Donors and campaigns in one IN query each, not per donation
+    users, alumni = load_users_and_alumni(d.donor_id for d in recent_donations if not d.is_anonymous)
+    campaign_ids = {d.campaign_id for d in recent_donations if d.campaign_id}
+    campaigns = {
+        campaign.id: campaign
+        for campaign in DonationCampaign.query.filter(DonationCampaign.id.in_(campaign_ids))
+    } if campaign_ids else {}
+    
     recent_donations_data = []
     for donation in recent_donations:
         donation_data = donation.to_dict()
         
         if not donation.is_anonymous:
-            donor = User.query.get(donation.donor_id)
-            alumni = Alumni.query.filter_by(user_id=donation.donor_id).first()
+            donor = users.get(donation.donor_id)
+            donor_alumni = alumni.get(donation.donor_id)
             
             donation_data['donor'] = donor.to_dict() if donor else None
-            donation_data['donor_alumni'] = alumni.to_dict() if alumni else None
+            donation_data['donor_alumni'] = donor_alumni.to_dict() if donor_alumni else None
         
         # Add campaign info
         if donation.campaign_id:
-            campaign = DonationCampaign.query.get(donation.campaign_id)
+            campaign = campaigns.get(donation.campaign_id)
             donation_data['campaign'] = campaign.to_dict() if campaign else None
         
         recent_donations_data.append(donation_data)
@@ -208,9 +300,9 @@ def get_donation_stats():
     return jsonify({
         'success': True,
         'stats': {
-            'total_donations': total_donations,
-            'total_donors': total_donors,
-            'active_campaigns': active_campaigns,
+            'total_donations': totals['total_donations'],
+            'total_donors': totals['total_donors'],
+            'active_campaigns': totals['active_campaigns'],
             'recent_donations': recent_donations_data
         }
     }), 200
@@ -1,11 +1,21 @@
 from flask import Blueprint, jsonify, request, session
 from datetime import datetime
+from sqlalchemy.exc import IntegrityError
 from src.models.event import Event, EventRegistration, db
 from src.models.user import User
+from src.utils.http_cache import conditional_get
+from src.utils.serializers import EVENT_SERIALIZER
 
 events_bp = Blueprint('events', __name__)
 
+def _upcoming_window():
+    # upcoming_only lists change as events start, not only on writes
+    if request.args.get('upcoming_only', 'false').lower() == 'true':
+        return int(datetime.utcnow().timestamp() // 60)
+    return None
+
 @events_bp.route('/events', methods=['GET'])
+@conditional_get(Event, max_age=30, vary=_upcoming_window)
 def get_events():
     # Get query parameters
     event_type = request.args.get('type')
@@ -24,18 +34,11 @@ def get_events():
     if upcoming_only:
         query = query.filter(Event.event_date >= datetime.utcnow())
     
-    events = query.order_by(Event.event_date.asc()).all()
+    serialize = EVENT_SERIALIZER.compile()
+    events = query.options(serialize.load_only()).order_by(Event.event_date.asc()).all()
     
-    # Add registration count for each event
-    events_data = []
-    for event in events:
-        event_dict = event.to_dict()
-        registration_count = EventRegistration.query.filter_by(
-            event_id=event.id, 
-            status='registered'
-        ).count()
-        event_dict['registration_count'] = registration_count
-        events_data.append(event_dict)
+    # registration_count is a maintained column, so no per-event COUNT
+    events_data = serialize.many(events)
     
     return jsonify({
         'success': True,
@@ -77,17 +80,10 @@ def create_event():
 def get_event(event_id):
     event = Event.query.get_or_404(event_id)
     
-    # Get registration count
-    registration_count = EventRegistration.query.filter_by(
-        event_id=event.id, 
-        status='registered'
-    ).count()
-    
     # Get organizer info
     organizer = User.query.get(event.organizer_id)
     
     event_data = event.to_dict()
-    event_data['registration_count'] = registration_count
     event_data['organizer'] = organizer.to_dict() if organizer else None
     
     # Check if current user is registered
@@ -99,6 +95,7 @@ def get_event(event_id):
         ).first()
         event_data['user_registered'] = registration is not None
         event_data['registration_status'] = registration.status if registration else None
+        event_data['waitlist_position'] = registration.waitlist_position() if registration else None
     
     return jsonify({
         'success': True,
@@ -125,19 +122,6 @@ def register_for_event(event_id):
             'message': 'Already registered for this event'
         }), 400
     
-    # Check if event is full
-    if event.max_attendees:
-        current_registrations = EventRegistration.query.filter_by(
-            event_id=event_id,
-            status='registered'
-        ).count()
-        
-        if current_registrations >= event.max_attendees:
-            return jsonify({
-                'success': False,
-                'message': 'Event is full'
-            }), 400
-    
     # Check registration deadline
     if event.registration_deadline and datetime.utcnow() > event.registration_deadline:
         return jsonify({
@@ -145,15 +129,34 @@ def register_for_event(event_id):
             'message': 'Registration deadline has passed'
         }), 400
     
-    # Create registration
-    registration = EventRegistration(
-        event_id=event_id,
-        user_id=user_id
-    )
+    # Reserve a seat atomically; once the event is full join the waitlist.
+    # The savepoint undoes the reservation if a concurrent request from the
+    # same user won the unique (event_id, user_id) insert.
+    try:
+        with db.session.begin_nested():
+            status = 'registered' if Event.reserve_seat(event_id) else 'waitlisted'
+            registration = EventRegistration(
+                event_id=event_id,
+                user_id=user_id,
+                status=status
+            )
+            db.session.add(registration)
+    except IntegrityError:
+        return jsonify({
+            'success': False, 
+            'message': 'Already registered for this event'
+        }), 400
     
-    db.session.add(registration)
     db.session.commit()
     
+    if registration.status == 'waitlisted':
+        return jsonify({
+            'success': True,
+            'registration': registration.to_dict(),
+            'waitlist_position': registration.waitlist_position(),
+            'message': 'Event is full, you have been added to the waitlist'
+        }), 201
+    
     return jsonify({
         'success': True,
         'registration': registration.to_dict(),
@@ -166,18 +169,25 @@ def unregister_from_event(event_id):
     if not user_id:
         return jsonify({'success': False, 'message': 'Not authenticated'}), 401
     
-    registration = EventRegistration.query.filter_by(
-        event_id=event_id,
-        user_id=user_id
-    ).first()
-    
-    if not registration:
+    # DELETE ... RETURNING reports the status the row had when it was removed,
+    # even if a concurrent unregister promoted it off the waitlist meanwhile
+    deleted_status = db.session.execute(
+        db.delete(EventRegistration).where(
+            EventRegistration.event_id == event_id,
+            EventRegistration.user_id == user_id
+        ).returning(EventRegistration.status)
+    ).scalar()
+    
+    if deleted_status is None:
+        db.session.rollback()
         return jsonify({
             'success': False,
             'message': 'Not registered for this event'
         }), 404
     
-    db.session.delete(registration)
+    if deleted_status == 'registered':
+        Event.adjust_registration_count(event_id, -1)
+        EventRegistration.promote_from_waitlist(event_id)
     db.session.commit()
     
     return jsonify({
@@ -223,18 +233,18 @@ def get_my_events():
         return jsonify({'success': False, 'message': 'Not authenticated'}), 401
     
     # Get events user is registered for
-    registrations = EventRegistration.query.filter_by(
-        user_id=user_id,
-        status='registered'
+    registrations = db.session.query(EventRegistration, Event).join(
+        Event, Event.id == EventRegistration.event_id
+    ).filter(
+        EventRegistration.user_id == user_id,
+        EventRegistration.status == 'registered'
     ).all()
     
     registered_events = []
-    for reg in registrations:
-        event = Event.query.get(reg.event_id)
-        if event:
-            event_data = event.to_dict()
-            event_data['registration_date'] = reg.registration_date.isoformat()
-            registered_events.append(event_data)
+    for reg, event in registrations:
+        event_data = event.to_dict()
+        event_data['registration_date'] = reg.registration_date.isoformat()
+        registered_events.append(event_data)
     
     # Get events organized by user
     organized_events = Event.query.filter_by(organizer_id=user_id).all()
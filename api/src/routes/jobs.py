@@ -3,6 +3,13 @@ from datetime import datetime
 from src.models.job import Job, JobApplication, db
 from src.models.user import User
 from src.models.alumni import Alumni
+from src.utils.batch_loading import load_users_and_alumni
+from src.utils.pagination import InvalidCursor, keyset_page, parse_limit
+from src.utils.serializers import ALUMNI_SERIALIZER, JOB_SERIALIZER, USER_SERIALIZER, FieldSelection, InvalidFields
+
+# Keys /jobs adds beyond the job itself, selectable with ?fields=
+JOB_LIST_RELATIONS = {'posted_by_user': USER_SERIALIZER, 'posted_by_alumni': ALUMNI_SERIALIZER}
+JOB_LIST_EXTRAS = ('application_count', 'user_applied', 'application_status')
 
 jobs_bp = Blueprint('jobs', __name__)
 
@@ -39,40 +46,88 @@ def get_jobs():
     if status != 'all':
         query = query.filter(Job.status == status)
     
-    jobs = query.order_by(Job.created_at.desc()).all()
+    try:
+        selection = FieldSelection.parse(
+            request.args.get('fields'), JOB_SERIALIZER, JOB_LIST_RELATIONS, JOB_LIST_EXTRAS
+        )
+    except InvalidFields as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    serialize_job = JOB_SERIALIZER.compile(only=selection.only)
+    serialize_user = USER_SERIALIZER.compile(only=selection.nested('posted_by_user'))
+    serialize_alumni = ALUMNI_SERIALIZER.compile(only=selection.nested('posted_by_alumni'))
+    query = query.options(serialize_job.load_only(Job.created_at, Job.id, Job.posted_by))
+    
+    limit = parse_limit(request.args.get('limit'))
+    try:
+        jobs, next_cursor = keyset_page(
+            query, (Job.created_at, Job.id),
+            cursor=request.args.get('cursor'), limit=limit, descending=True
+        )
+    except InvalidCursor as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    job_ids = [job.id for job in jobs]
+    
+    # Poster info for the whole page
+    include_poster = selection.wants('posted_by_user') or selection.wants('posted_by_alumni')
+    posters, poster_alumni = load_users_and_alumni(
+        (job.posted_by for job in jobs),
+        user_options=[serialize_user.load_only()],
+        alumni_options=[serialize_alumni.load_only(Alumni.user_id)]
+    ) if include_poster else ({}, {})
+    
+    # Application counts in one grouped query
+    application_counts = dict(
+        db.session.query(JobApplication.job_id, db.func.count(JobApplication.id))
+        .filter(JobApplication.job_id.in_(job_ids))
+        .group_by(JobApplication.job_id)
+    ) if job_ids and selection.wants('application_count') else {}
+    
+    # The current user's applications to any job on this page
+    user_id = session.get('user_id')
+    include_user_application = user_id and (selection.wants('user_applied') or selection.wants('application_status'))
+    user_applications = {}
+    if include_user_application and job_ids:
+        user_applications = {
+            application.job_id: application
+            for application in JobApplication.query.filter(
+                JobApplication.applicant_id == user_id,
+                JobApplication.job_id.in_(job_ids)
+            )
+        }
     
-    # Add poster info and application count
     jobs_data = []
     for job in jobs:
-        job_data = job.to_dict()
-        
-        # Get poster info
-        poster = User.query.get(job.posted_by)
-        alumni = Alumni.query.filter_by(user_id=job.posted_by).first()
+        job_data = serialize_job(job)
         
-        job_data['posted_by_user'] = poster.to_dict() if poster else None
-        job_data['posted_by_alumni'] = alumni.to_dict() if alumni else None
+        if selection.wants('posted_by_user'):
+            poster = posters.get(job.posted_by)
+            job_data['posted_by_user'] = serialize_user(poster) if poster else None
+        if selection.wants('posted_by_alumni'):
+            alumni = poster_alumni.get(job.posted_by)
+            job_data['posted_by_alumni'] = serialize_alumni(alumni) if alumni else None
         
-        # Get application count
-        application_count = JobApplication.query.filter_by(job_id=job.id).count()
-        job_data['application_count'] = application_count
+        if selection.wants('application_count'):
+            job_data['application_count'] = application_counts.get(job.id, 0)
         
-        # Check if current user has applied
-        user_id = session.get('user_id')
-        if user_id:
-            user_application = JobApplication.query.filter_by(
-                job_id=job.id,
-                applicant_id=user_id
-            ).first()
-            job_data['user_applied'] = user_application is not None
-            job_data['application_status'] = user_application.status if user_application else None
+        if include_user_application:
+            user_application = user_applications.get(job.id)
+            if selection.wants('user_applied'):
+                job_data['user_applied'] = user_application is not None
+            if selection.wants('application_status'):
+                job_data['application_status'] = user_application.status if user_application else None
         
         jobs_data.append(job_data)
     
     return jsonify({
         'success': True,
         'jobs': jobs_data,
-        'total': len(jobs_data)
+        'total': len(jobs_data),
+        'pagination': {
+            'limit': limit,
+            'next_cursor': next_cursor,
+            'has_next': next_cursor is not None
+        }
     }), 200
 
 @jobs_bp.route('/jobs', methods=['POST'])
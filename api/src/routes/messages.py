@@ -1,7 +1,15 @@
 from flask import Blueprint, jsonify, request, session
-from src.models.message import Message, ForumPost, db
+from src.models.message import Message, ForumPost, Conversation, ConversationParticipant, db
 from src.models.user import User
 from src.models.alumni import Alumni
+from src.utils.batch_loading import load_users_and_alumni
+from src.utils.pagination import keyset_filter, parse_limit
+from src.utils.serializers import (
+    ALUMNI_SERIALIZER, FORUM_POST_SERIALIZER, MESSAGE_SERIALIZER, USER_SERIALIZER, FieldSelection, InvalidFields
+)
+
+# Nested objects /forum/posts attaches to each post, selectable with ?fields=
+FORUM_POST_RELATIONS = {'author': USER_SERIALIZER, 'author_alumni': ALUMNI_SERIALIZER}
 
 messages_bp = Blueprint('messages', __name__)
 
@@ -11,46 +19,45 @@ def get_messages():
     if not user_id:
         return jsonify({'success': False, 'message': 'Not authenticated'}), 401
     
-    # Get messages where user is sender or recipient
-    messages = Message.query.filter(
-        (Message.sender_id == user_id) | (Message.recipient_id == user_id)
-    ).order_by(Message.created_at.desc()).all()
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
     
-    # Group messages by conversation
-    conversations = {}
-    for message in messages:
-        other_user_id = message.sender_id if message.recipient_id == user_id else message.recipient_id
-        
-        if other_user_id not in conversations:
-            other_user = User.query.get(other_user_id)
-            alumni = Alumni.query.filter_by(user_id=other_user_id).first()
-            
-            conversations[other_user_id] = {
-                'user': other_user.to_dict() if other_user else None,
-                'alumni': alumni.to_dict() if alumni else None,
-                'messages': [],
-                'unread_count': 0,
-                'last_message_date': None
-            }
-        
-        message_data = message.to_dict()
-        conversations[other_user_id]['messages'].append(message_data)
-        
-        # Count unread messages
-        if message.recipient_id == user_id and not message.is_read:
-            conversations[other_user_id]['unread_count'] += 1
-        
-        # Update last message date
-        if not conversations[other_user_id]['last_message_date'] or message.created_at > conversations[other_user_id]['last_message_date']:
-            conversations[other_user_id]['last_message_date'] = message.created_at
+    # Inbox rows come straight off the (user_id, last_activity) index
+    participants = ConversationParticipant.query.filter_by(user_id=user_id).order_by(
+        ConversationParticipant.last_activity.desc(), ConversationParticipant.id.desc()
+    ).offset((page - 1) * per_page).limit(per_page + 1).all()
+    has_next = len(participants) > per_page
+    participants = participants[:per_page]
+    
+    # Batch-load last messages and counterpart profiles
+    conversation_ids = [p.conversation_id for p in participants]
+    other_user_ids = [p.other_user_id for p in participants]
+    conversations = {c.id: c for c in Conversation.query.filter(Conversation.id.in_(conversation_ids))} if conversation_ids else {}
+    users, alumni = load_users_and_alumni(other_user_ids)
     
-    # Convert to list and sort by last message date
-    conversations_list = list(conversations.values())
-    conversations_list.sort(key=lambda x: x['last_message_date'] or '', reverse=True)
+    conversations_list = []
+    for participant in participants:
+        conversation = conversations.get(participant.conversation_id)
+        last_message = conversation.last_message if conversation else None
+        other_user = users.get(participant.other_user_id)
+        other_alumni = alumni.get(participant.other_user_id)
+        conversations_list.append({
+            'user': other_user.to_dict() if other_user else None,
+            'alumni': other_alumni.to_dict() if other_alumni else None,
+            'last_message': last_message.to_dict() if last_message else None,
+            'unread_count': participant.unread_count or 0,
+            'last_message_date': participant.last_activity.isoformat() if participant.last_activity else None
+        })
     
     return jsonify({
         'success': True,
-        'conversations': conversations_list
+        'conversations': conversations_list,
+        'pagination': {
+            'page': page,
+            'per_page': per_page,
+            'has_next': has_next,
+            'has_prev': page > 1
+        }
     }), 200
 
 @messages_bp.route('/messages/conversation/<int:other_user_id>', methods=['GET'])
@@ -59,19 +66,49 @@ def get_conversation(other_user_id):
     if not user_id:
         return jsonify({'success': False, 'message': 'Not authenticated'}), 401
     
-    # Get messages between current user and other user
-    messages = Message.query.filter(
+    limit = parse_limit(request.args.get('limit'))
+    before_id = request.args.get('before', type=int)
+    after_id = request.args.get('after', type=int)
+    
+    query = Message.query.filter(
         ((Message.sender_id == user_id) & (Message.recipient_id == other_user_id)) |
         ((Message.sender_id == other_user_id) & (Message.recipient_id == user_id))
-    ).order_by(Message.created_at.asc()).all()
-    
-    # Mark messages as read
-    Message.query.filter(
-        (Message.sender_id == other_user_id) & 
-        (Message.recipient_id == user_id) & 
-        (Message.is_read == False)
-    ).update({'is_read': True})
-    db.session.commit()
+    )
+    columns = (Message.created_at, Message.id)
+    
+    # Page relative to an anchor message: ?after= walks forward (newer), otherwise
+    # walk backwards from ?before= or from the newest message
+    anchor_id = after_id or before_id
+    if anchor_id:
+        anchor = query.filter(Message.id == anchor_id).first()
+        if not anchor:
+            return jsonify({'success': False, 'message': 'Cursor message not found in this conversation'}), 400
+        query = query.filter(keyset_filter(columns, (anchor.created_at, anchor.id), descending=not after_id))
+    
+    if after_id:
+        messages = query.order_by(Message.created_at.asc(), Message.id.asc()).limit(limit + 1).all()
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+    else:
+        messages = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1).all()
+        has_more = len(messages) > limit
+        messages = list(reversed(messages[:limit]))
+    
+    # Serialise before the commit below expires every loaded message
+    messages_data = MESSAGE_SERIALIZER.compile().many(messages)
+    
+    # Mark only the delivered page as read
+    unread_ids = [m.id for m in messages if m.recipient_id == user_id and not m.is_read]
+    if unread_ids:
+        marked = Message.query.filter(
+            Message.id.in_(unread_ids),
+            Message.is_read == False
+        ).update({'is_read': True}, synchronize_session=False)
+        ConversationParticipant.mark_read(user_id, other_user_id, marked)
+        db.session.commit()
+        for message_data in messages_data:
+            if message_data['id'] in unread_ids:
+                message_data['is_read'] = True
     
     # Get other user info
     other_user = User.query.get(other_user_id)
@@ -79,9 +116,16 @@ def get_conversation(other_user_id):
     
     return jsonify({
         'success': True,
-        'messages': [msg.to_dict() for msg in messages],
+        'messages': messages_data,
         'other_user': other_user.to_dict() if other_user else None,
-        'other_user_alumni': alumni.to_dict() if alumni else None
+        'other_user_alumni': alumni.to_dict() if alumni else None,
+        'pagination': {
+            'limit': limit,
+            'direction': 'newer' if after_id else 'older',
+            'has_more': has_more,
+            'oldest_id': messages_data[0]['id'] if messages_data else None,
+            'newest_id': messages_data[-1]['id'] if messages_data else None
+        }
     }), 200
 
 @messages_bp.route('/messages', methods=['POST'])
@@ -101,6 +145,7 @@ def send_message():
     )
     
     db.session.add(message)
+    Conversation.record_message(message)
     db.session.commit()
     
     # Emit the message to WebSocket clients via global socketio
@@ -153,7 +198,9 @@ def mark_message_read(message_id):
     if message.recipient_id != user_id:
         return jsonify({'success': False, 'message': 'Unauthorized'}), 403
     
-    message.is_read = True
+    if not message.is_read:
+        message.is_read = True
+        ConversationParticipant.mark_read(user_id, message.sender_id, 1)
     db.session.commit()
     
     return jsonify({
@@ -171,17 +218,35 @@ def get_forum_posts():
     if category and category != 'all':
         query = query.filter(ForumPost.category == category)
     
-    posts = query.order_by(ForumPost.created_at.desc()).all()
+    try:
+        selection = FieldSelection.parse(request.args.get('fields'), FORUM_POST_SERIALIZER, FORUM_POST_RELATIONS)
+    except InvalidFields as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    serialize_post = FORUM_POST_SERIALIZER.compile(only=selection.only)
+    serialize_user = USER_SERIALIZER.compile(only=selection.nested('author'))
+    serialize_alumni = ALUMNI_SERIALIZER.compile(only=selection.nested('author_alumni'))
+    
+    posts = query.options(
+        serialize_post.load_only(ForumPost.created_at, ForumPost.author_id)
+    ).order_by(ForumPost.created_at.desc()).all()
+    
+    # Author info for every post in two queries
+    include_author = selection.wants('author') or selection.wants('author_alumni')
+    authors, author_alumni = load_users_and_alumni(
+        (post.author_id for post in posts),
+        user_options=[serialize_user.load_only()],
+        alumni_options=[serialize_alumni.load_only(Alumni.user_id)]
+    ) if include_author else ({}, {})
     
-    # Add author info to each post
     posts_data = []
     for post in posts:
-        post_data = post.to_dict()
-        author = User.query.get(post.author_id)
-        alumni = Alumni.query.filter_by(user_id=post.author_id).first()
-        
-        post_data['author'] = author.to_dict() if author else None
-        post_data['author_alumni'] = alumni.to_dict() if alumni else None
+        post_data = serialize_post(post)
+        if selection.wants('author'):
+            author = authors.get(post.author_id)
+            post_data['author'] = serialize_user(author) if author else None
+        if selection.wants('author_alumni'):
+            alumni = author_alumni.get(post.author_id)
+            post_data['author_alumni'] = serialize_alumni(alumni) if alumni else None
         posts_data.append(post_data)
     
     return jsonify({
@@ -233,10 +298,7 @@ def get_unread_count():
     if not user_id:
         return jsonify({'success': False, 'message': 'Not authenticated'}), 401
     
-    unread_count = Message.query.filter_by(
-        recipient_id=user_id,
-        is_read=False
-    ).count()
+    unread_count = ConversationParticipant.total_unread(user_id)
     
     return jsonify({
         'success': True,
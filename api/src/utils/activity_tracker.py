@@ -0,0 +1,221 @@
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime
+from flask import current_app, has_app_context
+from sqlalchemy import bindparam, func, or_
+from src.models.user import db, User
+from src.models.alumni import Alumni
+from src.utils.metrics import LATENCY_BUCKETS, Histogram, metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_SECONDS = 10
+# Pending users at which a flush is started without waiting for the interval
+DEFAULT_MAX_PENDING = 5000
+
+users_table = User.__table__
+alumni_table = Alumni.__table__
+
+# Each statement is run once per batch with executemany. The "only move
+# forwards" conditions keep a slow worker from overwriting a newer value.
+TOUCH_USERS = users_table.update().where(
+    users_table.c.id == bindparam('user_id'),
+    or_(users_table.c.last_active.is_(None), users_table.c.last_active < bindparam('active_at'))
+).values(last_active=bindparam('active_at'))
+
+RECORD_LOGINS = users_table.update().where(
+    users_table.c.id == bindparam('user_id')
+).values(
+    last_login=bindparam('login_at'),
+    login_count=func.coalesce(users_table.c.login_count, 0) + bindparam('logins'),
+    last_ip=func.coalesce(bindparam('ip_address'), users_table.c.last_ip)
+)
+
+TOUCH_ALUMNI = alumni_table.update().where(
+    alumni_table.c.id == bindparam('row_id'),
+    or_(alumni_table.c.last_profile_update.is_(None),
+        alumni_table.c.last_profile_update < bindparam('touched_at'))
+).values(last_profile_update=bindparam('touched_at'))
+
+
+class ActivityTracker:
+    """Write-behind buffer for last_active, last_login and alumni activity.
+
+    Timestamps are coalesced per user in memory (only the newest survives,
+    login counts are summed) and written by a background thread every
+    ``flush_interval`` seconds, when the backlog passes ``max_pending``, and
+    at interpreter exit. With ``flush_interval`` 0 every record is written
+    straight away, for hosts that freeze the process between requests.
+    """
+
+    def __init__(self, app=None, flush_interval=DEFAULT_FLUSH_SECONDS, max_pending=DEFAULT_MAX_PENDING):
+        self.app = app
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._active = {}    # user id -> last_active
+        self._logins = {}    # user id -> [last_login, count, ip_address]
+        self._alumni = {}    # alumni id -> last_profile_update
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+        self.flushes = 0
+        self.failures = 0
+        self.rows_written = 0
+        self.flush_latency = Histogram(
+            'activity_flush_duration_seconds', 'Time to write one batch of activity timestamps',
+            LATENCY_BUCKETS, label_names=()
+        )
+
+    @property
+    def backlog(self):
+        return len(self._active) + len(self._logins) + len(self._alumni)
+
+    def record_active(self, user_id, when=None):
+        when = when or datetime.utcnow()
+        with self._lock:
+            if self._active.get(user_id) is None or self._active[user_id] < when:
+                self._active[user_id] = when
+        self._after_record()
+
+    def record_login(self, user_id, ip_address=None, when=None):
+        when = when or datetime.utcnow()
+        with self._lock:
+            pending = self._logins.get(user_id)
+            if pending is None:
+                self._logins[user_id] = [when, 1, ip_address]
+            else:
+                pending[0] = max(pending[0], when)
+                pending[1] += 1
+                pending[2] = ip_address or pending[2]
+            if self._active.get(user_id) is None or self._active[user_id] < when:
+                self._active[user_id] = when
+        self._after_record()
+
+    def record_alumni_activity(self, alumni_id, when=None):
+        when = when or datetime.utcnow()
+        with self._lock:
+            if self._alumni.get(alumni_id) is None or self._alumni[alumni_id] < when:
+                self._alumni[alumni_id] = when
+        self._after_record()
+
+    def _after_record(self):
+        if not self.flush_interval:
+            self.flush()
+        elif self.backlog >= self.max_pending:
+            self._wake.set()
+        elif self._thread is None:
+            self.start()
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of rows updated"""
+        with self._flush_lock:
+            with self._lock:
+                active, self._active = self._active, {}
+                logins, self._logins = self._logins, {}
+                alumni, self._alumni = self._alumni, {}
+            if not (active or logins or alumni):
+                return 0
+
+            started = time.perf_counter()
+            try:
+                with db.engine.begin() as connection:
+                    written = 0
+                    if logins:
+                        written += connection.execute(RECORD_LOGINS, [
+                            {'user_id': user_id, 'login_at': login_at, 'logins': count, 'ip_address': ip_address}
+                            for user_id, (login_at, count, ip_address) in logins.items()
+                        ]).rowcount
+                    if active:
+                        written += connection.execute(TOUCH_USERS, [
+                            {'user_id': user_id, 'active_at': active_at} for user_id, active_at in active.items()
+                        ]).rowcount
+                    if alumni:
+                        written += connection.execute(TOUCH_ALUMNI, [
+                            {'row_id': alumni_id, 'touched_at': updated_at} for alumni_id, updated_at in alumni.items()
+                        ]).rowcount
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Activity flush of {len(active) + len(logins) + len(alumni)} records failed: {e}")
+                self._requeue(active, logins, alumni)
+                return 0
+
+            self.flushes += 1
+            self.rows_written += max(written, 0)
+            self.flush_latency.observe(time.perf_counter() - started)
+            return written
+
+    def _requeue(self, active, logins, alumni):
+        with self._lock:
+            for user_id, active_at in active.items():
+                if self._active.get(user_id) is None or self._active[user_id] < active_at:
+                    self._active[user_id] = active_at
+            for user_id, (login_at, count, ip_address) in logins.items():
+                pending = self._logins.setdefault(user_id, [login_at, 0, ip_address])
+                pending[0] = max(pending[0], login_at)
+                pending[1] += count
+                pending[2] = pending[2] or ip_address
+            for alumni_id, updated_at in alumni.items():
+                if self._alumni.get(alumni_id) is None or self._alumni[alumni_id] < updated_at:
+                    self._alumni[alumni_id] = updated_at
+
+    def start(self):
+        """Start the background flusher (idempotent)"""
+        with self._lock:
+            if self._thread is not None or not self.flush_interval or self.app is None:
+                return
+            self._thread = threading.Thread(target=self._run, name='activity-tracker', daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            with self.app.app_context():
+                self.flush()
+
+    def shutdown(self):
+        """Write out whatever is still buffered"""
+        if self.app is not None and self.backlog:
+            with self.app.app_context():
+                self.flush()
+
+    def stats(self):
+        return {
+            'backlog': self.backlog,
+            'flush_interval': self.flush_interval,
+            'flushes': self.flushes,
+            'failures': self.failures,
+            'rows_written': self.rows_written
+        }
+
+
+# Used outside an app (scripts, shells): write through immediately
+_fallback_tracker = ActivityTracker(flush_interval=0)
+
+
+def init_activity_tracker(app):
+    """Install the activity tracker on ``app`` and publish its metrics"""
+    tracker = ActivityTracker(
+        app,
+        flush_interval=app.config.get('ACTIVITY_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS),
+        max_pending=app.config.get('ACTIVITY_MAX_PENDING', DEFAULT_MAX_PENDING)
+    )
+    app.extensions['activity_tracker'] = tracker
+
+    metrics.register(tracker.flush_latency)
+    metrics.register_gauge('activity_tracker_backlog', 'Activity records waiting to be written', lambda: tracker.backlog)
+    metrics.register_gauge('activity_tracker_flushes', 'Activity batches written', lambda: tracker.flushes)
+    metrics.register_gauge('activity_tracker_failures', 'Activity batches that failed and were re-queued', lambda: tracker.failures)
+    return tracker
+
+
+def get_activity_tracker():
+    """Return the activity tracker installed on the current app"""
+    if not has_app_context():
+        return _fallback_tracker
+    return current_app.extensions.get('activity_tracker', _fallback_tracker)
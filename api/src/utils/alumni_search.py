@@ -0,0 +1,388 @@
+import json
+import logging
+import re
+import threading
+import time
+from flask import current_app, has_app_context
+from sqlalchemy import String, cast, event, inspect, text
+from sqlalchemy.orm import Session
+from src.models.user import db
+from src.models.alumni import Alumni
+from src.utils.search_index import AlumniSearchIndex
+
+logger = logging.getLogger(__name__)
+
+# Alumni attributes that make up the searchable document
+SEARCH_FIELDS = ['first_name', 'last_name', 'current_company', 'current_position', 'department', 'skills']
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(value):
+    """Split free text into lower-cased word tokens"""
+    return TOKEN_PATTERN.findall((value or '').lower())
+
+
+def normalise_skills(skills):
+    """Flatten the skills JSON column into a list of skill names.
+
+    Skills have been stored as a list of strings, a list of
+    ``{"name": ..., "level": ...}`` dicts and, for older rows, a JSON encoded
+    string, so accept all three.
+    """
+    if not skills:
+        return []
+    if isinstance(skills, str):
+        try:
+            skills = json.loads(skills)
+        except ValueError:
+            return [s.strip() for s in skills.split(',') if s.strip()]
+    if isinstance(skills, dict):
+        skills = [skills]
+    if not isinstance(skills, list):
+        return [str(skills)]
+
+    names = []
+    for skill in skills:
+        if isinstance(skill, dict):
+            skill = skill.get('name') or skill.get('skill')
+        if skill:
+            names.append(str(skill).strip())
+    return names
+
+
+def alumni_document(alumni):
+    """Build the plain-text search document for an alumni profile"""
+    parts = [getattr(alumni, field) for field in SEARCH_FIELDS if field != 'skills']
+    parts.extend(normalise_skills(alumni.skills))
+    return ' '.join(str(part) for part in parts if part)
+
+
+class LikeSearchBackend:
+    """Fallback engine: OR of ILIKE '%term%' over the searchable columns.
+
+    Cannot use an index, so it is only used when no real engine is available.
+    """
+    name = 'like'
+
+    def install(self, connection):
+        return True
+
+    def sync(self, connection, alumni):
+        pass
+
+    def remove(self, connection, alumni_id):
+        pass
+
+    def apply(self, query, term, ranked=False):
+        """Restrict ``query`` to alumni matching ``term``, best matches first if ``ranked``"""
+        pattern = f'%{term}%'
+        return query.filter(
+            Alumni.first_name.ilike(pattern) |
+            Alumni.last_name.ilike(pattern) |
+            Alumni.current_company.ilike(pattern) |
+            Alumni.current_position.ilike(pattern) |
+            # skills is JSON; PostgreSQL has no ILIKE for json, so match its text
+            cast(Alumni.skills, String).ilike(pattern)
+        )
+
+    def stats(self):
+        return {'backend': self.name}
+
+
+class PostgresSearchBackend(LikeSearchBackend):
+    """tsvector + GIN full-text search, with pg_trgm for typo-tolerant name matching.
+
+    The tsvector is an expression index over the profile columns, so PostgreSQL
+    keeps it in sync on every INSERT/UPDATE without any application hooks.
+    """
+    name = 'postgres'
+
+    DOCUMENT_SQL = (
+        "coalesce(alumni.first_name, '') || ' ' || coalesce(alumni.last_name, '') || ' ' || "
+        "coalesce(alumni.current_company, '') || ' ' || coalesce(alumni.current_position, '') || ' ' || "
+        "coalesce(alumni.department, '') || ' ' || coalesce(alumni.skills::text, '')"
+    )
+    VECTOR_SQL = f"to_tsvector('simple'::regconfig, {DOCUMENT_SQL})"
+    NAME_SQL = "lower(alumni.first_name || ' ' || alumni.last_name)"
+
+    # Minimum pg_trgm similarity for a fuzzy name match.  Applied through the
+    # ``%`` operator (which ix_alumni_name_trgm can serve) rather than
+    # ``similarity() >=``, which no index can.
+    SIMILARITY_THRESHOLD = 0.3
+
+    def __init__(self):
+        self.trigram_enabled = False
+
+    def install(self, connection):
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS ix_alumni_search_vector ON alumni USING GIN ({self.VECTOR_SQL})"
+        ))
+        try:
+            with connection.begin_nested():
+                connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                connection.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_alumni_name_trgm ON alumni USING GIN (({self.NAME_SQL}) gin_trgm_ops)"
+                ))
+            self.trigram_enabled = True
+        except Exception as e:
+            logger.warning(f"pg_trgm unavailable, fuzzy name matching disabled: {e}")
+        return True
+
+    def apply(self, query, term, ranked=False):
+        tokens = tokenize(term)
+        if not tokens:
+            return super().apply(query, term, ranked)
+
+        vector = db.literal_column(self.VECTOR_SQL)
+        tsquery = db.func.to_tsquery('simple', ' & '.join(f'{token}:*' for token in tokens))
+        match = vector.op('@@')(tsquery)
+        rank = db.func.ts_rank(vector, tsquery)
+
+        if self.trigram_enabled:
+            # Transaction-local equivalent of SET LOCAL, so both predicates are
+            # indexable and the planner can BitmapOr the two GIN indexes
+            query.session.execute(
+                text("SELECT set_config('pg_trgm.similarity_threshold', :threshold, true)"),
+                {'threshold': str(self.SIMILARITY_THRESHOLD)}
+            )
+            name = db.literal_column(self.NAME_SQL)
+            phrase = ' '.join(tokens)
+            match = match | name.op('%')(phrase)
+            rank = rank + db.func.similarity(name, phrase)
+
+        query = query.filter(match)
+        if ranked:
+            query = query.order_by(rank.desc(), Alumni.id)
+        return query
+
+    def stats(self):
+        return {'backend': self.name, 'trigram_enabled': self.trigram_enabled}
+
+
+class SqliteFtsSearchBackend(LikeSearchBackend):
+    """SQLite FTS5 index for local development.
+
+    The ``alumni_fts`` virtual table is keyed by alumni id and kept in sync by
+    the mapper hooks registered below, inside the same transaction as the
+    write to ``alumni``.
+    """
+    name = 'sqlite_fts'
+
+    def install(self, connection):
+        try:
+            connection.execute(text(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS alumni_fts "
+                "USING fts5(document, tokenize='unicode61 remove_diacritics 2')"
+            ))
+        except Exception as e:
+            logger.warning(f"SQLite FTS5 unavailable, falling back to LIKE search: {e}")
+            return False
+
+        indexed = connection.execute(text("SELECT count(*) FROM alumni_fts")).scalar()
+        if not indexed:
+            self.rebuild(connection)
+        return True
+
+    def rebuild(self, connection):
+        """Re-index every alumni profile"""
+        connection.execute(text("DELETE FROM alumni_fts"))
+        rows = connection.execute(db.select(Alumni.__table__)).mappings()
+        batch = []
+        for row in rows:
+            batch.append({'id': row['id'], 'document': alumni_document(_RowView(row))})
+            if len(batch) >= 1000:
+                connection.execute(text("INSERT INTO alumni_fts(rowid, document) VALUES (:id, :document)"), batch)
+                batch = []
+        if batch:
+            connection.execute(text("INSERT INTO alumni_fts(rowid, document) VALUES (:id, :document)"), batch)
+
+    def sync(self, connection, alumni):
+        self.remove(connection, alumni.id)
+        connection.execute(
+            text("INSERT INTO alumni_fts(rowid, document) VALUES (:id, :document)"),
+            {'id': alumni.id, 'document': alumni_document(alumni)}
+        )
+
+    def remove(self, connection, alumni_id):
+        connection.execute(text("DELETE FROM alumni_fts WHERE rowid = :id"), {'id': alumni_id})
+
+    def apply(self, query, term, ranked=False):
+        tokens = tokenize(term)
+        if not tokens:
+            return super().apply(query, term, ranked)
+
+        hits = text(
+            "SELECT rowid AS alumni_id, bm25(alumni_fts) AS rank FROM alumni_fts WHERE alumni_fts MATCH :match"
+        ).bindparams(
+            match=' '.join(f'"{token}"*' for token in tokens)
+        ).columns(alumni_id=db.Integer, rank=db.Float).subquery('alumni_fts_hits')
+
+        query = query.join(hits, hits.c.alumni_id == Alumni.id)
+        if ranked:
+            # bm25() is lower-is-better
+            query = query.order_by(hits.c.rank, Alumni.id)
+        return query
+
+
+class MemorySearchBackend(LikeSearchBackend):
+    """In-process inverted index for deployments that cannot add database extensions.
+
+    The index is built lazily on the first ranked search and then kept current
+    from the Alumni mapper hooks. Changes are queued on the session and only
+    applied once the transaction commits, so rolled-back writes never reach
+    the index. Other processes' writes are picked up by rebuilding once the
+    index is older than ``refresh_seconds`` (0 disables the refresh).
+
+    Unranked directory filtering keeps the LIKE semantics, since the index only
+    returns the top matches rather than the full match set.
+    """
+    name = 'memory'
+
+    PENDING_KEY = 'alumni_search_pending'
+
+    # Ranked candidates fetched from the index before SQL-side filters apply
+    MAX_CANDIDATES = 250
+
+    def __init__(self, refresh_seconds=0):
+        self.index = AlumniSearchIndex(tokenize)
+        self.refresh_seconds = refresh_seconds
+        self._build_lock = threading.Lock()
+
+    def ensure_built(self):
+        stale = (
+            self.index.built_at is not None and self.refresh_seconds and
+            time.time() - self.index.built_at > self.refresh_seconds
+        )
+        if self.index.built_at is not None and not stale:
+            return
+        with self._build_lock:
+            if self.index.built_at is None or stale:
+                rows = db.session.execute(
+                    db.select(Alumni.id, *[getattr(Alumni, field) for field in SEARCH_FIELDS])
+                    .execution_options(yield_per=5000)
+                )
+                self.index.build((row.id, alumni_document(row)) for row in rows)
+
+    def _queue(self, alumni_id, document):
+        db.session.info.setdefault(self.PENDING_KEY, {})[alumni_id] = document
+
+    def sync(self, connection, alumni):
+        self._queue(alumni.id, alumni_document(alumni))
+
+    def remove(self, connection, alumni_id):
+        self._queue(alumni_id, None)
+
+    def apply_pending(self, pending):
+        if self.index.built_at is None:
+            return
+        for alumni_id, document in pending.items():
+            if document is None:
+                self.index.remove(alumni_id)
+            else:
+                self.index.upsert(alumni_id, document)
+
+    def apply(self, query, term, ranked=False):
+        if not ranked or not tokenize(term):
+            return super().apply(query, term, ranked)
+
+        self.ensure_built()
+        hits = self.index.search(term, limit=self.MAX_CANDIDATES)
+        if not hits:
+            return query.filter(db.false())
+
+        positions = {alumni_id: position for position, (alumni_id, _) in enumerate(hits)}
+        return query.filter(Alumni.id.in_(positions)).order_by(db.case(positions, value=Alumni.id))
+
+    def stats(self):
+        return {'backend': self.name, 'refresh_seconds': self.refresh_seconds, **self.index.stats()}
+
+
+class _RowView:
+    """Attribute access over a result row so alumni_document can index raw rows"""
+
+    def __init__(self, row):
+        self._row = row
+
+    def __getattr__(self, name):
+        return self._row[name]
+
+
+SEARCH_BACKENDS = {
+    'like': LikeSearchBackend,
+    'postgres': PostgresSearchBackend,
+    'sqlite_fts': SqliteFtsSearchBackend,
+    'memory': MemorySearchBackend,
+}
+
+_fallback_backend = LikeSearchBackend()
+
+
+def init_alumni_search(app):
+    """Pick and install the alumni search engine for this app.
+
+    ``ALUMNI_SEARCH_BACKEND`` may name an engine explicitly; by default the
+    engine is chosen from the database dialect.
+    """
+    with app.app_context():
+        name = app.config.get('ALUMNI_SEARCH_BACKEND', 'auto')
+        if name == 'auto':
+            name = {'postgresql': 'postgres', 'sqlite': 'sqlite_fts'}.get(db.engine.dialect.name, 'like')
+
+        if name == 'memory':
+            backend = MemorySearchBackend(refresh_seconds=app.config.get('ALUMNI_SEARCH_REFRESH_SECONDS', 0))
+        else:
+            backend = SEARCH_BACKENDS.get(name, LikeSearchBackend)()
+        try:
+            with db.engine.begin() as connection:
+                installed = backend.install(connection)
+        except Exception as e:
+            logger.error(f"Failed to install {backend.name} search backend: {e}")
+            installed = False
+
+        if not installed:
+            backend = LikeSearchBackend()
+        app.extensions['alumni_search'] = backend
+        return backend
+
+
+def get_search_backend():
+    """Return the search engine installed on the current app"""
+    if not has_app_context():
+        return _fallback_backend
+    return current_app.extensions.get('alumni_search', _fallback_backend)
+
+
+def _search_fields_changed(alumni):
+    state = inspect(alumni)
+    return any(state.attrs[field].history.has_changes() for field in SEARCH_FIELDS)
+
+
+@event.listens_for(Alumni, 'after_insert')
+def _index_new_alumni(mapper, connection, target):
+    get_search_backend().sync(connection, target)
+
+
+@event.listens_for(Alumni, 'after_update')
+def _reindex_alumni(mapper, connection, target):
+    if _search_fields_changed(target):
+        get_search_backend().sync(connection, target)
+
+
+@event.listens_for(Alumni, 'after_delete')
+def _unindex_alumni(mapper, connection, target):
+    get_search_backend().remove(connection, target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending_index_changes(session):
+    pending = session.info.pop(MemorySearchBackend.PENDING_KEY, None)
+    if pending:
+        backend = get_search_backend()
+        if isinstance(backend, MemorySearchBackend):
+            backend.apply_pending(pending)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _drop_pending_index_changes(session):
+    session.info.pop(MemorySearchBackend.PENDING_KEY, None)
@@ -1,6 +1,7 @@
 from functools import wraps
 from flask import session, jsonify, request
 from src.models.user import User, UserRole, UserStatus
+from src.utils.principal_cache import current_principal, get_principal_cache, touch_last_active
 
 def login_required(f):
     """Decorator to require user login"""
@@ -11,13 +12,13 @@ def login_required(f):
             return jsonify({'success': False, 'message': 'Authentication required'}), 401
         
         # Check if user still exists and is active
-        user = User.query.get(user_id)
+        user = current_principal()
         if not user or user.status != UserStatus.ACTIVE:
             session.clear()
             return jsonify({'success': False, 'message': 'Invalid session'}), 401
         
         # Update last activity
-        user.update_last_active()
+        touch_last_active(user)
         
         return f(*args, **kwargs)
     return decorated_function
@@ -31,7 +32,7 @@ def require_role(allowed_roles):
             if not user_id:
                 return jsonify({'success': False, 'message': 'Authentication required'}), 401
             
-            user = User.query.get(user_id)
+            user = current_principal()
             if not user or user.status != UserStatus.ACTIVE:
                 session.clear()
                 return jsonify({'success': False, 'message': 'Invalid session'}), 401
@@ -41,7 +42,7 @@ def require_role(allowed_roles):
                 return jsonify({'success': False, 'message': 'Insufficient permissions'}), 403
             
             # Update last activity
-            user.update_last_active()
+            touch_last_active(user)
             
             return f(*args, **kwargs)
         return decorated_function
@@ -55,14 +56,14 @@ def require_institution_access(f):
         if not user_id:
             return jsonify({'success': False, 'message': 'Authentication required'}), 401
         
-        user = User.query.get(user_id)
+        user = current_principal()
         if not user or user.status != UserStatus.ACTIVE:
             session.clear()
             return jsonify({'success': False, 'message': 'Invalid session'}), 401
         
         # Super admins have access to everything
         if user.is_super_admin():
-            user.update_last_active()
+            touch_last_active(user)
             return f(*args, **kwargs)
         
         # Institution admins can only access their own institution
@@ -71,7 +72,7 @@ def require_institution_access(f):
             if institution_id and user.institution_id != int(institution_id):
                 return jsonify({'success': False, 'message': 'Access denied to this institution'}), 403
             
-            user.update_last_active()
+            touch_last_active(user)
             return f(*args, **kwargs)
         
         # Other users don't have institution-level access
@@ -86,24 +87,24 @@ def require_same_institution(f):
         if not user_id:
             return jsonify({'success': False, 'message': 'Authentication required'}), 401
         
-        user = User.query.get(user_id)
+        user = current_principal()
         if not user or user.status != UserStatus.ACTIVE:
             session.clear()
             return jsonify({'success': False, 'message': 'Invalid session'}), 401
         
         # Super admins bypass institution restrictions
         if user.is_super_admin():
-            user.update_last_active()
+            touch_last_active(user)
             return f(*args, **kwargs)
         
         # Check if target user is from same institution
         target_user_id = kwargs.get('user_id') or request.view_args.get('user_id')
         if target_user_id:
-            target_user = User.query.get(target_user_id)
+            target_user = get_principal_cache().get(int(target_user_id))
             if not target_user or target_user.institution_id != user.institution_id:
                 return jsonify({'success': False, 'message': 'Can only access users from your institution'}), 403
         
-        user.update_last_active()
+        touch_last_active(user)
         return f(*args, **kwargs)
     return decorated_function
 
@@ -115,7 +116,7 @@ def require_email_verified(f):
         if not user_id:
             return jsonify({'success': False, 'message': 'Authentication required'}), 401
         
-        user = User.query.get(user_id)
+        user = current_principal()
         if not user or user.status != UserStatus.ACTIVE:
             session.clear()
             return jsonify({'success': False, 'message': 'Invalid session'}), 401
@@ -123,7 +124,7 @@ def require_email_verified(f):
         if not user.is_email_verified:
             return jsonify({'success': False, 'message': 'Email verification required'}), 403
         
-        user.update_last_active()
+        touch_last_active(user)
         return f(*args, **kwargs)
     return decorated_function
 
@@ -135,21 +136,21 @@ def require_active_institution(f):
         if not user_id:
             return jsonify({'success': False, 'message': 'Authentication required'}), 401
         
-        user = User.query.get(user_id)
+        user = current_principal()
         if not user or user.status != UserStatus.ACTIVE:
             session.clear()
             return jsonify({'success': False, 'message': 'Invalid session'}), 401
         
         # Super admins bypass this check
         if user.is_super_admin():
-            user.update_last_active()
+            touch_last_active(user)
             return f(*args, **kwargs)
         
         # Check if user's institution is active
-        if not user.institution or not user.institution.is_active:
+        if not user.institution_active:
             return jsonify({'success': False, 'message': 'Institution is not active'}), 403
         
-        user.update_last_active()
+        touch_last_active(user)
         return f(*args, **kwargs)
     return decorated_function
 
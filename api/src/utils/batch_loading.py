@@ -0,0 +1,21 @@
+from src.models.user import User
+from src.models.alumni import Alumni
+
+
+def load_users_and_alumni(user_ids, user_options=(), alumni_options=()):
+    """Batch-load users and their alumni profiles with one IN query each.
+
+    Returns ``(users, alumni)`` dicts keyed by user id, so list endpoints can
+    attach poster/sender/author info without a lookup per row. The options
+    (e.g. a serialiser's load_only) are applied to the respective query.
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return {}, {}
+
+    users = {user.id: user for user in User.query.options(*user_options).filter(User.id.in_(user_ids))}
+    alumni = {
+        alum.user_id: alum
+        for alum in Alumni.query.options(*alumni_options).filter(Alumni.user_id.in_(user_ids))
+    }
+    return users, alumni
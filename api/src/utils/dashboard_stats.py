@@ -0,0 +1,281 @@
+import logging
+import random
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import event, func, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, object_session
+from src.models.user import db
+from src.models.alumni import Alumni
+from src.models.donation import Donation, DonationCampaign
+from src.models.stats import StatCounter
+
+logger = logging.getLogger(__name__)
+
+ALUMNI_SCOPES = ('alumni', 'alumni_by_year', 'alumni_by_department')
+DONATION_SCOPES = ('donations', 'campaigns')
+# One counter per donor (completed donations), so the distinct donor total
+# can be kept exactly: it moves when a donor's counter leaves or returns to 0
+DONOR_SCOPE = 'donor'
+META_SCOPE = 'meta'
+# Every donation touches the donation totals, so they are split over
+# shards ('total_amount#3') to keep concurrent donations from queueing on
+# one row; reads sum the shards
+SHARDED_SCOPES = ('donations',)
+COUNTER_SHARDS = 16
+SHARD_SEPARATOR = '#'
+MANAGED_SCOPES = ALUMNI_SCOPES + DONATION_SCOPES + (DONOR_SCOPE, META_SCOPE)
+
+# Columns whose change moves a row between counters
+ALUMNI_STAT_FIELDS = ('graduation_year', 'department', 'is_mentor')
+DONATION_STAT_FIELDS = ('status', 'amount', 'donor_id')
+
+
+def _key(value):
+    return '' if value is None else str(value)
+
+
+def _alumni_counters(graduation_year, department, is_mentor):
+    counters = [
+        (('alumni', 'total'), 1),
+        (('alumni_by_year', _key(graduation_year)), 1),
+        (('alumni_by_department', _key(department)), 1)
+    ]
+    if is_mentor:
+        counters.append((('alumni', 'mentors'), 1))
+    return counters
+
+
+def _donation_counters(status, amount, donor_id):
+    if status != 'completed':
+        return []
+    return [
+        (('donations', 'total_amount'), amount or 0),
+        (('donations', 'completed'), 1),
+        ((DONOR_SCOPE, _key(donor_id)), 1)
+    ]
+
+
+def _campaign_counters(status):
+    return [(('campaigns', 'active'), 1)] if status == 'active' else []
+
+
+# --- Incremental maintenance ---
+
+def _previous(state, name):
+    history = state.attrs[name].history
+    return history.deleted[0] if history.deleted else state.attrs[name].value
+
+
+def _queue(target, counters, sign):
+    session = object_session(target)
+    if session is None or not counters:
+        return
+    deltas = session.info.setdefault('stat_deltas', defaultdict(float))
+    for counter, amount in counters:
+        deltas[counter] += sign * amount
+
+
+def _queue_update(target, fields, counters_for):
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in fields):
+        return
+    _queue(target, counters_for(*(_previous(state, name) for name in fields)), -1)
+    _queue(target, counters_for(*(getattr(target, name) for name in fields)), 1)
+
+
+def _keep_previous_value(target, value, oldvalue, initiator):
+    return value
+
+
+# Load the old value when one of these is assigned on an expired object
+# (e.g. after a commit); otherwise the update hooks could not tell which
+# counter the row is leaving
+for _attribute in ([getattr(Alumni, name) for name in ALUMNI_STAT_FIELDS]
+                   + [getattr(Donation, name) for name in DONATION_STAT_FIELDS]
+                   + [DonationCampaign.status]):
+    event.listen(_attribute, 'set', _keep_previous_value, active_history=True, retval=True)
+
+
+@event.listens_for(Alumni, 'after_insert')
+def _alumni_inserted(mapper, connection, alumni):
+    _queue(alumni, _alumni_counters(alumni.graduation_year, alumni.department, alumni.is_mentor), 1)
+
+
+@event.listens_for(Alumni, 'after_update')
+def _alumni_updated(mapper, connection, alumni):
+    _queue_update(alumni, ALUMNI_STAT_FIELDS, _alumni_counters)
+
+
+@event.listens_for(Alumni, 'after_delete')
+def _alumni_deleted(mapper, connection, alumni):
+    state = inspect(alumni)
+    _queue(alumni, _alumni_counters(*(_previous(state, name) for name in ALUMNI_STAT_FIELDS)), -1)
+
+
+@event.listens_for(Donation, 'after_insert')
+def _donation_inserted(mapper, connection, donation):
+    _queue(donation, _donation_counters(donation.status, donation.amount, donation.donor_id), 1)
+
+
+@event.listens_for(Donation, 'after_update')
+def _donation_updated(mapper, connection, donation):
+    _queue_update(donation, DONATION_STAT_FIELDS, _donation_counters)
+
+
+@event.listens_for(Donation, 'after_delete')
+def _donation_deleted(mapper, connection, donation):
+    state = inspect(donation)
+    _queue(donation, _donation_counters(*(_previous(state, name) for name in DONATION_STAT_FIELDS)), -1)
+
+
+@event.listens_for(DonationCampaign, 'after_insert')
+def _campaign_inserted(mapper, connection, campaign):
+    _queue(campaign, _campaign_counters(campaign.status), 1)
+
+
+@event.listens_for(DonationCampaign, 'after_update')
+def _campaign_updated(mapper, connection, campaign):
+    _queue_update(campaign, ('status',), _campaign_counters)
+
+
+@event.listens_for(DonationCampaign, 'after_delete')
+def _campaign_deleted(mapper, connection, campaign):
+    _queue(campaign, _campaign_counters(_previous(inspect(campaign), 'status')), -1)
+
+
+def apply_deltas(connection, deltas):
+    """Add ``(scope, key) -> delta`` to the counters, keeping the donor total exact"""
+    deltas = dict(deltas)
+    donors = 0
+    for counter in [counter for counter in deltas if counter[0] == DONOR_SCOPE]:
+        delta = deltas.pop(counter)
+        if not delta:
+            continue
+        value = StatCounter.increment_returning(connection, counter[0], counter[1], delta)
+        if value > 0 >= value - delta:
+            donors += 1
+        elif value <= 0 < value - delta:
+            donors -= 1
+    if donors:
+        deltas[('donations', 'donors')] = deltas.get(('donations', 'donors'), 0) + donors
+
+    shard = random.randrange(COUNTER_SHARDS)
+    sharded = defaultdict(float)
+    for (scope, key), delta in deltas.items():
+        if scope in SHARDED_SCOPES:
+            key = f'{key}{SHARD_SEPARATOR}{shard}'
+        sharded[(scope, key)] += delta
+    StatCounter.increment(connection, sharded)
+
+
+@event.listens_for(Session, 'after_flush')
+def _apply_queued_deltas(session, flush_context):
+    # Same connection and transaction as the flushed rows, so the counters
+    # can never commit without the change they count (or vice versa)
+    deltas = session.info.pop('stat_deltas', None)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_queued_deltas(session):
+    session.info.pop('stat_deltas', None)
+
+
+# --- Rebuild and read ---
+
+def recompute_stats():
+    """Rebuild every dashboard counter from the source tables.
+
+    Needed after writes that bypass the ORM (bulk UPDATEs, raw SQL) and to
+    seed a database that predates the counters. Returns the number of
+    counters written.
+    """
+    counters = defaultdict(float)
+
+    alumni_groups = db.session.query(
+        Alumni.graduation_year, Alumni.department, Alumni.is_mentor, func.count(Alumni.id)
+    ).group_by(Alumni.graduation_year, Alumni.department, Alumni.is_mentor)
+    for graduation_year, department, is_mentor, count in alumni_groups:
+        for counter, amount in _alumni_counters(graduation_year, department, is_mentor):
+            counters[counter] += amount * count
+
+    donor_groups = db.session.query(
+        Donation.donor_id, func.count(Donation.id), func.sum(Donation.amount)
+    ).filter(Donation.status == 'completed').group_by(Donation.donor_id)
+    for donor_id, count, total in donor_groups:
+        counters[(DONOR_SCOPE, _key(donor_id))] = count
+        counters[('donations', 'completed')] += count
+        counters[('donations', 'total_amount')] += total or 0
+        counters[('donations', 'donors')] += 1
+
+    for status, count in db.session.query(DonationCampaign.status, func.count(DonationCampaign.id)).group_by(DonationCampaign.status):
+        for counter, amount in _campaign_counters(status):
+            counters[counter] += amount * count
+
+    now = datetime.utcnow()
+    counters[(META_SCOPE, 'recomputed_at')] = now.timestamp()
+
+    db.session.query(StatCounter).filter(StatCounter.scope.in_(MANAGED_SCOPES)).delete(synchronize_session=False)
+    db.session.execute(StatCounter.__table__.insert(), [
+        {'scope': scope, 'key': key, 'value': value, 'updated_at': now}
+        for (scope, key), value in counters.items()
+    ])
+    db.session.commit()
+    return len(counters)
+
+
+def _fold_shards(counters):
+    for scope in SHARDED_SCOPES:
+        if scope in counters:
+            folded = defaultdict(float)
+            for key, value in counters[scope].items():
+                folded[key.split(SHARD_SEPARATOR, 1)[0]] += value
+            counters[scope] = dict(folded)
+    return counters
+
+
+def _read(*scopes):
+    counters = StatCounter.read(META_SCOPE, *scopes)
+    if 'recomputed_at' in counters[META_SCOPE]:
+        return _fold_shards(counters)
+
+    # First read on a database that predates the counters: seed them once
+    logger.info("Dashboard counters missing, rebuilding from source tables")
+    try:
+        recompute_stats()
+    except IntegrityError:
+        # Another worker seeded them at the same time
+        db.session.rollback()
+    return _fold_shards(StatCounter.read(META_SCOPE, *scopes))
+
+
+def alumni_stats():
+    """Totals, mentor count and year/department distributions, without touching the alumni table"""
+    counters = _read(*ALUMNI_SCOPES)
+    years = sorted(
+        ((int(key) if key else None, int(value)) for key, value in counters['alumni_by_year'].items() if value > 0),
+        key=lambda item: (item[0] is not None, item[0] or 0)
+    )
+    departments = sorted(
+        ((key or None, int(value)) for key, value in counters['alumni_by_department'].items() if value > 0),
+        key=lambda item: (item[0] is not None, item[0] or '')
+    )
+    return {
+        'total_alumni': int(counters['alumni'].get('total', 0)),
+        'mentors_count': int(counters['alumni'].get('mentors', 0)),
+        'graduation_years': [{'year': year, 'count': count} for year, count in years],
+        'departments': [{'department': department, 'count': count} for department, count in departments]
+    }
+
+
+def donation_totals():
+    """Completed donation sum and count, distinct donors and active campaigns"""
+    counters = _read(*DONATION_SCOPES)
+    return {
+        'total_donations': round(counters['donations'].get('total_amount', 0), 2),
+        'total_donors': int(counters['donations'].get('donors', 0)),
+        'completed_donations': int(counters['donations'].get('completed', 0)),
+        'active_campaigns': int(counters['campaigns'].get('active', 0))
+    }
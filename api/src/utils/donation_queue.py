@@ -0,0 +1,349 @@
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from flask import current_app, has_app_context
+from sqlalchemy.exc import DBAPIError, IntegrityError, InterfaceError, OperationalError
+from src.models.user import db
+from src.models.donation import Donation, DonationCampaign
+from src.utils.metrics import LATENCY_BUCKETS, Histogram, metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_SECONDS = 1
+# A claimed batch not confirmed within this long (the flusher died) is
+# handed to the next flush; transaction_id keeps the retry from duplicating
+DEFAULT_CLAIM_TIMEOUT_SECONDS = 60
+# Ceiling for the flusher's retry delay while flushes keep raising
+MAX_FLUSH_BACKOFF_SECONDS = 60
+
+JOURNAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_donations (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    transaction_id TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    claimed_at REAL,
+    error TEXT
+)
+"""
+
+
+class DonationQueue:
+    """Durable local buffer between /donate and the main database.
+
+    Accepted donations are appended to a SQLite journal in WAL mode (one
+    local fsync, no network round trip) and moved to the main database in
+    batches of up to ``batch_size`` by a background thread, so a burst costs
+    one main-database transaction per batch instead of one per donation.
+    The journal survives restarts; every worker on the host can share it.
+
+    ``transaction_id`` makes ingestion idempotent: the journal rejects a
+    repeated id, and ids already in the main database are skipped on flush.
+    """
+
+    def __init__(self, path, app=None, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_SECONDS,
+                 claim_timeout=DEFAULT_CLAIM_TIMEOUT_SECONDS):
+        self.path = path
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.claim_timeout = claim_timeout
+        self._connection = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._since_wake = 0
+
+        self.flushes = 0
+        self.failures = 0
+        self.ingested = 0
+        self.duplicates = 0
+        self.flush_latency = Histogram(
+            'donation_queue_flush_duration_seconds', 'Time to move one batch of donations to the database',
+            LATENCY_BUCKETS, label_names=()
+        )
+        self.queue_wait = Histogram(
+            'donation_queue_wait_seconds', 'Time donations spent in the journal before being committed',
+            LATENCY_BUCKETS + (30.0, 60.0, 300.0), label_names=()
+        )
+
+    def _journal(self):
+        # Called with self._lock held
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=20, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=FULL')
+            connection.execute(JOURNAL_SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    @property
+    def depth(self):
+        with self._lock:
+            return self._journal().execute('SELECT count(*) FROM pending_donations WHERE error IS NULL').fetchone()[0]
+
+    @property
+    def parked(self):
+        with self._lock:
+            return self._journal().execute('SELECT count(*) FROM pending_donations WHERE error IS NOT NULL').fetchone()[0]
+
+    def enqueue(self, payload):
+        """Append a validated donation; returns False if its transaction_id is already queued"""
+        with self._lock:
+            cursor = self._journal().execute(
+                'INSERT OR IGNORE INTO pending_donations (transaction_id, payload, enqueued_at) VALUES (?, ?, ?)',
+                (payload['transaction_id'], json.dumps(payload), time.time())
+            )
+            accepted = cursor.rowcount == 1
+            if accepted:
+                self._since_wake += 1
+        if not accepted:
+            self.duplicates += 1
+            return False
+
+        if not self.flush_interval:
+            self.flush()
+        elif self._since_wake >= self.batch_size:
+            self._wake.set()
+        elif self._thread is None:
+            self.start()
+        return True
+
+    def _claim(self):
+        now = time.time()
+        with self._lock:
+            journal = self._journal()
+            journal.execute('BEGIN IMMEDIATE')
+            try:
+                rows = journal.execute(
+                    'SELECT seq, payload, enqueued_at FROM pending_donations '
+                    'WHERE error IS NULL AND (claimed_at IS NULL OR claimed_at < ?) ORDER BY seq LIMIT ?',
+                    (now - self.claim_timeout, self.batch_size)
+                ).fetchall()
+                if rows:
+                    journal.executemany('UPDATE pending_donations SET claimed_at = ? WHERE seq = ?',
+                                        [(now, seq) for seq, _, _ in rows])
+                journal.execute('COMMIT')
+            except Exception:
+                journal.execute('ROLLBACK')
+                raise
+            self._since_wake = 0
+        return rows
+
+    def _release(self, seqs, done):
+        with self._lock:
+            journal = self._journal()
+            if done:
+                journal.executemany('DELETE FROM pending_donations WHERE seq = ?', [(seq,) for seq in seqs])
+            else:
+                journal.executemany('UPDATE pending_donations SET claimed_at = NULL WHERE seq = ?', [(seq,) for seq in seqs])
+
+    def _park(self, seq, error):
+        with self._lock:
+            self._journal().execute('UPDATE pending_donations SET error = ? WHERE seq = ?', (error, seq))
+
+    def _ingest_individually(self, rows):
+        # A batch failed: retry its rows one by one. Rows that fail on their
+        # own data (integrity, bad values) are parked so they cannot block
+        # the queue; rows that failed because the database is unreachable
+        # are released for a later flush. Returns (inserted, outage).
+        inserted, retry = 0, []
+        for seq, payload, _ in rows:
+            try:
+                inserted += ingest_donations([json.loads(payload)])
+                self._release([seq], done=True)
+            except Exception as e:
+                db.session.rollback()
+                if _is_outage(e):
+                    retry.append(seq)
+                else:
+                    logger.error(f"Parking queued donation {seq}: {e}")
+                    self._park(seq, str(e))
+        if retry:
+            self._release(retry, done=False)
+        return inserted, bool(retry)
+
+    def flush(self):
+        """Move queued donations to the database in batches; returns how many were inserted"""
+        inserted = 0
+        with self._flush_lock:
+            while True:
+                rows = self._claim()
+                if not rows:
+                    return inserted
+
+                started = time.perf_counter()
+                try:
+                    batch_inserted = ingest_donations([json.loads(payload) for _, payload, _ in rows])
+                    self._release([seq for seq, _, _ in rows], done=True)
+                    self.duplicates += len(rows) - batch_inserted
+                except Exception as e:
+                    db.session.rollback()
+                    self.failures += 1
+                    logger.error(f"Donation flush of {len(rows)} queued donations failed: {e}")
+                    batch_inserted, outage = self._ingest_individually(rows)
+                    if outage:
+                        self.ingested += batch_inserted
+                        return inserted + batch_inserted
+
+                now = time.time()
+                for _, _, enqueued_at in rows:
+                    self.queue_wait.observe(now - enqueued_at)
+                self.flush_latency.observe(time.perf_counter() - started)
+                self.flushes += 1
+                self.ingested += batch_inserted
+                inserted += batch_inserted
+                if len(rows) < self.batch_size:
+                    return inserted
+
+    def start(self):
+        """Start the background flusher (idempotent)"""
+        with self._lock:
+            if self._thread is not None or not self.flush_interval or self.app is None:
+                return
+            self._thread = threading.Thread(target=self._run, name='donation-queue', daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def _run(self):
+        errors = 0
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                with self.app.app_context():
+                    try:
+                        self.flush()
+                    finally:
+                        db.session.remove()
+                errors = 0
+            except Exception:
+                # Journal or database unreachable: keep the flusher alive and
+                # retry with backoff; queued donations stay in the journal
+                errors += 1
+                self.failures += 1
+                delay = min(self.flush_interval * 2 ** errors, MAX_FLUSH_BACKOFF_SECONDS)
+                logger.exception(f"Donation flusher failed ({errors} in a row), retrying in {delay}s")
+                time.sleep(delay)
+
+    def shutdown(self):
+        """Write out whatever is still queued"""
+        if self.app is not None:
+            with self.app.app_context():
+                self.flush()
+
+    def stats(self):
+        return {
+            'depth': self.depth,
+            'parked': self.parked,
+            'batch_size': self.batch_size,
+            'flush_interval': self.flush_interval,
+            'flushes': self.flushes,
+            'failures': self.failures,
+            'ingested': self.ingested,
+            'duplicates': self.duplicates
+        }
+
+
+def _is_outage(error):
+    """Whether ``error`` says the database is unavailable, not that the row is bad"""
+    if isinstance(error, (OperationalError, InterfaceError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+def _new_donations(payloads):
+    # Drop ids repeated within the batch or already in the database
+    unique = {}
+    for payload in payloads:
+        unique.setdefault(payload['transaction_id'], payload)
+    existing = {
+        transaction_id for (transaction_id,) in
+        db.session.query(Donation.transaction_id).filter(Donation.transaction_id.in_(unique))
+    }
+    return [payload for transaction_id, payload in unique.items() if transaction_id not in existing]
+
+
+def ingest_donations(payloads):
+    """Insert a batch of queued donations in one transaction; returns how many were new"""
+    for attempt in range(2):
+        fresh = _new_donations(payloads)
+        if not fresh:
+            return 0
+
+        donations = [
+            Donation(
+                donor_id=payload['donor_id'],
+                campaign_id=payload.get('campaign_id'),
+                amount=payload['amount'],
+                message=payload.get('message'),
+                is_anonymous=payload.get('is_anonymous', False),
+                payment_method=payload.get('payment_method'),
+                transaction_id=payload['transaction_id'],
+                donated_at=datetime.fromisoformat(payload['donated_at'])
+            )
+            for payload in fresh
+        ]
+        db.session.add_all(donations)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            # Another flusher committed some of these ids meanwhile
+            db.session.rollback()
+            if attempt:
+                raise
+            continue
+
+        # One atomic increment per campaign for the whole batch
+        campaign_totals = defaultdict(float)
+        for donation in donations:
+            if donation.campaign_id:
+                campaign_totals[donation.campaign_id] += donation.amount
+        for campaign_id in sorted(campaign_totals):
+            DonationCampaign.add_to_total(campaign_id, campaign_totals[campaign_id])
+
+        db.session.commit()
+        return len(donations)
+
+
+def init_donation_queue(app):
+    """Install the buffered donation queue on ``app`` when DONATION_INGEST_MODE is 'buffered'"""
+    if app.config.get('DONATION_INGEST_MODE', 'direct') != 'buffered':
+        return None
+
+    queue = DonationQueue(
+        app.config['DONATION_QUEUE_PATH'],
+        app,
+        batch_size=app.config.get('DONATION_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+        flush_interval=app.config.get('DONATION_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS)
+    )
+    app.extensions['donation_queue'] = queue
+
+    metrics.register(queue.flush_latency)
+    metrics.register(queue.queue_wait)
+    metrics.register_gauge('donation_queue_depth', 'Donations waiting in the local journal', lambda: queue.depth)
+    metrics.register_gauge('donation_queue_parked', 'Queued donations that failed on their own and need attention', lambda: queue.parked)
+    metrics.register_gauge('donation_queue_ingested', 'Queued donations committed to the database', lambda: queue.ingested)
+    metrics.register_gauge('donation_queue_duplicates', 'Donations dropped as repeated transaction_ids', lambda: queue.duplicates)
+    metrics.register_gauge('donation_queue_failures', 'Donation batches that failed and were re-queued', lambda: queue.failures)
+    # Drain anything a previous process left behind
+    queue.start()
+    return queue
+
+
+def get_donation_queue():
+    """Return the donation queue of the current app, or None in direct mode"""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('donation_queue')
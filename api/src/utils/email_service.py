@@ -46,8 +46,18 @@ class EmailService:
             logger.error(f"Failed to create SMTP connection: {e}")
             return None
     
-    def _send_email(self, to_email: str, subject: str, html_content: str, text_content: str = None):
-        """Send email with HTML and optional text content"""
+    def _close_connection(self, server):
+        try:
+            server.quit()
+        except Exception:
+            pass
+    
+    def _send_email(self, to_email: str, subject: str, html_content: str, text_content: str = None, server=None):
+        """Send email with HTML and optional text content.
+        
+        ``server`` is an open connection to reuse (left open); without one,
+        a connection is made for this message alone.
+        """
         if not self.email_address:
             logger.warning("Email service not configured - EMAIL_ADDRESS not set")
             return False
@@ -69,12 +79,15 @@ class EmailService:
             msg.attach(html_part)
             
             # Send email
-            server = self._create_connection()
-            if not server:
-                return False
-            
-            server.send_message(msg)
-            server.quit()
+            if server is not None:
+                server.send_message(msg)
+            else:
+                server = self._create_connection()
+                if not server:
+                    return False
+                
+                server.send_message(msg)
+                server.quit()
             
             logger.info(f"Email sent successfully to {to_email}")
             return True
@@ -162,7 +175,7 @@ class EmailService:
         
         return self._send_email(email, subject, html_content, text_content)
     
-    def send_invite_email(self, email: str, user_type: str, institution_name: str, invite_token: str):
+    def send_invite_email(self, email: str, user_type: str, institution_name: str, invite_token: str, server=None):
         """Send account invitation email"""
         subject = f"Account Invitation - {institution_name} Alumni Platform"
         user_type_display = "Alumni" if user_type == "alumni" else "Student"
@@ -244,7 +257,7 @@ class EmailService:
         Alumni Platform Team
         """
         
-        return self._send_email(email, subject, html_content, text_content)
+        return self._send_email(email, subject, html_content, text_content, server=server)
     
     def send_verification_code_email(self, email: str, code: str):
         """Send email verification code"""
@@ -306,26 +319,44 @@ class EmailService:
         
         return self._send_email(email, subject, html_content, text_content)
     
-    def send_bulk_invitations(self, invitations: List[dict], institution_name: str):
-        """Send bulk invitation emails"""
+    def send_bulk_invitations(self, invitations: List[dict], institution_name: str, on_sent=None):
+        """Send bulk invitation emails over one SMTP connection.
+        
+        ``on_sent(invitation, success)`` is called after each message, e.g.
+        to record progress so an interrupted run can skip what already went out.
+        """
         successful = 0
         failed = 0
+        server = None
         
-        for invitation in invitations:
-            try:
-                success = self.send_invite_email(
-                    invitation['email'],
-                    invitation['user_type'],
-                    institution_name,
-                    invitation['token']
-                )
+        try:
+            for invitation in invitations:
+                if server is None and self.email_address:
+                    server = self._create_connection()
+                try:
+                    success = self.send_invite_email(
+                        invitation['email'],
+                        invitation['user_type'],
+                        institution_name,
+                        invitation['token'],
+                        server=server
+                    )
+                except Exception as e:
+                    logger.error(f"Failed to send invitation to {invitation['email']}: {e}")
+                    success = False
                 if success:
                     successful += 1
                 else:
                     failed += 1
-            except Exception as e:
-                logger.error(f"Failed to send invitation to {invitation['email']}: {e}")
-                failed += 1
+                    # The connection may have dropped; open a fresh one for the next message
+                    if server is not None:
+                        self._close_connection(server)
+                        server = None
+                if on_sent is not None:
+                    on_sent(invitation, success)
+        finally:
+            if server is not None:
+                self._close_connection(server)
         
         return {'successful': successful, 'failed': failed}
     
@@ -394,8 +425,8 @@ def send_invite_email(email: str, user_type: str, institution_name: str, invite_
 def send_verification_code_email(email: str, code: str):
     return email_service.send_verification_code_email(email, code)
 
-def send_bulk_invitations(invitations: List[dict], institution_name: str):
-    return email_service.send_bulk_invitations(invitations, institution_name)
+def send_bulk_invitations(invitations: List[dict], institution_name: str, on_sent=None):
+    return email_service.send_bulk_invitations(invitations, institution_name, on_sent)
 
 def send_password_reset_email(email: str, reset_token: str):
     return email_service.send_password_reset_email(email, reset_token)
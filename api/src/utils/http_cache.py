@@ -0,0 +1,211 @@
+import hashlib
+import re
+import threading
+import time
+from functools import wraps
+from flask import current_app, has_app_context, make_response, request
+from sqlalchemy import event, func, select
+from src.models.user import db
+from src.models.stats import TableVersion
+from src.utils.metrics import Counter, metrics
+
+# How long a table fingerprint is reused before it is re-read from the
+# database. Writes made through this process invalidate it immediately;
+# the TTL bounds how long another worker's write can go unnoticed.
+DEFAULT_FINGERPRINT_TTL = 2
+
+# The counters themselves are not versioned
+VERSION_TABLE = TableVersion.__tablename__
+
+# Tables some conditional_get view is keyed on; only writes to these pay
+# for a TableVersion bump
+TRACKED_TABLES = set()
+
+# Target table of a write statement, whether the ORM compiled it or it was
+# written by hand (text() upserts such as StatCounter's)
+WRITE_PATTERN = re.compile(
+    r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+"?(\w+)"?',
+    re.IGNORECASE
+)
+
+
+class TableVersions:
+    """Validators for conditional GETs, derived from the tables a view reads.
+
+    A table's fingerprint is its ``TableVersion``, which every transaction
+    writing to the table bumps as it commits, so inserts, deletes and
+    updates on any worker change it, whatever their timestamps. Reading it
+    is a primary-key lookup rather than a scan of the table. Fingerprints
+    are memoised per table set and dropped when this process writes to one
+    of the tables.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_FINGERPRINT_TTL):
+        self.ttl_seconds = ttl_seconds
+        self._versions = {}      # table name -> local write generation
+        self._fingerprints = {}  # table names -> (expires_at, generations, (digest, last_modified))
+        self._lock = threading.Lock()
+        self.memo_hits = 0
+        self.memo_misses = 0
+
+    def bump(self, table_names):
+        with self._lock:
+            for name in table_names:
+                self._versions[name] = self._versions.get(name, 0) + 1
+
+    def fingerprint(self, tables):
+        """Return ``(digest, last_modified)`` for ``tables``"""
+        key = tuple(table.name for table in tables)
+        now = time.monotonic()
+        with self._lock:
+            generations = tuple(self._versions.get(name, 0) for name in key)
+            entry = self._fingerprints.get(key)
+            if entry is not None and entry[0] > now and entry[1] == generations:
+                self.memo_hits += 1
+                return entry[2]
+            self.memo_misses += 1
+
+        fingerprint = self._load(tables)
+        if self.ttl_seconds:
+            with self._lock:
+                # Stored against the generations seen before the read, so a
+                # write that lands meanwhile makes this entry stale at once
+                self._fingerprints[key] = (now + self.ttl_seconds, generations, fingerprint)
+        return fingerprint
+
+    def _load(self, tables):
+        names = [table.name for table in tables]
+        rows = db.session.execute(
+            select(TableVersion.table_name, func.sum(TableVersion.version), func.max(TableVersion.updated_at))
+            .where(TableVersion.table_name.in_(names))
+            .group_by(TableVersion.table_name)
+        ).all()
+        versions = {name: (int(version), updated_at) for name, version, updated_at in rows}
+
+        digest = hashlib.sha1(repr([versions.get(name, (0, None))[0] for name in names]).encode()).hexdigest()[:32]
+        timestamps = [updated_at for _, updated_at in versions.values() if updated_at is not None]
+        return digest, max(timestamps) if timestamps else None
+
+    def stats(self):
+        return {
+            'ttl_seconds': self.ttl_seconds,
+            'tables_tracked': len(self._versions),
+            'memo_hits': self.memo_hits,
+            'memo_misses': self.memo_misses
+        }
+
+
+_fallback_versions = TableVersions(ttl_seconds=0)
+
+cache_responses = Counter(
+    'http_conditional_get_total', 'Conditional GET outcomes by endpoint', ('endpoint', 'result'))
+
+
+def get_table_versions():
+    """Return the table versions installed on the current app"""
+    if not has_app_context():
+        return _fallback_versions
+    return current_app.extensions.get('table_versions', _fallback_versions)
+
+
+def _set_cache_control(response, max_age, public):
+    if public:
+        response.cache_control.public = True
+    else:
+        response.cache_control.private = True
+    if max_age:
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True
+
+
+def conditional_get(*models, max_age=0, public=True, vary=None):
+    """Serve the view with an ETag and answer matching If-None-Match with 304.
+
+    With ``models`` the ETag comes from their tables' fingerprints, checked
+    before the view runs, so a revalidation costs one small query. Without
+    models (static responses) the body is hashed instead. ``vary`` returns
+    extra ETag input for anything else the response depends on. Cache-Control
+    is ``max-age`` when given, otherwise ``no-cache`` (always revalidate).
+    """
+    tables = [model.__table__ for model in models]
+    TRACKED_TABLES.update(table.name for table in tables)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            endpoint = request.endpoint or view.__name__
+            if not tables:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200:
+                    response.add_etag(weak=True)
+                    response.make_conditional(request)
+                    _set_cache_control(response, max_age, public)
+                cache_responses.inc(endpoint, 'not_modified' if response.status_code == 304 else 'full')
+                return response
+
+            digest, last_modified = get_table_versions().fingerprint(tables)
+            parts = [endpoint, request.full_path, digest]
+            if vary is not None:
+                parts.append(repr(vary()))
+            etag = hashlib.sha1('|'.join(parts).encode()).hexdigest()[:32]
+
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+                cache_responses.inc(endpoint, 'not_modified')
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                cache_responses.inc(endpoint, 'full')
+
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            _set_cache_control(response, max_age, public)
+            return response
+        return wrapper
+    return decorator
+
+
+def _record_write(conn, cursor, statement, parameters, context, executemany):
+    match = WRITE_PATTERN.match(statement)
+    if match is None:
+        return
+    name = match.group(1).lower()
+    if name == VERSION_TABLE:
+        return
+    get_table_versions().bump((name,))
+    conn.info.setdefault('http_cache_written', set()).add(name)
+
+
+def _bump_committed(conn):
+    # Runs just before COMMIT: the shared versions move in the same
+    # transaction as the writes. The local generations are bumped again in
+    # case a fingerprint was read in between and memoised against the new one.
+    written = conn.info.pop('http_cache_written', None)
+    if written:
+        TableVersion.bump(conn, written & TRACKED_TABLES)
+        get_table_versions().bump(written)
+
+
+def _discard_written(conn):
+    conn.info.pop('http_cache_written', None)
+
+
+def init_http_cache(app, db):
+    """Install table versioning on ``app`` and publish its counters"""
+    versions = TableVersions(ttl_seconds=app.config.get('HTTP_CACHE_FINGERPRINT_TTL', DEFAULT_FINGERPRINT_TTL))
+    app.extensions['table_versions'] = versions
+
+    with app.app_context():
+        event.listen(db.engine, 'after_cursor_execute', _record_write)
+        event.listen(db.engine, 'commit', _bump_committed)
+        event.listen(db.engine, 'rollback', _discard_written)
+
+    metrics.register(cache_responses)
+    metrics.register_gauge(
+        'http_cache_fingerprint_lookups', 'Table fingerprint lookups by result',
+        lambda: {(('result', 'hit'),): versions.memo_hits, (('result', 'miss'),): versions.memo_misses}
+    )
+    return versions
@@ -0,0 +1,249 @@
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from src.models.user import db, User
+from src.models.invite_token import InviteToken
+
+logger = logging.getLogger(__name__)
+
+# Emails per IN (...) lookup; stays well under SQLite's bound-parameter limit
+EMAIL_LOOKUP_CHUNK = 500
+# Invite tokens per executemany INSERT, committed together with the batch progress
+INSERT_CHUNK = 1000
+# Invitations per send_invites task, mailed over one SMTP connection
+INVITE_MAIL_CHUNK = 100
+# Rows read, validated and imported together; bounds memory per upload
+READ_CHUNK = 5000
+# Per-row errors kept in a batch's error_log; the rest are only counted
+MAX_LOGGED_ERRORS = 1000
+
+invite_tokens_table = InviteToken.__table__
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def existing_emails(emails, chunk_size=EMAIL_LOOKUP_CHUNK):
+    """The subset of ``emails`` that already belong to a user, in one indexed IN query per chunk"""
+    emails = list(dict.fromkeys(emails))
+    found = set()
+    for chunk in chunked(emails, chunk_size):
+        found.update(email for (email,) in db.session.query(User.email).filter(User.email.in_(chunk)))
+    return found
+
+
+def invited_emails(batch_id, emails, chunk_size=EMAIL_LOOKUP_CHUNK):
+    """The subset of ``emails`` that upload batch ``batch_id`` already has invite tokens for"""
+    emails = list(dict.fromkeys(emails))
+    found = set()
+    for chunk in chunked(emails, chunk_size):
+        found.update(
+            email for (email,) in
+            db.session.query(InviteToken.email).filter(InviteToken.upload_batch_id == batch_id,
+                                                       InviteToken.email.in_(chunk))
+        )
+    return found
+
+
+def import_invites(batch, records, user_type, created_by, expires_at, chunk_size=INSERT_CHUNK, on_insert=None,
+                   skip_invited=False):
+    """Create invite tokens for cleaned import ``records`` in bulk.
+
+    Existing users are found with chunked IN lookups instead of one query
+    per row, and tokens are written with executemany in chunks of
+    ``chunk_size``. Each chunk commits along with ``batch.processed_records``,
+    so progress is visible while a large file imports. ``on_insert`` gets
+    each chunk's invites before that commit, so whatever it adds to the
+    session (a mail task, say) is committed with the tokens or not at all.
+
+    With ``skip_invited`` (a resumed or retried batch), records this batch
+    already has a token for are skipped: they were committed, and their
+    mail queued, by the earlier run.
+
+    Returns ``(successful_invites, failed_invites, already_invited)``:
+    the first two in the shapes the upload route reports and mails, the
+    last a count of skipped records.
+    """
+    successful_invites = []
+    failed_invites = []
+
+    taken = existing_emails(record['email'] for record in records)
+    invited = invited_emails(batch.id, (record['email'] for record in records)) if skip_invited else set()
+
+    pending = []
+    for record in records:
+        if record['email'] in taken:
+            failed_invites.append({
+                'email': record['email'],
+                'error': 'User with this email already exists'
+            })
+        elif record['email'] not in invited:
+            pending.append(record)
+    already_invited = len(records) - len(pending) - len(failed_invites)
+    processed = (batch.processed_records or 0) + len(records) - len(pending)
+
+    for chunk in chunked(pending, chunk_size):
+        rows = []
+        invites = []
+        for record in chunk:
+            raw_token, token_hash = InviteToken.new_token()
+            rows.append({
+                'token': raw_token,
+                'token_hash': token_hash,
+                'institution_id': batch.institution_id,
+                'email': record['email'],
+                'user_type': user_type,
+                'graduation_year': record.get('graduation_year') or record.get('expected_graduation_year'),
+                'student_id': record.get('student_id', record['email'].split('@')[0]),
+                'department': record['department'],
+                'profile_data': record,
+                'is_used': False,
+                'is_expired': False,
+                'expires_at': expires_at,
+                'created_at': datetime.utcnow(),
+                'created_by': created_by,
+                'upload_batch_id': batch.id
+            })
+            invites.append({'email': record['email'], 'token': raw_token, 'user_type': user_type})
+
+        processed += len(chunk)
+        try:
+            db.session.execute(invite_tokens_table.insert(), rows)
+            batch.processed_records = processed
+            if on_insert is not None:
+                on_insert(invites)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Import batch {batch.id}: inserting {len(chunk)} invite tokens failed: {e}")
+            failed_invites.extend({'email': record['email'], 'error': str(e)} for record in chunk)
+            continue
+        successful_invites.extend(invites)
+
+    batch.processed_records = processed
+    return successful_invites, failed_invites, already_invited
+
+
+class ImportResult:
+    """Counts and a bounded sample of the errors from one ``run_import``"""
+
+    def __init__(self, max_logged_errors):
+        self.max_logged_errors = max_logged_errors
+        self.successful = 0
+        self.validation_failures = 0
+        self.invite_failures = 0
+        self.validation_errors = []
+        self.invite_errors = []
+
+    @classmethod
+    def from_checkpoint(cls, batch, max_logged_errors):
+        """The result so far of a batch being resumed, from its counts and error_log"""
+        result = cls(max_logged_errors)
+        log = json.loads(batch.error_log) if batch.error_log else {}
+        result.validation_errors = log.get('data_validation_errors', [])
+        result.invite_errors = log.get('invite_creation_errors', [])
+        result.validation_failures = log.get('data_validation_error_count', len(result.validation_errors))
+        result.invite_failures = log.get('invite_creation_error_count', len(result.invite_errors))
+        result.successful = batch.successful_records or 0
+        return result
+
+    @property
+    def failed(self):
+        return self.validation_failures + self.invite_failures
+
+    def add(self, validation_errors, invites, invite_errors, already_invited=0):
+        self.successful += len(invites) + already_invited
+        self.validation_failures += len(validation_errors)
+        self.invite_failures += len(invite_errors)
+        room = self.max_logged_errors - len(self.validation_errors)
+        self.validation_errors.extend(validation_errors[:max(room, 0)])
+        room = self.max_logged_errors - len(self.invite_errors)
+        self.invite_errors.extend(invite_errors[:max(room, 0)])
+
+    def error_log(self):
+        log = {
+            'data_validation_errors': self.validation_errors,
+            'invite_creation_errors': self.invite_errors
+        }
+        if self.validation_failures > len(self.validation_errors) or self.invite_failures > len(self.invite_errors):
+            log['truncated'] = True
+            log['data_validation_error_count'] = self.validation_failures
+            log['invite_creation_error_count'] = self.invite_failures
+        return log
+
+
+def _last_index(chunk):
+    # A list of (index, row) pairs, or a DataFrame indexed by row
+    return chunk[-1][0] if isinstance(chunk, list) else int(chunk.index[-1])
+
+
+def resume_chunks(chunks, start_row, on_skipped=None):
+    """``chunks`` without the rows before ``start_row``, which an earlier run
+    of the batch imported; they are passed to ``on_skipped`` instead"""
+    for chunk in chunks:
+        if start_row and len(chunk) and _last_index(chunk) < start_row:
+            if on_skipped is not None:
+                on_skipped(chunk)
+            continue
+        if start_row and len(chunk):
+            if isinstance(chunk, list):
+                done = [pair for pair in chunk if pair[0] < start_row]
+                chunk = [pair for pair in chunk if pair[0] >= start_row]
+            else:
+                done, chunk = chunk[chunk.index < start_row], chunk[chunk.index >= start_row]
+            if len(done) and on_skipped is not None:
+                on_skipped(done)
+        start_row = 0
+        yield chunk
+
+
+def run_import(batch, chunks, validate, user_type, created_by, on_invites=None, expires_in_days=30,
+               max_logged_errors=MAX_LOGGED_ERRORS, result=None, skip_invited=False):
+    """Validate and import an upload one chunk at a time.
+
+    ``chunks`` yields lists of ``(index, row)`` pairs or DataFrames (see
+    ``src.utils.import_readers``) and ``validate(chunk)`` returns
+    ``(cleaned_records, errors)`` for one of them. New invites are passed
+    to ``on_invites`` inside the transaction that inserts them (see
+    ``import_invites``), so memory use depends on the chunk size, not on
+    the size of the file.
+
+    After each chunk the batch is checkpointed: ``checkpoint_row``, the
+    running counts and the error sample are committed, so a later run can
+    continue with ``resume_chunks`` and ``ImportResult.from_checkpoint``
+    (and ``skip_invited``, for the rows of a chunk that was cut off after
+    some of its tokens committed). Records timing on ``batch``
+    (processing_seconds, rows_per_second) for the rows of this run.
+    """
+    started = time.perf_counter()
+    if result is None:
+        result = ImportResult(max_logged_errors)
+    expires_at = datetime.utcnow() + timedelta(days=expires_in_days)
+    rows = 0
+
+    for chunk in chunks:
+        if not len(chunk):
+            continue
+        rows += len(chunk)
+        cleaned, errors = validate(chunk)
+        batch.processed_records = (batch.processed_records or 0) + len(errors)
+        invites, failed, already_invited = import_invites(
+            batch, cleaned, user_type, created_by, expires_at, on_insert=on_invites, skip_invited=skip_invited
+        )
+        logged_failures = result.failed
+        result.add(errors, invites, failed, already_invited)
+
+        batch.checkpoint_row = _last_index(chunk) + 1
+        batch.successful_records = result.successful
+        batch.failed_records = result.failed
+        if result.failed != logged_failures:
+            batch.error_log = json.dumps(result.error_log())
+        db.session.commit()
+
+    elapsed = time.perf_counter() - started
+    batch.processing_seconds = round(elapsed, 3)
+    batch.rows_per_second = round(rows / elapsed, 1) if elapsed > 0 else None
+    return result
@@ -0,0 +1,177 @@
+import codecs
+import csv
+import hashlib
+from itertools import islice
+
+# Try to import openpyxl for streaming Excel reads
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+# pandas is only needed for legacy .xls files, which openpyxl cannot open
+try:
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+
+
+class RowReader:
+    """Rows of an uploaded spreadsheet, read lazily from the upload stream.
+
+    ``columns`` is the header row. ``rows()`` yields ``(index, row)`` pairs
+    like ``DataFrame.iterrows`` (index 0 is the first data row, rows are
+    dicts keyed by column name) and ``chunks(size)`` groups them into lists,
+    so an import holds one chunk in memory rather than the whole file.
+    Fully blank lines are skipped. The stream must be seekable: every call
+    to ``rows()`` reads the file again from the start.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.columns = []
+
+    def _records(self):
+        """Raw data rows as sequences of cell values"""
+        raise NotImplementedError
+
+    def rows(self):
+        columns = self.columns
+        width = len(columns)
+        index = 0
+        for values in self._records():
+            if all(_blank(value) for value in values):
+                continue
+            if len(values) < width:
+                values = list(values) + [None] * (width - len(values))
+            yield index, dict(zip(columns, values))
+            index += 1
+
+    def chunks(self, size):
+        rows = self.rows()
+        while True:
+            chunk = list(islice(rows, size))
+            if not chunk:
+                return
+            yield chunk
+
+    def frames(self, size):
+        """``chunks`` as DataFrames indexed by row index, for the columnar validator"""
+        for chunk in self.chunks(size):
+            yield pd.DataFrame([row for _, row in chunk], index=[index for index, _ in chunk], dtype=object)
+
+    def count(self):
+        """Number of data rows, counted in a streaming pass"""
+        return sum(1 for values in self._records() if not all(_blank(value) for value in values))
+
+
+class CSVRowReader(RowReader):
+    def __init__(self, stream, encoding='utf-8-sig'):
+        super().__init__(stream)
+        self.encoding = encoding
+        header = next(self._reader(), None)
+        self.columns = [str(name).strip() for name in header] if header else []
+
+    def _reader(self):
+        self.stream.seek(0)
+        text = codecs.getreader(self.encoding)(self.stream)
+        # Work on a line iterator so the csv module keeps quoted newlines
+        return csv.reader(iter(text.readline, ''))
+
+    def _records(self):
+        reader = self._reader()
+        next(reader, None)
+        return reader
+
+    def frames(self, size):
+        # pandas' C parser builds the columns directly, without a dict per row
+        self.stream.seek(0)
+        frames = pd.read_csv(
+            self.stream, chunksize=size, dtype=str, keep_default_na=False, encoding=self.encoding,
+            header=None, skiprows=1, names=self.columns, usecols=range(len(self.columns)), index_col=False
+        )
+        index = 0
+        for frame in frames:
+            # Same rows as rows(): drop lines whose cells are all blank
+            first = frame.iloc[:, 0].str.strip() == ''
+            if first.any():
+                blank = first & frame[first].apply(lambda column: column.str.strip() == '').all(axis=1)
+                frame = frame[~blank.reindex(frame.index, fill_value=False)]
+            frame.index = range(index, index + len(frame))
+            index += len(frame)
+            if len(frame):
+                yield frame
+
+
+class ExcelRowReader(RowReader):
+    """First worksheet of an .xlsx file, via openpyxl's read-only mode"""
+
+    def __init__(self, stream):
+        super().__init__(stream)
+        header = list(next(self._worksheet_rows(), None) or ())
+        # read-only sheets are padded to the widest row with empty cells
+        while header and header[-1] is None:
+            header.pop()
+        self.columns = ['' if name is None else str(name).strip() for name in header]
+
+    def _worksheet_rows(self):
+        self.stream.seek(0)
+        workbook = openpyxl.load_workbook(self.stream, read_only=True, data_only=True)
+        try:
+            yield from workbook.worksheets[0].iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+    def _records(self):
+        rows = self._worksheet_rows()
+        next(rows, None)
+        width = len(self.columns)
+        return (values[:width] for values in rows)
+
+
+class FrameRowReader(RowReader):
+    """Fallback for formats without a streaming reader: a pandas DataFrame"""
+
+    def __init__(self, frame):
+        super().__init__(None)
+        self.frame = frame
+        self.columns = [str(name).strip() for name in frame.columns]
+
+    def _records(self):
+        return (list(values) for values in self.frame.itertuples(index=False, name=None))
+
+
+def _blank(value):
+    if value is None:
+        return True
+    if isinstance(value, float):
+        return value != value  # NaN
+    return isinstance(value, str) and not value.strip()
+
+
+def file_sha256(path, block_size=1 << 20):
+    """Hex SHA-256 of a stored upload, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as stream:
+        for block in iter(lambda: stream.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def open_rows(file, filename):
+    """A ``RowReader`` for an uploaded CSV or Excel file"""
+    extension = filename.rsplit('.', 1)[-1].lower()
+    stream = getattr(file, 'stream', file)
+    if extension == 'csv':
+        return CSVRowReader(stream)
+    if extension == 'xlsx':
+        if not OPENPYXL_AVAILABLE:
+            raise ValueError("Excel files not supported - openpyxl not installed")
+        return ExcelRowReader(stream)
+    if extension == 'xls':
+        if not PANDAS_AVAILABLE:
+            raise ValueError("Excel files require pandas - not available")
+        return FrameRowReader(pd.read_excel(stream))
+    raise ValueError(f"Unsupported file type: {extension}")
@@ -0,0 +1,200 @@
+import re
+from datetime import datetime
+
+try:
+    import numpy as np
+    import pandas as pd
+    # numpy 2 moved the vectorised string functions to np.strings
+    _strings = getattr(np, 'strings', np.char)
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+
+# Deliberately loose: one @, no whitespace, a dot in the domain
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+# Integer text, as int() takes it: '2015.0' in a CSV is not a number
+INTEGER_PATTERN = re.compile(r'[+-]?\d+')
+
+DUPLICATE_EMAIL_ERROR = 'Duplicate email in file'
+
+# Optional free-text columns, in the order they appear in a cleaned record
+ALUMNI_TEXT_FIELDS = ('degree_type', 'major', 'minor', 'current_position', 'current_company',
+                      'location', 'linkedin_url', 'phone', 'bio')
+STUDENT_TEXT_FIELDS = ('current_semester', 'major', 'minor', 'phone', 'address', 'bio')
+ALUMNI_LIST_FIELDS = ('skills',)
+STUDENT_LIST_FIELDS = ('skills', 'interests', 'career_interests')
+
+
+def _text(frame, name):
+    """Column as a stripped unicode array, '' where the cell is missing or blank"""
+    if name not in frame:
+        return np.full(len(frame), '')
+    values = frame[name].to_numpy(dtype=object, copy=True)
+    values[pd.isna(values)] = ''
+    return _strings.strip(values.astype(str))
+
+
+def _per_value(values, parse):
+    """``parse`` applied once per distinct value, as an object array; columns
+    like years and skills repeat a handful of values across thousands of rows"""
+    uniques, inverse = np.unique(values, return_inverse=True)
+    parsed = np.empty(len(uniques), dtype=object)
+    for position, value in enumerate(uniques.tolist()):
+        parsed[position] = parse(value)
+    return parsed[inverse]
+
+
+def _integer(text):
+    return int(text) if INTEGER_PATTERN.fullmatch(text) else None
+
+
+def _integers(frame, name):
+    """(values, is_number, is_empty); values are ints, or None where the cell is not one"""
+    text = _text(frame, name)
+    if name in frame and frame[name].dtype.kind in 'Of':
+        # Spreadsheets hand numbers over as floats; a whole one is an integer
+        # cell, as int() takes it, not the text '2015.0'
+        cells = frame[name].to_numpy()
+        whole = np.fromiter((isinstance(cell, float) and cell.is_integer() for cell in cells), bool, len(cells))
+        if whole.any():
+            text = text.astype(object)
+            text[whole] = [str(int(cell)) for cell in cells[whole]]
+    values = _per_value(text, _integer)
+    return values, np.not_equal(values, None), text == ''
+
+
+def _split(text):
+    return [item for item in (part.strip() for part in text.split(',')) if item]
+
+
+def _lists(text):
+    """Comma-separated cells split into lists of non-empty, stripped items.
+    Equal cells share one list; records are serialised, never mutated."""
+    return _per_value(text, _split).tolist()
+
+
+def _optional(text):
+    return [value or None for value in text.tolist()]
+
+
+def claim_emails(rows, seen_emails):
+    """Add the valid emails of already-imported rows to ``seen_emails``, as
+    validating them would, so a resumed import still reports repeats of them"""
+    if PANDAS_AVAILABLE and isinstance(rows, pd.DataFrame):
+        emails = rows['email'].tolist() if 'email' in rows else []
+    else:
+        emails = [row.get('email') for _, row in rows]
+    for email in emails:
+        if email is not None:
+            email = str(email).strip().lower()
+            if EMAIL_PATTERN.match(email):
+                seen_emails.add(email)
+
+
+def validate_frame(rows, user_type, seen_emails=None):
+    """Columnar equivalent of the row-by-row upload validation.
+
+    ``rows`` is one chunk of an upload: a DataFrame, or ``(index, row)``
+    pairs. Returns ``(cleaned_data, errors)`` with the same record and
+    error shapes as ``clean_and_validate_data``'s row path. Checks run on
+    whole columns, and per-cell parsing (years, skill lists) runs once per
+    distinct value; Python only loops to assemble the output records.
+    ``seen_emails`` carries emails claimed by earlier chunks so duplicates
+    are found across the whole file; it is updated in place.
+    """
+    if seen_emails is None:
+        seen_emails = set()
+    if not len(rows):
+        return [], []
+
+    if isinstance(rows, pd.DataFrame):
+        frame = rows
+    else:
+        frame = pd.DataFrame([row for _, row in rows], index=[index for index, _ in rows], dtype=object)
+    current_year = datetime.now().year
+
+    # (field, cleaned values, failed mask) in record order; the field is
+    # left out of a record whose mask is set, as the row path does
+    fields = []
+    # (failed mask, message) in the row path's error order
+    checks = []
+
+    for name, label in (('first_name', 'First name'), ('last_name', 'Last name')):
+        text = _text(frame, name)
+        missing = text == ''
+        fields.append((name, text.tolist(), missing))
+        checks.append((missing, f'{label} is required'))
+
+    email = _strings.lower(_text(frame, 'email'))
+    emails = email.tolist()
+    email_missing = email == ''
+    email_valid = np.fromiter((EMAIL_PATTERN.match(value) is not None for value in emails), bool, len(emails))
+    email_invalid = ~email_missing & ~email_valid
+    # The first row carrying an email claims it, in this chunk or an earlier one
+    repeated = pd.Series(np.where(email_valid, email, None)).duplicated(keep='first').to_numpy()
+    claimed_before = np.fromiter((value in seen_emails for value in emails), bool, len(emails))
+    duplicate = email_valid & (repeated | claimed_before)
+    seen_emails.update(email[email_valid & ~duplicate].tolist())
+    fields.append(('email', emails, ~email_valid))
+    checks.append((email_missing, 'Email is required'))
+    checks.append((email_invalid, 'Invalid email format'))
+    checks.append((duplicate, DUPLICATE_EMAIL_ERROR))
+
+    department = _text(frame, 'department')
+    fields.append(('department', department.tolist(), department == ''))
+    checks.append((department == '', 'Department is required'))
+
+    def year(name, label, low, high):
+        values, is_number, _ = _integers(frame, name)
+        numbers = np.where(is_number, values, low)
+        out_of_range = (numbers < low) | (numbers > high)
+        fields.append((name, values.tolist(), ~is_number | out_of_range))
+        checks.append((out_of_range, f'Invalid {label}'))
+        checks.append((~is_number, f'{label.capitalize()} must be a valid number'))
+
+    def optional_integer(name, label):
+        values, is_number, empty = _integers(frame, name)
+        fields.append((name, values.tolist(), None))
+        checks.append((~empty & ~is_number, f'{label} must be a valid number'))
+
+    if user_type == 'alumni':
+        year('graduation_year', 'graduation year', 1900, current_year)
+        optional_integer('graduation_month', 'Graduation month')
+        text_fields, list_fields = ALUMNI_TEXT_FIELDS, ALUMNI_LIST_FIELDS
+    else:  # student
+        year('enrollment_year', 'enrollment year', 1900, current_year + 1)
+        year('expected_graduation_year', 'expected graduation year', current_year, current_year + 10)
+        fields.append(('student_id', _optional(_text(frame, 'student_id')), None))
+        optional_integer('current_year', 'Current year')
+        text_fields, list_fields = STUDENT_TEXT_FIELDS, STUDENT_LIST_FIELDS
+
+    for name in text_fields:
+        fields.append((name, _optional(_text(frame, name)), None))
+    for name in list_fields:
+        fields.append((name, _lists(_text(frame, name)), None))
+
+    # Assemble records; only rows that failed a check are touched again
+    names = [name for name, _, _ in fields]
+    records = [dict(zip(names, values)) for values in zip(*(values for _, values, _ in fields))]
+    for name, _, failed in fields:
+        if failed is not None:
+            for position in np.flatnonzero(failed).tolist():
+                del records[position][name]
+
+    row_errors = {}
+    for failed, message in checks:
+        for position in np.flatnonzero(failed).tolist():
+            row_errors.setdefault(position, []).append(message)
+
+    cleaned_data = []
+    errors = []
+    for position, (index, record) in enumerate(zip(frame.index.tolist(), records)):
+        record['row_number'] = index + 2  # +2 because index is 0-based and we skip header
+        if position in row_errors:
+            record['errors'] = row_errors[position]
+            errors.append(record)
+        else:
+            record['errors'] = []
+            cleaned_data.append(record)
+    return cleaned_data, errors
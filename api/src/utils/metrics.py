@@ -0,0 +1,264 @@
+import bisect
+import hmac
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from flask import Response, current_app, g, has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Statements kept per request for the slow-request log
+MAX_RECORDED_STATEMENTS = 50
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label set"""
+
+    def __init__(self, name, description, buckets, label_names=('endpoint',)):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(label_names)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        for label_values, (bucket_counts, total, count) in items:
+            labels = list(zip(self.label_names, label_values))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{_format_labels(labels + [("le", bound)])} {cumulative}')
+            lines.append(f'{self.name}_bucket{_format_labels(labels + [("le", "+Inf")])} {count}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {count}')
+        return lines
+
+
+class Counter:
+    """Monotonic counter, one series per label set"""
+
+    def __init__(self, name, description, label_names=('endpoint',)):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._series[label_values] = self._series.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._series.items())
+        for label_values, value in items:
+            lines.append(f'{self.name}{_format_labels(list(zip(self.label_names, label_values)))} {value}')
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide metrics: request histograms plus gauges sampled at scrape time"""
+
+    def __init__(self):
+        self.request_latency = Histogram(
+            'http_request_duration_seconds', 'Total request latency by endpoint', LATENCY_BUCKETS)
+        self.db_time = Histogram(
+            'http_request_db_seconds', 'Time spent executing SQL per request by endpoint', LATENCY_BUCKETS)
+        self.serialization_time = Histogram(
+            'http_request_serialization_seconds', 'Time spent encoding JSON per request by endpoint', LATENCY_BUCKETS)
+        self.query_count = Histogram(
+            'http_request_db_queries', 'SQL statements executed per request by endpoint', QUERY_COUNT_BUCKETS)
+        self.requests = Counter(
+            'http_requests_total', 'Requests by endpoint and status code', ('endpoint', 'status'))
+        self.slow_requests = Counter(
+            'http_slow_requests_total', 'Requests slower than SLOW_REQUEST_MS by endpoint')
+        self._extra = []
+        self._gauges = {}
+
+    def register(self, metric):
+        """Add a subsystem's own Histogram or Counter to the exposition"""
+        self._extra.append(metric)
+        return metric
+
+    def register_gauge(self, name, description, sample):
+        """Expose a value computed at scrape time.
+
+        ``sample`` returns either a number or a dict mapping a label tuple
+        (of (name, value) pairs) to a number.
+        """
+        self._gauges[name] = (description, sample)
+
+    def render(self):
+        lines = []
+        for metric in (self.request_latency, self.db_time, self.serialization_time,
+                       self.query_count, self.requests, self.slow_requests, *self._extra):
+            lines.extend(metric.render())
+
+        for name, (description, sample) in sorted(self._gauges.items()):
+            try:
+                value = sample()
+            except Exception as e:
+                logger.warning(f"Metrics gauge {name} failed: {e}")
+                continue
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} gauge')
+            if isinstance(value, dict):
+                for labels, series_value in sorted(value.items()):
+                    lines.append(f'{name}{_format_labels(list(labels))} {series_value}')
+            else:
+                lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+
+@contextmanager
+def serialization_timer():
+    """Charge the time spent in the block to the current request's JSON encoding"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context() and hasattr(g, 'request_metrics'):
+            g.request_metrics['serialization_time'] += time.perf_counter() - started
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """JSON provider that charges encoding time to the current request"""
+
+    def dumps(self, obj, **kwargs):
+        with serialization_timer():
+            return super().dumps(obj, **kwargs)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_start_time'].pop()
+    if not has_request_context() or not hasattr(g, 'request_metrics'):
+        return
+
+    elapsed = time.perf_counter() - started
+    request_metrics = g.request_metrics
+    request_metrics['query_count'] += 1
+    request_metrics['db_time'] += elapsed
+    if len(request_metrics['statements']) < MAX_RECORDED_STATEMENTS:
+        request_metrics['statements'].append((elapsed, statement))
+
+
+def _handle_db_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_start_time'):
+        connection.info['query_start_time'].pop()
+
+
+def _start_request_metrics():
+    g.request_metrics = {
+        'started': time.perf_counter(),
+        'query_count': 0,
+        'db_time': 0.0,
+        'serialization_time': 0.0,
+        'statements': []
+    }
+
+
+def _capture_response_status(response):
+    request_metrics = g.get('request_metrics')
+    if request_metrics is not None:
+        request_metrics['status'] = response.status_code
+    return response
+
+
+def _record_request_metrics(error=None):
+    # A teardown hook, so requests whose view raised are counted too; no
+    # response reached after_request for them, which makes them a 500
+    request_metrics = g.pop('request_metrics', None)
+    if request_metrics is None:
+        return
+
+    endpoint = request.endpoint or 'unmatched'
+    latency = time.perf_counter() - request_metrics['started']
+
+    metrics.request_latency.observe(latency, endpoint)
+    metrics.db_time.observe(request_metrics['db_time'], endpoint)
+    metrics.serialization_time.observe(request_metrics['serialization_time'], endpoint)
+    metrics.query_count.observe(request_metrics['query_count'], endpoint)
+    metrics.requests.inc(endpoint, request_metrics.get('status', 500))
+
+    slow_threshold_ms = current_app.config.get('SLOW_REQUEST_MS', 0)
+    if slow_threshold_ms and latency * 1000 >= slow_threshold_ms:
+        metrics.slow_requests.inc(endpoint)
+        slowest = sorted(request_metrics['statements'], key=lambda item: item[0], reverse=True)[:5]
+        logger.warning(
+            f"Slow request {request.method} {request.path} ({endpoint}): "
+            f"{latency * 1000:.1f}ms total, {request_metrics['query_count']} queries, "
+            f"{request_metrics['db_time'] * 1000:.1f}ms in SQL, "
+            f"{request_metrics['serialization_time'] * 1000:.1f}ms serialising"
+            + ''.join(f"\n  [{elapsed * 1000:.1f}ms] {statement}" for elapsed, statement in slowest)
+        )
+
+
+def metrics_view():
+    """Prometheus text exposition of all collected metrics"""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied, f'Bearer {token}'):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_metrics(app, db):
+    """Instrument every request and SQL statement of ``app`` and serve /metrics.
+
+    Must run after the blueprints are registered and the database is
+    configured.
+    """
+    if not isinstance(app.json, TimedJSONProvider):
+        app.json = TimedJSONProvider(app)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(db.engine, 'handle_error', _handle_db_error)
+
+    app.before_request(_start_request_metrics)
+    app.after_request(_capture_response_status)
+    app.teardown_request(_record_request_metrics)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
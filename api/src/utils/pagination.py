@@ -0,0 +1,85 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import DateTime
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 200
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client supplies a cursor we did not issue"""
+
+
+def parse_limit(value, default=DEFAULT_PAGE_LIMIT, maximum=MAX_PAGE_LIMIT):
+    """Parse a ?limit= value and clamp it to [1, maximum]"""
+    try:
+        limit = int(value) if value is not None else default
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+def encode_cursor(values):
+    """Encode the sort key of the last row on a page as an opaque token"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, size):
+    """Decode a cursor produced by encode_cursor, validating its shape"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        raise InvalidCursor('Malformed cursor')
+
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor('Malformed cursor')
+    return values
+
+
+def keyset_filter(columns, values, descending=False):
+    """Build the "strictly after this row" predicate for a keyset page.
+
+    ``columns`` and ``values`` are ordered most-significant first and the last
+    column must be unique (normally the primary key). The predicate is spelled
+    out as nested OR/AND rather than a row-value comparison so it works on
+    SQLite as well as PostgreSQL while still using the composite index.
+    """
+    column, value = columns[0], values[0]
+    after = column < value if descending else column > value
+    if len(columns) == 1:
+        return after
+    return after | ((column == value) & keyset_filter(columns[1:], values[1:], descending))
+
+
+def keyset_page(query, columns, cursor=None, limit=DEFAULT_PAGE_LIMIT, descending=False):
+    """Fetch one page of ``query`` ordered by ``columns`` starting after ``cursor``.
+
+    Returns ``(rows, next_cursor)`` where ``next_cursor`` is None on the last
+    page. One extra row is fetched to detect whether another page exists, so
+    no COUNT query is needed.
+    """
+    if cursor:
+        values = decode_cursor(cursor, len(columns))
+        try:
+            values = [
+                datetime.fromisoformat(v) if isinstance(c.type, DateTime) and v is not None else v
+                for c, v in zip(columns, values)
+            ]
+        except (TypeError, ValueError):
+            raise InvalidCursor('Malformed cursor')
+        query = query.filter(keyset_filter(columns, values, descending))
+
+    ordering = [c.desc() if descending else c.asc() for c in columns]
+    rows = query.order_by(*ordering).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, c.key) for c in columns])
+
+    return rows, next_cursor
@@ -0,0 +1,231 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, g, has_app_context, session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+from src.models.user import db, User, UserRole, UserStatus
+from src.models.institution import Institution
+from src.utils.activity_tracker import get_activity_tracker
+from src.utils.metrics import metrics
+
+DEFAULT_TTL_SECONDS = 30
+DEFAULT_MAX_SIZE = 10000
+
+# User attributes captured in a Principal; changing any of them evicts the entry
+PRINCIPAL_FIELDS = ['username', 'first_name', 'last_name', 'role', 'status', 'institution_id', 'is_email_verified']
+
+
+class Principal:
+    """Read-only snapshot of the authorisation-relevant parts of a User.
+
+    Offers the role helpers the decorators and Socket.IO handlers use so it
+    can stand in for a User there without loading the ORM row.
+    """
+
+    __slots__ = ('id', 'username', 'first_name', 'last_name', 'role', 'status',
+                 'institution_id', 'is_email_verified', 'institution_active')
+
+    def __init__(self, row):
+        (self.id, self.username, self.first_name, self.last_name, self.role, self.status,
+         self.institution_id, self.is_email_verified, self.institution_active) = row
+
+    def __repr__(self):
+        return f'<Principal {self.username}>'
+
+    def is_active(self):
+        return self.status == UserStatus.ACTIVE
+
+    def get_full_name(self):
+        if self.first_name and self.last_name:
+            return f"{self.first_name} {self.last_name}"
+        return self.username
+
+    def is_super_admin(self):
+        return self.role == UserRole.SUPER_ADMIN
+
+    def is_institution_admin(self):
+        return self.role == UserRole.INSTITUTION_ADMIN
+
+    def can_message_user(self, target_user):
+        return self.institution_id == target_user.institution_id or self.is_super_admin()
+
+
+class PrincipalCache:
+    """Size-bounded LRU of Principals that expire after ``ttl_seconds``.
+
+    Entries are evicted on role/status changes made through this process;
+    the short TTL bounds how long a change made by another worker can take
+    to be seen.
+    """
+
+    def __init__(self, ttl_seconds=DEFAULT_TTL_SECONDS, max_size=DEFAULT_MAX_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries = OrderedDict()  # user id -> (expires_at, principal)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, user_id):
+        """Return the Principal for ``user_id``, loading it on a miss; None if no such user"""
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        principal = self._load(user_id)
+        if principal is None:
+            return None
+
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl_seconds, principal)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return principal
+
+    def _load(self, user_id):
+        row = db.session.query(
+            User.id, User.username, User.first_name, User.last_name, User.role, User.status,
+            User.institution_id, User.is_email_verified, Institution.is_active
+        ).outerjoin(Institution, Institution.id == User.institution_id).filter(User.id == user_id).first()
+        return Principal(row) if row else None
+
+    def invalidate(self, user_id):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def invalidate_institution(self, institution_id):
+        with self._lock:
+            stale = [uid for uid, (_, p) in self._entries.items() if p.institution_id == institution_id]
+            for uid in stale:
+                del self._entries[uid]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl_seconds': self.ttl_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 3) if lookups else 0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
+
+
+_fallback_cache = PrincipalCache()
+
+
+def init_principal_cache(app):
+    """Install the principal cache on ``app`` and publish its counters"""
+    cache = PrincipalCache(
+        ttl_seconds=app.config.get('PRINCIPAL_CACHE_TTL_SECONDS', DEFAULT_TTL_SECONDS),
+        max_size=app.config.get('PRINCIPAL_CACHE_SIZE', DEFAULT_MAX_SIZE)
+    )
+    app.extensions['principal_cache'] = cache
+
+    metrics.register_gauge(
+        'principal_cache_lookups', 'Principal cache lookups by result',
+        lambda: {(('result', 'hit'),): cache.hits, (('result', 'miss'),): cache.misses}
+    )
+    metrics.register_gauge('principal_cache_entries', 'Principals currently cached', lambda: len(cache))
+    return cache
+
+
+def get_principal_cache():
+    """Return the principal cache installed on the current app"""
+    if not has_app_context():
+        return _fallback_cache
+    return current_app.extensions.get('principal_cache', _fallback_cache)
+
+
+def current_principal():
+    """The signed-in user's Principal, looked up at most once per request"""
+    user_id = session.get('user_id')
+    if not user_id:
+        return None
+
+    principal = g.get('principal')
+    if principal is None or principal.id != user_id:
+        principal = get_principal_cache().get(user_id)
+        g.principal = principal
+    return principal
+
+
+def touch_last_active(principal):
+    """Record activity for ``principal`` without a database round trip"""
+    get_activity_tracker().record_active(principal.id)
+
+
+def _invalidate(target, user_ids=None, institution_ids=None):
+    # Evict now, and again once the change commits, so a concurrent request
+    # cannot re-cache the pre-commit row for a whole TTL
+    cache = get_principal_cache()
+    for user_id in user_ids or ():
+        cache.invalidate(user_id)
+    for institution_id in institution_ids or ():
+        cache.invalidate_institution(institution_id)
+
+    session = object_session(target)
+    if session is not None:
+        pending = session.info.setdefault('principal_invalidations', (set(), set()))
+        pending[0].update(user_ids or ())
+        pending[1].update(institution_ids or ())
+
+
+@event.listens_for(User, 'after_update')
+def _user_updated(mapper, connection, user):
+    state = inspect(user)
+    if any(state.attrs[field].history.has_changes() for field in PRINCIPAL_FIELDS):
+        _invalidate(user, user_ids=[user.id])
+
+
+@event.listens_for(User, 'after_delete')
+def _user_deleted(mapper, connection, user):
+    _invalidate(user, user_ids=[user.id])
+
+
+@event.listens_for(Institution, 'after_update')
+def _institution_updated(mapper, connection, institution):
+    if inspect(institution).attrs['is_active'].history.has_changes():
+        _invalidate(institution, institution_ids=[institution.id])
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(session):
+    pending = session.info.pop('principal_invalidations', None)
+    if pending:
+        cache = get_principal_cache()
+        for user_id in pending[0]:
+            cache.invalidate(user_id)
+        for institution_id in pending[1]:
+            cache.invalidate_institution(institution_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_invalidations(session):
+    session.info.pop('principal_invalidations', None)
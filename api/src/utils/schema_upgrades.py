@@ -0,0 +1,79 @@
+import logging
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
+from src.models.user import db
+from src.models.alumni import Alumni
+from src.models.event import Event
+
+logger = logging.getLogger(__name__)
+
+# Columns added to existing models, as (table, column, DDL, backfill). The
+# DDL is portable between SQLite and PostgreSQL; ``backfill`` fills the new
+# column in from the existing rows.
+COLUMNS = [
+    ('event', 'registration_count',
+     'ALTER TABLE event ADD COLUMN registration_count INTEGER NOT NULL DEFAULT 0',
+     Event.reconcile_registration_counts),
+    ('alumni', 'networking_score',
+     'ALTER TABLE alumni ADD COLUMN networking_score INTEGER NOT NULL DEFAULT 0',
+     Alumni.refresh_networking_scores),
+]
+
+# Indexes and unique constraints added to existing tables, as (table, name, DDL).
+# A unique constraint is created as a unique index of the same name, which
+# SQLite can add to an existing table.
+INDEXES = [
+    ('event_registration', 'uq_event_registration_user',
+     'CREATE UNIQUE INDEX uq_event_registration_user ON event_registration (event_id, user_id)'),
+    ('event_registration', 'ix_event_registration_event_status',
+     'CREATE INDEX ix_event_registration_event_status ON event_registration (event_id, status, registration_date)'),
+    ('alumni', 'ix_alumni_networking_score',
+     'CREATE INDEX ix_alumni_networking_score ON alumni (networking_score)'),
+    ('alumni', 'ix_alumni_mentor_networking_score',
+     'CREATE INDEX ix_alumni_mentor_networking_score ON alumni (is_mentor, networking_score, id)'),
+]
+
+
+def _index_names(inspector, table):
+    names = {index['name'] for index in inspector.get_indexes(table)}
+    names.update(constraint['name'] for constraint in inspector.get_unique_constraints(table))
+    return names
+
+
+def upgrade_schema():
+    """Add the columns and indexes that ``db.create_all()`` leaves out.
+
+    create_all only creates missing tables, so a database created before a
+    model gained a column would fail every query on that model. Each
+    upgrade is checked against the live schema first, so this is a no-op
+    once applied. Returns the names of the columns and indexes added.
+    """
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    applied = []
+
+    for table, column, ddl, backfill in COLUMNS:
+        if table not in tables or column in {c['name'] for c in inspector.get_columns(table)}:
+            continue
+        db.session.execute(text(ddl))
+        db.session.commit()
+        logger.warning(f"Added {table}.{column} to the existing database, backfilling it")
+        backfill()
+        applied.append(f'{table}.{column}')
+
+    for table, name, ddl in INDEXES:
+        if table not in tables or name in _index_names(inspector, table):
+            continue
+        try:
+            db.session.execute(text(ddl))
+            db.session.commit()
+        except IntegrityError as e:
+            # Existing rows break the unique constraint; removing them is left
+            # to an operator rather than done on startup
+            db.session.rollback()
+            logger.error(f"Could not create {name} on {table}, remove the duplicate rows and restart: {e}")
+            continue
+        logger.warning(f"Added index {name} on {table} to the existing database")
+        applied.append(name)
+
+    return applied
@@ -0,0 +1,230 @@
+import bisect
+import heapq
+import sys
+import threading
+import time
+from array import array
+from collections import Counter
+
+# Match weights: exact token > prefix (typeahead) > trigram fuzzy match
+EXACT_WEIGHT = 1.0
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.5
+
+MIN_PREFIX_LENGTH = 2
+MIN_FUZZY_LENGTH = 3
+MAX_PREFIX_EXPANSIONS = 64
+MAX_FUZZY_EXPANSIONS = 16
+FUZZY_THRESHOLD = 0.3
+
+# Once this many matches per requested result are found the scan stops;
+# the posting lists are walked best-term first so these are the top tier
+SCAN_FACTOR = 4
+
+# Rebuild once this share of document slots are dead
+COMPACT_RATIO = 0.25
+
+
+def trigrams(term):
+    """Padded character trigrams of a token, e.g. 'sam' -> {'  s', ' sa', 'sam', 'am '}"""
+    padded = f'  {term} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AlumniSearchIndex:
+    """Compact in-memory inverted index over alumni search documents.
+
+    Every document lives in an integer slot. Postings are ``array('i')`` lists
+    of slots per term, and each slot keeps the ``array('i')`` of term ids it
+    contains, so verifying a candidate against the remaining query tokens
+    never touches the other posting lists. Terms are kept in a sorted list for
+    prefix lookups and in a trigram -> term ids map for fuzzy matching.
+
+    Updates are tombstone + append: the old slot is marked dead and the new
+    version of the document gets a fresh slot. Dead slots are reclaimed by
+    compacting once they pass ``COMPACT_RATIO`` of the index.
+    """
+
+    def __init__(self, tokenizer):
+        self._tokenize = tokenizer
+        self._lock = threading.RLock()
+        self._reset()
+        self.built_at = None
+        self.build_seconds = 0.0
+        self.query_count = 0
+        self.query_seconds = 0.0
+
+    def _reset(self):
+        self._slot_ids = array('i')      # slot -> alumni id (0 when dead)
+        self._slot_terms = []            # slot -> array of term ids (None when dead)
+        self._slots = {}                 # alumni id -> live slot
+        self._term_ids = {}              # term -> term id
+        self._terms = []                 # term id -> term
+        self._sorted_terms = []          # terms in lexical order, for prefix search
+        self._postings = []              # term id -> array of slots
+        self._trigrams = {}              # trigram -> array of term ids
+        self._dead = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def build(self, documents):
+        """Replace the index contents with ``documents``, an iterable of (alumni_id, text)"""
+        started = time.perf_counter()
+        with self._lock:
+            self._reset()
+            for alumni_id, document in documents:
+                self._add(alumni_id, document, keep_sorted=False)
+            self._sorted_terms = sorted(self._terms)
+            self.built_at = time.time()
+            self.build_seconds = time.perf_counter() - started
+
+    def upsert(self, alumni_id, document):
+        with self._lock:
+            self._discard(alumni_id)
+            self._add(alumni_id, document, keep_sorted=True)
+            self._maybe_compact()
+
+    def remove(self, alumni_id):
+        with self._lock:
+            self._discard(alumni_id)
+            self._maybe_compact()
+
+    def _term_id(self, term, keep_sorted):
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            term_id = len(self._terms)
+            self._term_ids[term] = term_id
+            self._terms.append(term)
+            self._postings.append(array('i'))
+            for gram in trigrams(term):
+                self._trigrams.setdefault(gram, array('i')).append(term_id)
+            if keep_sorted:
+                bisect.insort(self._sorted_terms, term)
+        return term_id
+
+    def _add(self, alumni_id, document, keep_sorted):
+        term_ids = array('i', sorted({self._term_id(t, keep_sorted) for t in self._tokenize(document)}))
+        slot = len(self._slot_ids)
+        self._slot_ids.append(alumni_id)
+        self._slot_terms.append(term_ids)
+        self._slots[alumni_id] = slot
+        for term_id in term_ids:
+            self._postings[term_id].append(slot)
+
+    def _discard(self, alumni_id):
+        slot = self._slots.pop(alumni_id, None)
+        if slot is not None:
+            self._slot_ids[slot] = 0
+            self._slot_terms[slot] = None
+            self._dead += 1
+
+    def _maybe_compact(self):
+        if self._dead and self._dead > COMPACT_RATIO * len(self._slot_ids):
+            live = [
+                (self._slot_ids[slot], ' '.join(self._terms[t] for t in self._slot_terms[slot]))
+                for slot in self._slots.values()
+            ]
+            built_at, build_seconds = self.built_at, self.build_seconds
+            self.build(live)
+            self.built_at, self.build_seconds = built_at, build_seconds
+
+    def _expand(self, token):
+        """Map a query token to candidate terms: {term_id: weight}"""
+        candidates = {}
+        exact = self._term_ids.get(token)
+        if exact is not None:
+            candidates[exact] = EXACT_WEIGHT
+
+        if len(token) >= MIN_PREFIX_LENGTH:
+            start = bisect.bisect_left(self._sorted_terms, token)
+            for term in self._sorted_terms[start:start + MAX_PREFIX_EXPANSIONS]:
+                if not term.startswith(token):
+                    break
+                candidates.setdefault(self._term_ids[term], PREFIX_WEIGHT)
+
+        if not candidates and len(token) >= MIN_FUZZY_LENGTH:
+            grams = trigrams(token)
+            shared = Counter()
+            for gram in grams:
+                shared.update(self._trigrams.get(gram, ()))
+            scored = []
+            for term_id, common in shared.items():
+                similarity = common / (len(grams) + len(trigrams(self._terms[term_id])) - common)
+                if similarity >= FUZZY_THRESHOLD:
+                    scored.append((similarity, term_id))
+            for similarity, term_id in heapq.nlargest(MAX_FUZZY_EXPANSIONS, scored):
+                candidates[term_id] = FUZZY_WEIGHT * similarity
+
+        return candidates
+
+    def search(self, text, limit=20):
+        """Return up to ``limit`` (alumni_id, score) pairs matching every token of ``text``"""
+        tokens = self._tokenize(text)
+        if not tokens:
+            return []
+
+        started = time.perf_counter()
+        with self._lock:
+            expansions = [self._expand(token) for token in dict.fromkeys(tokens)]
+            if not all(expansions):
+                return self._record_query(started, [])
+
+            # Drive the scan from the token with the shortest posting lists
+            expansions.sort(key=lambda terms: sum(len(self._postings[t]) for t in terms))
+            driver, others = expansions[0], expansions[1:]
+
+            scores = {}
+            wanted = limit * SCAN_FACTOR
+            for term_id, weight in sorted(driver.items(), key=lambda item: -item[1]):
+                for slot in self._postings[term_id]:
+                    doc_terms = self._slot_terms[slot]
+                    if doc_terms is None or slot in scores:
+                        continue
+                    total = weight
+                    for terms in others:
+                        best = max((terms.get(t, 0) for t in doc_terms), default=0)
+                        if not best:
+                            break
+                        total += best
+                    else:
+                        scores[slot] = total
+                        if len(scores) >= wanted:
+                            break
+                if len(scores) >= wanted:
+                    break
+
+            top = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+            return self._record_query(started, [(self._slot_ids[slot], round(score, 3)) for slot, score in top])
+
+    def _record_query(self, started, results):
+        self.query_count += 1
+        self.query_seconds += time.perf_counter() - started
+        return results
+
+    def memory_bytes(self):
+        """Approximate heap footprint of the index structures"""
+        with self._lock:
+            total = sys.getsizeof(self._slot_ids) + sys.getsizeof(self._slot_terms)
+            total += sum(sys.getsizeof(terms) for terms in self._slot_terms if terms is not None)
+            total += sys.getsizeof(self._slots) + sys.getsizeof(self._term_ids)
+            total += sys.getsizeof(self._terms) + sys.getsizeof(self._sorted_terms)
+            total += sum(sys.getsizeof(term) for term in self._terms)
+            total += sys.getsizeof(self._postings) + sum(sys.getsizeof(p) for p in self._postings)
+            total += sys.getsizeof(self._trigrams) + sum(sys.getsizeof(t) for t in self._trigrams.values())
+            return total
+
+    def stats(self):
+        with self._lock:
+            return {
+                'documents': len(self._slots),
+                'dead_slots': self._dead,
+                'terms': len(self._terms),
+                'trigrams': len(self._trigrams),
+                'postings': sum(len(p) for p in self._postings),
+                'memory_bytes': self.memory_bytes(),
+                'built_at': self.built_at,
+                'build_seconds': round(self.build_seconds, 3),
+                'queries': self.query_count,
+                'avg_query_ms': round(self.query_seconds / self.query_count * 1000, 3) if self.query_count else 0
+            }
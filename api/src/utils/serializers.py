@@ -0,0 +1,373 @@
+import logging
+import threading
+from sqlalchemy.orm import load_only
+from src.models.user import User
+from src.models.alumni import Alumni
+from src.models.event import Event
+from src.models.job import Job
+from src.models.message import ForumPost, Message
+from src.utils.metrics import TimedJSONProvider, serialization_timer
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+ADMIN_ROLES = ('super_admin', 'institution_admin')
+
+# Compiled variants kept per model (one per viewer role and fieldset)
+MAX_COMPILED_VARIANTS = 64
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def _or_empty_list(value):
+    return value or []
+
+
+def _or_zero(value):
+    return value or 0
+
+
+def _enum_value(value):
+    return value.value if value else None
+
+
+# Converters by field kind; None means the attribute is emitted as-is
+CONVERTERS = {
+    'value': None,
+    'datetime': _isoformat,
+    'list': _or_empty_list,
+    'int': _or_zero,
+    'enum': _enum_value,
+}
+
+
+class Field:
+    """One output key: a column attribute plus a converter, or a computed value.
+
+    Computed fields pass ``compute`` (called with the model instance) and
+    list the columns it reads in ``requires`` so load_only still fetches them.
+    """
+
+    __slots__ = ('key', 'attr', 'kind', 'compute', 'requires')
+
+    def __init__(self, key, kind='value', attr=None, compute=None, requires=()):
+        self.key = key
+        self.kind = kind
+        self.attr = attr or key
+        self.compute = compute
+        self.requires = tuple(requires) if compute else (self.attr,)
+
+
+class FieldGroup:
+    """Fields shown only to privileged viewers, or when the row opts in via ``row_flag``"""
+
+    __slots__ = ('fields', 'row_flag', 'roles')
+
+    def __init__(self, fields, row_flag=None, roles=ADMIN_ROLES):
+        self.fields = fields
+        self.row_flag = row_flag
+        self.roles = roles
+
+
+class CompiledSerializer:
+    """A ModelSerializer specialised for one viewer role: flat tuples, no branching on the role.
+
+    Loaded column values are read straight from the instance ``__dict__``,
+    skipping the instrumented attribute descriptors that dominate to_dict().
+    """
+
+    def __init__(self, model, always, conditional, columns):
+        self.model = model
+        self._always = always
+        self._conditional = conditional
+        self.columns = columns
+
+    def load_only(self, *extra_columns):
+        """Query option restricting the SELECT to the columns this serialiser reads"""
+        names = set(self.columns) | {c.key for c in extra_columns}
+        return load_only(*(getattr(self.model, name) for name in sorted(names)))
+
+    @staticmethod
+    def _fill(data, obj, values, plan):
+        plain, converted, computed = plan
+        for key, attr in plain:
+            data[key] = values[attr] if attr in values else getattr(obj, attr)
+        for key, attr, convert in converted:
+            data[key] = convert(values[attr] if attr in values else getattr(obj, attr))
+        for key, compute in computed:
+            data[key] = compute(obj)
+
+    def __call__(self, obj):
+        data = {}
+        values = obj.__dict__
+        self._fill(data, obj, values, self._always)
+        for flag, plan in self._conditional:
+            if values[flag] if flag in values else getattr(obj, flag):
+                self._fill(data, obj, values, plan)
+        return data
+
+    def many(self, objs):
+        return [self(obj) for obj in objs]
+
+
+class ModelSerializer:
+    """Schema-driven replacement for a model's to_dict().
+
+    The schema is compiled once per viewer role into a CompiledSerializer
+    that knows exactly which columns it reads, so list endpoints can pass
+    its load_only() option to the query.
+    """
+
+    def __init__(self, model, fields, groups=()):
+        self.model = model
+        self.fields = fields
+        self.groups = groups
+        self.keys = frozenset(f.key for f in fields) | frozenset(f.key for g in groups for f in g.fields)
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def compile(self, viewer_role=None, include_private=False, only=None):
+        """Return the serialiser for a viewer, optionally restricted to the ``only`` keys"""
+        cache_key = (viewer_role, include_private, only)
+        compiled = self._compiled.get(cache_key)
+        if compiled is None:
+            compiled = self._build(viewer_role, include_private, only)
+            # Sparse fieldsets are client-chosen, so bound how many we keep
+            if len(self._compiled) < MAX_COMPILED_VARIANTS:
+                with self._lock:
+                    compiled = self._compiled.setdefault(cache_key, compiled)
+        return compiled
+
+    def _build(self, viewer_role, include_private, only):
+        def select(fields):
+            return [f for f in fields if only is None or f.key in only]
+
+        always = select(self.fields)
+        conditional = []
+        columns = set()
+
+        for group in self.groups:
+            fields = select(group.fields)
+            if not fields:
+                continue
+            if include_private or viewer_role in group.roles:
+                always.extend(fields)
+            elif group.row_flag:
+                conditional.append((group.row_flag, self._plan(fields, columns)))
+                columns.add(group.row_flag)
+
+        return CompiledSerializer(
+            self.model,
+            self._plan(always, columns),
+            tuple(conditional),
+            frozenset(columns)
+        )
+
+    @staticmethod
+    def _plan(fields, columns):
+        plain, converted, computed = [], [], []
+        for field in fields:
+            columns.update(field.requires)
+            if field.compute:
+                computed.append((field.key, field.compute))
+            elif CONVERTERS[field.kind] is None:
+                plain.append((field.key, field.attr))
+            else:
+                converted.append((field.key, field.attr, CONVERTERS[field.kind]))
+        return tuple(plain), tuple(converted), tuple(computed)
+
+
+class InvalidFields(ValueError):
+    """Raised when ?fields= names something the endpoint does not return"""
+
+
+class FieldSelection:
+    """A parsed ``?fields=`` sparse fieldset.
+
+    ``only`` is the set of the model's own keys to emit (None for all of
+    them); ``id`` is always kept. Related objects and endpoint-computed keys
+    are selected by name, and related objects accept dotted names such as
+    ``author.full_name`` to trim the nested dict too.
+    """
+
+    def __init__(self, only=None, nested=None, extras=None):
+        self.only = only
+        self._nested = nested      # relation -> frozenset of keys or None; None means all relations
+        self._extras = extras      # requested endpoint keys; None means all
+
+    @classmethod
+    def parse(cls, value, serializer, relations=None, extras=()):
+        """Parse a comma separated ``fields`` value against what the endpoint can return.
+
+        ``relations`` maps nested keys (e.g. ``author``) to their ModelSerializer.
+        """
+        relations = relations or {}
+        names = [name.strip() for name in (value or '').split(',') if name.strip()]
+        if not names:
+            return cls()
+
+        own, nested, wanted_extras = {'id'}, {}, set()
+        for name in names:
+            relation, _, key = name.partition('.')
+            if key:
+                if relation not in relations or key not in relations[relation].keys:
+                    raise InvalidFields(f'Unknown field: {name}')
+                if nested.get(relation, set()) is not None:
+                    nested.setdefault(relation, {'id'}).add(key)
+            elif name in relations:
+                nested[name] = None
+            elif name in extras:
+                wanted_extras.add(name)
+            elif name in serializer.keys:
+                own.add(name)
+            else:
+                raise InvalidFields(f'Unknown field: {name}')
+
+        return cls(
+            frozenset(own),
+            {relation: frozenset(keys) if keys is not None else None for relation, keys in nested.items()},
+            frozenset(wanted_extras)
+        )
+
+    def wants(self, key):
+        """Whether an endpoint-computed key or a related object should be included"""
+        if self._extras is None and self._nested is None:
+            return True
+        return key in (self._extras or ()) or key in (self._nested or {})
+
+    def nested(self, relation):
+        """Key restriction for a related object's serialiser (None for every key)"""
+        return (self._nested or {}).get(relation)
+
+
+ALUMNI_SERIALIZER = ModelSerializer(Alumni, [
+    Field('id'), Field('user_id'), Field('alumni_id'),
+    Field('first_name'), Field('last_name'),
+    Field('full_name', compute=Alumni.get_full_name, requires=('first_name', 'last_name')),
+    Field('graduation_year'), Field('graduation_month'), Field('department'),
+    Field('degree_type'), Field('major'), Field('minor'), Field('honors'),
+    Field('years_since_graduation', compute=Alumni.get_years_since_graduation, requires=('graduation_year',)),
+    Field('location'), Field('bio'),
+    Field('skills', 'list'), Field('achievements', 'list'),
+    Field('is_mentor'), Field('mentor_categories', 'list'),
+    Field('is_seeking_opportunities'), Field('networking_interests', 'list'),
+    Field('profile_visibility'), Field('allow_messages'), Field('allow_job_offers'),
+    Field('profile_completeness', 'int'), Field('networking_score', 'int'),
+    Field('is_verified'), Field('profile_image'), Field('cover_image'),
+    Field('linkedin_url'), Field('personal_website'), Field('github_url'),
+    Field('created_at', 'datetime'), Field('updated_at', 'datetime'),
+    Field('last_profile_update', 'datetime'),
+], groups=[
+    FieldGroup([
+        Field('current_position'), Field('current_company'), Field('industry'),
+        Field('work_location'), Field('years_experience'),
+    ], row_flag='show_professional_info'),
+    FieldGroup([
+        Field('phone'), Field('personal_email'), Field('twitter_url'), Field('facebook_url'),
+    ], row_flag='show_contact_info'),
+    FieldGroup([Field('gpa')]),
+])
+
+USER_SERIALIZER = ModelSerializer(User, [
+    Field('id'), Field('username'), Field('email'), Field('institution_id'),
+    Field('role', 'enum'), Field('status', 'enum'),
+    Field('first_name'), Field('last_name'),
+    Field('full_name', compute=User.get_full_name, requires=('first_name', 'last_name', 'username')),
+    Field('phone'), Field('profile_image'), Field('is_email_verified'),
+    Field('last_login', 'datetime'), Field('login_count'), Field('last_active', 'datetime'),
+    Field('two_factor_enabled'), Field('account_activated_at', 'datetime'),
+    Field('created_at', 'datetime'), Field('updated_at', 'datetime'),
+], groups=[
+    # to_dict(include_sensitive=True) only; compile with include_private=True
+    FieldGroup([
+        Field('must_change_password'), Field('password_changed_at', 'datetime'),
+        Field('last_ip'), Field('invited_by'), Field('invite_token_id'),
+        Field('email_verification_sent_at', 'datetime'),
+    ], roles=()),
+])
+
+JOB_SERIALIZER = ModelSerializer(Job, [
+    Field('id'), Field('title'), Field('company'), Field('location'), Field('job_type'),
+    Field('salary_min'), Field('salary_max'), Field('description'), Field('requirements'),
+    Field('posted_by'), Field('application_deadline', 'datetime'), Field('is_remote'),
+    Field('status'), Field('created_at', 'datetime'), Field('updated_at', 'datetime'),
+])
+
+EVENT_SERIALIZER = ModelSerializer(Event, [
+    Field('id'), Field('title'), Field('description'), Field('event_date', 'datetime'),
+    Field('location'), Field('is_virtual'), Field('virtual_link'), Field('max_attendees'),
+    Field('registration_deadline', 'datetime'), Field('organizer_id'), Field('event_type'),
+    Field('status'), Field('registration_count', 'int'),
+    Field('created_at', 'datetime'), Field('updated_at', 'datetime'),
+])
+
+FORUM_POST_SERIALIZER = ModelSerializer(ForumPost, [
+    Field('id'), Field('author_id'), Field('title'), Field('content'), Field('category'),
+    Field('likes_count'), Field('replies_count'),
+    Field('created_at', 'datetime'), Field('updated_at', 'datetime'),
+])
+
+MESSAGE_SERIALIZER = ModelSerializer(Message, [
+    Field('id'), Field('sender_id'), Field('recipient_id'), Field('subject'), Field('content'),
+    Field('is_read'), Field('message_type'), Field('created_at', 'datetime'),
+])
+
+
+class FastJSONProvider(TimedJSONProvider):
+    """JSON provider that encodes with orjson when it is installed.
+
+    Output matches the stdlib provider: datetimes and other non-JSON types
+    are still handed to Flask's ``default`` hook, keys are sorted, and
+    anything orjson rejects (e.g. integers beyond 64 bits) falls back to the
+    stdlib encoder.
+    """
+
+    def _orjson_options(self, kwargs):
+        if not ORJSON_AVAILABLE or set(kwargs) - {'indent', 'separators'}:
+            return None
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def _encode(self, obj, **kwargs):
+        option = self._orjson_options(kwargs)
+        if option is not None:
+            try:
+                return orjson.dumps(obj, default=self.default, option=option)
+            except (TypeError, orjson.JSONEncodeError):
+                pass
+        return super(TimedJSONProvider, self).dumps(obj, **kwargs).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        with serialization_timer():
+            return self._encode(obj, **kwargs).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        dump_args = {}
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            dump_args['indent'] = 2
+        else:
+            dump_args['separators'] = (',', ':')
+
+        # Build the body as bytes directly, skipping the str round trip
+        with serialization_timer():
+            body = self._encode(obj, **dump_args) + b'\n'
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def init_serializers(app):
+    """Use the fast JSON provider for ``app``; must run before init_metrics"""
+    app.json = FastJSONProvider(app)
+    if not ORJSON_AVAILABLE:
+        logger.info("orjson not installed, JSON responses use the standard library encoder")
@@ -0,0 +1,413 @@
+import atexit
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import and_, func, or_, update
+from src.models.user import db
+from src.models.background_task import BackgroundTask
+from src.utils.metrics import LATENCY_BUCKETS, Counter, Histogram, metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+DEFAULT_POLL_SECONDS = 2
+# A running task whose lease is not renewed within this long (its worker
+# died) is handed to the next worker that asks for work
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 5
+# Retry delay after the first failure; doubles per attempt up to MAX_BACKOFF_SECONDS
+DEFAULT_BACKOFF_SECONDS = 30
+MAX_BACKOFF_SECONDS = 3600
+# Ceiling for a worker's pause after it failed to record a task's outcome
+MAX_WORKER_BACKOFF_SECONDS = 60
+# Due tasks looked at per claim; workers racing for the first one fall through to the next
+CLAIM_CANDIDATES = 5
+# Finished tasks kept for the admin view and timings
+DEFAULT_RETENTION_DAYS = 7
+
+TASK_DURATION_BUCKETS = LATENCY_BUCKETS + (30.0, 60.0, 300.0, 900.0, 3600.0)
+
+# kind -> (handler, on_failure); filled in by @task_handler where the work is defined
+TASK_HANDLERS = {}
+
+
+def task_handler(kind, on_failure=None):
+    """Register the function that runs tasks of ``kind``.
+
+    The handler gets a ``TaskRun``. Raising marks the attempt failed; the
+    task is retried with backoff until it runs out of attempts, and then
+    ``on_failure(payload, error)`` is called once.
+    """
+    def decorator(handler):
+        TASK_HANDLERS[kind] = (handler, on_failure)
+        return handler
+    return decorator
+
+
+class LeaseLost(Exception):
+    """The task's lease expired and another worker took it over"""
+
+
+class TaskRun:
+    """What a handler sees of the task it is running"""
+
+    def __init__(self, queue, task, worker_id):
+        self.queue = queue
+        self.task_id = task.id
+        self.kind = task.kind
+        self.payload = task.payload or {}
+        self.attempt = task.attempts
+        self.worker_id = worker_id
+
+    def heartbeat(self, progress=None):
+        """Renew the lease; call between units of work in long-running handlers.
+
+        ``progress`` is merged into the task's payload in the same update,
+        so a worker that takes the task over can skip work already done.
+        Commits the session. Raises ``LeaseLost`` when another worker has
+        taken the task over, so the handler stops instead of racing it.
+        """
+        payload = None
+        if progress:
+            payload = {**self.payload, **progress}
+        if not self.queue.extend_lease(self.task_id, self.worker_id, payload):
+            raise LeaseLost(f"Task {self.task_id} is no longer leased by {self.worker_id}")
+        if payload is not None:
+            self.payload = payload
+
+
+def _claimable(now):
+    return or_(
+        and_(BackgroundTask.status == 'queued', BackgroundTask.run_after <= now),
+        and_(BackgroundTask.status == 'running', BackgroundTask.leased_until < now)
+    )
+
+
+class TaskQueue:
+    """Durable work queue in the ``background_tasks`` table.
+
+    ``enqueue`` adds a task to the caller's transaction, so it exists
+    exactly when the rows it refers to do. Workers claim due tasks with a
+    compare-and-set UPDATE, which is safe across threads, processes and
+    hosts sharing the database, and hold a lease while they run.
+
+    ``mode`` decides who runs tasks: 'threads' starts ``workers`` threads
+    in each web process on its first request; 'inline' runs due tasks in
+    the request that enqueued them (Vercel freezes idle processes, so
+    background threads cannot be relied on there); 'external' leaves
+    everything to ``flask run-tasks``.
+    """
+
+    def __init__(self, app=None, mode='threads', workers=DEFAULT_WORKERS, poll_interval=DEFAULT_POLL_SECONDS,
+                 lease_seconds=DEFAULT_LEASE_SECONDS, backoff_seconds=DEFAULT_BACKOFF_SECONDS):
+        self.app = app
+        self.mode = mode
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.backoff_seconds = backoff_seconds
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._worker_prefix = f'{socket.gethostname()}:{os.getpid()}'
+
+        self.duration = Histogram(
+            'background_task_duration_seconds', 'Run time of one background task attempt by kind',
+            TASK_DURATION_BUCKETS, label_names=('kind',)
+        )
+        self.outcomes = Counter(
+            'background_tasks_total', 'Background task attempts by kind and outcome', ('kind', 'outcome')
+        )
+
+    def worker_id(self, name):
+        return f'{self._worker_prefix}:{name}'
+
+    def enqueue(self, kind, payload=None, max_attempts=DEFAULT_MAX_ATTEMPTS, delay=0):
+        """Add a task to the session; it is queued when the caller commits. Call ``notify`` after that."""
+        task = BackgroundTask(
+            kind=kind,
+            payload=payload or {},
+            status='queued',
+            attempts=0,
+            max_attempts=max_attempts,
+            run_after=datetime.utcnow() + timedelta(seconds=delay)
+        )
+        db.session.add(task)
+        return task
+
+    def notify(self):
+        """Tell the workers that new tasks were committed"""
+        if self.mode == 'inline':
+            self.run_pending()
+        elif self.mode == 'threads':
+            self.start()
+            self._wake.set()
+
+    def run_pending(self):
+        """Run every due task in the calling thread; returns how many ran"""
+        return self.work(self.worker_id('inline'), once=True)
+
+    def claim(self, worker_id):
+        """Lease the next due task to ``worker_id``; None when nothing is due"""
+        now = datetime.utcnow()
+        candidates = [
+            task_id for (task_id,) in
+            db.session.query(BackgroundTask.id).filter(_claimable(now))
+            .order_by(BackgroundTask.run_after, BackgroundTask.id).limit(CLAIM_CANDIDATES)
+        ]
+        for task_id in candidates:
+            # Only one worker's UPDATE can still see the task as claimable
+            claimed = db.session.execute(
+                update(BackgroundTask)
+                .where(BackgroundTask.id == task_id, _claimable(now))
+                .values(
+                    status='running',
+                    attempts=BackgroundTask.attempts + 1,
+                    leased_by=worker_id,
+                    leased_until=now + timedelta(seconds=self.lease_seconds),
+                    started_at=now,
+                    finished_at=None
+                )
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return db.session.get(BackgroundTask, task_id)
+        db.session.commit()
+        return None
+
+    def extend_lease(self, task_id, worker_id, payload=None):
+        values = {'leased_until': datetime.utcnow() + timedelta(seconds=self.lease_seconds)}
+        if payload is not None:
+            values['payload'] = payload
+        renewed = db.session.execute(
+            update(BackgroundTask)
+            .where(BackgroundTask.id == task_id, BackgroundTask.status == 'running',
+                   BackgroundTask.leased_by == worker_id)
+            .values(**values)
+        ).rowcount
+        db.session.commit()
+        return bool(renewed)
+
+    def backoff(self, attempts):
+        """Delay before retrying after ``attempts`` failed attempts, with jitter so retries spread out"""
+        delay = min(self.backoff_seconds * 2 ** max(attempts - 1, 0), MAX_BACKOFF_SECONDS)
+        return delay * random.uniform(0.8, 1.2)
+
+    def _finish(self, task_id, worker_id, **values):
+        # Only while we still hold the task; a worker that took it over owns the outcome
+        finished = db.session.execute(
+            update(BackgroundTask)
+            .where(BackgroundTask.id == task_id, BackgroundTask.status == 'running',
+                   BackgroundTask.leased_by == worker_id)
+            .values(leased_until=None, **values)
+        ).rowcount
+        db.session.commit()
+        return bool(finished)
+
+    def run(self, task, worker_id):
+        """Run one claimed task and record the outcome; returns it"""
+        task_id, kind, payload = task.id, task.kind, task.payload or {}
+        attempts, max_attempts = task.attempts, task.max_attempts
+        handler, on_failure = TASK_HANDLERS.get(kind, (None, None))
+        started = time.perf_counter()
+        error = None
+
+        if handler is None:
+            error = f"No handler registered for task kind '{kind}'"
+            attempts = max_attempts
+        elif attempts > max_attempts:
+            # Its workers kept dying mid-run (lease expiries count as attempts)
+            error = task.last_error or 'Worker lost the task too many times'
+        else:
+            try:
+                handler(TaskRun(self, task, worker_id))
+            except LeaseLost as e:
+                db.session.rollback()
+                logger.warning(str(e))
+                self.outcomes.inc(kind, 'lease_lost')
+                return 'lease_lost'
+            except Exception as e:
+                db.session.rollback()
+                error = f'{type(e).__name__}: {e}'
+                logger.exception(f"Task {task_id} ({kind}) attempt {attempts} failed")
+
+        elapsed = time.perf_counter() - started
+        now = datetime.utcnow()
+        if error is None:
+            outcome = 'succeeded'
+            self._finish(task_id, worker_id, status='succeeded', finished_at=now,
+                         duration_seconds=round(elapsed, 3), last_error=None)
+        elif attempts < max_attempts:
+            outcome = 'retried'
+            self._finish(task_id, worker_id, status='queued', last_error=error,
+                         run_after=now + timedelta(seconds=self.backoff(attempts)),
+                         duration_seconds=round(elapsed, 3))
+        else:
+            outcome = 'failed'
+            if self._finish(task_id, worker_id, status='failed', finished_at=now, last_error=error,
+                            duration_seconds=round(elapsed, 3)) and on_failure is not None:
+                try:
+                    on_failure(payload, error)
+                except Exception:
+                    db.session.rollback()
+                    logger.exception(f"on_failure for task {task_id} ({kind}) failed")
+
+        self.duration.observe(elapsed, kind)
+        self.outcomes.inc(kind, outcome)
+        return outcome
+
+    def work(self, worker_id, stop=None, once=False):
+        """Claim and run tasks until ``stop`` is set, or with ``once`` until none is due; returns how many ran"""
+        ran = errors = 0
+        while stop is None or not stop.is_set():
+            try:
+                task = self.claim(worker_id)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Task worker {worker_id} could not claim work: {e}")
+                task = None
+            if task is not None:
+                ran += 1
+                task_id = task.id
+                try:
+                    self.run(task, worker_id)
+                    errors = 0
+                except Exception:
+                    # Recording the outcome failed (database locked or gone); the
+                    # lease expires and hands the task back, so keep the worker alive
+                    db.session.rollback()
+                    errors += 1
+                    delay = min(self.poll_interval * 2 ** errors, MAX_WORKER_BACKOFF_SECONDS)
+                    logger.exception(f"Task worker {worker_id} failed running task {task_id}, retrying in {delay}s")
+                    if not once:
+                        (stop or self._stop).wait(delay)
+                continue
+            if once:
+                break
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+        return ran
+
+    def start(self):
+        """Start the worker threads (idempotent); only in 'threads' mode"""
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads or self.mode != 'threads' or self.app is None:
+                return
+            self._threads = [
+                threading.Thread(target=self._run, args=(self.worker_id(f'thread-{n}'),),
+                                 name=f'task-worker-{n}', daemon=True)
+                for n in range(self.workers)
+            ]
+        for thread in self._threads:
+            thread.start()
+        atexit.register(self.shutdown)
+
+    def _run(self, worker_id):
+        with self.app.app_context():
+            try:
+                self.work(worker_id, stop=self._stop)
+            finally:
+                db.session.remove()
+
+    def shutdown(self):
+        """Stop claiming new tasks; a task cut off mid-run is picked up again when its lease expires"""
+        self._stop.set()
+        self._wake.set()
+
+    def counts(self):
+        """{(kind, status): number of tasks}"""
+        return {
+            (kind, status): count for kind, status, count in
+            db.session.query(BackgroundTask.kind, BackgroundTask.status, func.count(BackgroundTask.id))
+            .group_by(BackgroundTask.kind, BackgroundTask.status)
+        }
+
+    def oldest_due_age(self):
+        """Seconds the longest-waiting due task has been waiting, 0 when none is"""
+        now = datetime.utcnow()
+        oldest = db.session.query(func.min(BackgroundTask.run_after)).filter(
+            BackgroundTask.status == 'queued', BackgroundTask.run_after <= now
+        ).scalar()
+        return round((now - oldest).total_seconds(), 1) if oldest else 0
+
+    def stats(self):
+        """Queue depth by kind and status, and run times over the last day"""
+        by_kind = {}
+        for (kind, status), count in self.counts().items():
+            by_kind.setdefault(kind, {})[status] = count
+
+        since = datetime.utcnow() - timedelta(days=1)
+        timings = {
+            kind: {'runs': runs, 'avg_seconds': round(avg, 3), 'max_seconds': round(longest, 3)}
+            for kind, runs, avg, longest in
+            db.session.query(BackgroundTask.kind, func.count(BackgroundTask.id),
+                             func.avg(BackgroundTask.duration_seconds), func.max(BackgroundTask.duration_seconds))
+            .filter(BackgroundTask.status == 'succeeded', BackgroundTask.finished_at >= since)
+            .group_by(BackgroundTask.kind)
+        }
+        return {
+            'mode': self.mode,
+            'workers': self.workers if self.mode == 'threads' else 0,
+            'queued': sum(kinds.get('queued', 0) for kinds in by_kind.values()),
+            'running': sum(kinds.get('running', 0) for kinds in by_kind.values()),
+            'oldest_queued_seconds': self.oldest_due_age(),
+            'by_kind': by_kind,
+            'timings_last_day': timings
+        }
+
+    def recent(self, limit=50, status=None):
+        query = BackgroundTask.query
+        if status:
+            query = query.filter_by(status=status)
+        return [task.to_dict() for task in query.order_by(BackgroundTask.id.desc()).limit(limit)]
+
+    def prune(self, days=DEFAULT_RETENTION_DAYS):
+        """Delete tasks that finished more than ``days`` ago; returns how many"""
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        deleted = BackgroundTask.query.filter(
+            BackgroundTask.status.in_(('succeeded', 'failed')), BackgroundTask.finished_at < cutoff
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
+
+
+def init_task_queue(app):
+    """Install the background task queue on ``app`` and publish its metrics"""
+    queue = TaskQueue(
+        app,
+        mode=app.config.get('TASK_QUEUE_MODE', 'threads'),
+        workers=app.config.get('TASK_WORKERS', DEFAULT_WORKERS),
+        poll_interval=app.config.get('TASK_POLL_SECONDS', DEFAULT_POLL_SECONDS),
+        lease_seconds=app.config.get('TASK_LEASE_SECONDS', DEFAULT_LEASE_SECONDS)
+    )
+    app.extensions['task_queue'] = queue
+
+    metrics.register(queue.duration)
+    metrics.register(queue.outcomes)
+    metrics.register_gauge(
+        'background_tasks', 'Background tasks by kind and status',
+        lambda: {(('kind', kind), ('status', status)): count for (kind, status), count in queue.counts().items()}
+    )
+    metrics.register_gauge('background_task_oldest_queued_seconds', 'Wait of the oldest due background task',
+                           queue.oldest_due_age)
+
+    # Web processes start their workers on the first request, so CLI
+    # commands (including `flask run-tasks` itself) never do
+    if queue.mode == 'threads':
+        app.before_request(queue.start)
+    return queue
+
+
+def get_task_queue():
+    """Return the task queue installed on the current app"""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('task_queue')
@@ -0,0 +1,108 @@
+import os
+import sys
+import uuid
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+# Make the ``src`` package importable, as app.py does for the deployed app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'load: throughput test, only run with RUN_LOAD_TESTS=1')
+
+
+def pytest_collection_modifyitems(config, items):
+    if os.environ.get('RUN_LOAD_TESTS'):
+        return
+    skip = pytest.mark.skip(reason='load test; set RUN_LOAD_TESTS=1 to run')
+    for item in items:
+        if 'load' in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """The real application, on a throwaway SQLite database.
+
+    src.index configures itself from the environment at import time, so the
+    environment is pointed at a scratch directory before it is imported.
+    """
+    scratch = tmp_path_factory.mktemp('app')
+    os.environ.pop('POSTGRES_URL', None)
+    os.environ['SQLITE_PATH'] = str(scratch / 'alumni.db')
+    os.environ['DONATION_QUEUE_PATH'] = str(scratch / 'donation_queue.db')
+    os.environ['IMPORT_UPLOAD_DIR'] = str(scratch / 'uploads')
+    os.environ['TASK_QUEUE_MODE'] = 'inline'
+    os.environ['ACTIVITY_FLUSH_SECONDS'] = '0'
+
+    from src.index import app
+    app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def db(app):
+    from src.models.user import db
+    with app.app_context():
+        yield db
+        db.session.remove()
+
+
+@pytest.fixture
+def make_user(db):
+    """Create and commit an active user; ``alumni=True`` also gives it a profile"""
+    from src.models.alumni import Alumni
+    from src.models.user import User, UserRole, UserStatus
+
+    def make_user(alumni=False, role=UserRole.ALUMNI):
+        key = uuid.uuid4().hex[:12]
+        user = User(
+            username=f'user_{key}', email=f'user_{key}@example.edu',
+            role=role, status=UserStatus.ACTIVE, first_name='First', last_name=f'Last{key}'
+        )
+        db.session.add(user)
+        db.session.flush()
+        if alumni:
+            db.session.add(Alumni(
+                user_id=user.id, first_name=user.first_name, last_name=user.last_name,
+                graduation_year=2015, department='Engineering'
+            ))
+        db.session.commit()
+        return user
+
+    return make_user
+
+
+@pytest.fixture
+def client_as(app):
+    """Test client logged in as ``user``"""
+    def client_as(user, user_type='alumni'):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = user.id
+            session['user_type'] = user_type
+        return client
+
+    return client_as
+
+
+@pytest.fixture
+def count_queries(db):
+    """``with count_queries() as queries:`` counts the SQL statements run inside the block"""
+    @contextmanager
+    def count_queries():
+        queries = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            queries.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            yield queries
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+    return count_queries
@@ -0,0 +1,45 @@
+"""A failed donation batch parks bad rows and keeps the rest for retry"""
+import uuid
+from datetime import datetime
+
+from sqlalchemy.exc import OperationalError
+
+from src.utils import donation_queue
+from src.utils.donation_queue import DonationQueue
+
+
+def _payload(donor_id, **fields):
+    payload = {
+        'donor_id': donor_id, 'campaign_id': None, 'amount': 10.0, 'payment_method': 'credit_card',
+        'transaction_id': f'queue-{uuid.uuid4().hex}', 'donated_at': datetime.utcnow().isoformat()
+    }
+    payload.update(fields)
+    return payload
+
+
+def test_a_lone_bad_donation_is_parked(app, db, make_user, tmp_path):
+    queue = DonationQueue(str(tmp_path / 'donation_queue.db'), app, flush_interval=60)
+    queue.enqueue(_payload(make_user().id, amount=None))
+
+    assert queue.flush() == 0
+    assert queue.parked == 1
+    assert queue.depth == 0
+
+
+def test_an_outage_releases_the_batch_for_retry(app, db, make_user, tmp_path, monkeypatch):
+    queue = DonationQueue(str(tmp_path / 'donation_queue.db'), app, flush_interval=60)
+    donor_id = make_user().id
+    for _ in range(3):
+        queue.enqueue(_payload(donor_id))
+
+    def unreachable(payloads):
+        raise OperationalError('INSERT INTO donation', {}, Exception('could not connect to server'))
+
+    with monkeypatch.context() as patch:
+        patch.setattr(donation_queue, 'ingest_donations', unreachable)
+        assert queue.flush() == 0
+    assert queue.parked == 0
+    assert queue.depth == 3
+
+    assert queue.flush() == 3
+    assert queue.depth == 0
@@ -0,0 +1,115 @@
+"""Concurrent donations through /api/donate must all land, exactly once"""
+import threading
+import time
+import uuid
+
+import pytest
+
+from src.models.donation import Donation, DonationCampaign
+from src.utils.dashboard_stats import donation_totals
+from src.utils.donation_queue import DonationQueue
+
+THREADS = 16
+DONATIONS_PER_THREAD = 15
+# Every RETRY_EVERY-th donation is sent twice with the same transaction_id
+RETRY_EVERY = 5
+
+# The rate /donate has to sustain, in donations per second
+TARGET_RATE = 500
+LOAD_THREADS = 32
+LOAD_DONATIONS_PER_THREAD = 150
+
+
+def _campaign(db):
+    campaign = DonationCampaign(title=f'Campaign {uuid.uuid4().hex[:8]}', goal_amount=1e9, current_amount=50.0)
+    db.session.add(campaign)
+    db.session.commit()
+    return campaign.id
+
+
+def _donate_concurrently(clients, campaign_id, per_thread):
+    """POST ``per_thread`` donations from each client, all threads released
+    together; returns (expected total, status codes, seconds taken)"""
+    barrier = threading.Barrier(len(clients) + 1)
+    statuses = [[] for _ in clients]
+    expected = [0.0 for _ in clients]
+
+    def donate(position, client):
+        barrier.wait()
+        for n in range(per_thread):
+            # Whole amounts, so the float sums below are exact
+            donation = {
+                'campaign_id': campaign_id, 'amount': float(1 + (position + n) % 9),
+                'transaction_id': f'{campaign_id}-{position}-{n}'
+            }
+            statuses[position].append(client.post('/api/donate', json=donation).status_code)
+            if n % RETRY_EVERY == 0:
+                statuses[position].append(client.post('/api/donate', json=donation).status_code)
+            expected[position] += donation['amount']
+
+    threads = [threading.Thread(target=donate, args=(position, client)) for position, client in enumerate(clients)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return sum(expected), [status for per_client in statuses for status in per_client], time.perf_counter() - started
+
+
+def _assert_exact(db, campaign_id, expected, count, totals_before):
+    db.session.expire_all()
+    donations = Donation.query.filter_by(campaign_id=campaign_id)
+    assert donations.count() == count
+    assert sum(donation.amount for donation in donations) == expected
+    assert db.session.get(DonationCampaign, campaign_id).current_amount == 50.0 + expected
+    totals = donation_totals()
+    assert totals['completed_donations'] - totals_before['completed_donations'] == count
+    assert totals['total_donations'] == pytest.approx(totals_before['total_donations'] + expected)
+
+
+def test_concurrent_donations_are_counted_exactly_once(db, make_user, client_as):
+    campaign_id = _campaign(db)
+    clients = [client_as(make_user()) for _ in range(THREADS)]
+    totals_before = donation_totals()
+
+    expected, statuses, _ = _donate_concurrently(clients, campaign_id, DONATIONS_PER_THREAD)
+
+    count = THREADS * DONATIONS_PER_THREAD
+    assert statuses.count(201) == count
+    assert statuses.count(200) == len(statuses) - count  # the retries
+    _assert_exact(db, campaign_id, expected, count, totals_before)
+
+
+def test_buffered_donations_are_counted_exactly_once(app, db, make_user, client_as, tmp_path, monkeypatch):
+    queue = DonationQueue(str(tmp_path / 'donation_queue.db'), app, batch_size=50, flush_interval=60)
+    monkeypatch.setitem(app.extensions, 'donation_queue', queue)
+    campaign_id = _campaign(db)
+    clients = [client_as(make_user()) for _ in range(THREADS)]
+    totals_before = donation_totals()
+
+    expected, statuses, _ = _donate_concurrently(clients, campaign_id, DONATIONS_PER_THREAD)
+    queue.flush()
+
+    count = THREADS * DONATIONS_PER_THREAD
+    assert statuses.count(202) == count
+    assert queue.depth == 0 and queue.parked == 0
+    _assert_exact(db, campaign_id, expected, count, totals_before)
+
+
+@pytest.mark.load
+def test_donate_sustains_target_rate(db, make_user, client_as):
+    campaign_id = _campaign(db)
+    clients = [client_as(make_user()) for _ in range(LOAD_THREADS)]
+    totals_before = donation_totals()
+
+    expected, statuses, seconds = _donate_concurrently(clients, campaign_id, LOAD_DONATIONS_PER_THREAD)
+
+    rate = len(statuses) / seconds
+    print(f'{len(statuses)} requests in {seconds:.2f}s: {rate:.0f}/s')
+    _assert_exact(db, campaign_id, expected, LOAD_THREADS * LOAD_DONATIONS_PER_THREAD, totals_before)
+    assert rate >= TARGET_RATE
+
+
+def test_add_to_total_reports_missing_campaign(db):
+    assert DonationCampaign.add_to_total(-1, 10.0) is False
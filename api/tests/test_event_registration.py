@@ -0,0 +1,42 @@
+"""Concurrent registrations must never oversell an event"""
+import threading
+from datetime import datetime, timedelta
+
+from src.models.event import Event, EventRegistration
+
+CAPACITY = 5
+ATTENDEES = 200
+
+
+def test_concurrent_registrations_do_not_exceed_capacity(db, make_user, client_as):
+    organizer = make_user()
+    event = Event(
+        title='Reunion', event_date=datetime.utcnow() + timedelta(days=30),
+        max_attendees=CAPACITY, organizer_id=organizer.id
+    )
+    db.session.add(event)
+    db.session.commit()
+    url = f'/api/events/{event.id}/register'
+    clients = [client_as(make_user()) for _ in range(ATTENDEES)]
+
+    # Every attendee is released at once, so the requests really contend
+    barrier = threading.Barrier(ATTENDEES)
+    statuses = [None] * ATTENDEES
+
+    def register(position, client):
+        barrier.wait()
+        statuses[position] = client.post(url).status_code
+
+    threads = [threading.Thread(target=register, args=(position, client)) for position, client in enumerate(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [201] * ATTENDEES
+    db.session.expire_all()
+    registered = EventRegistration.query.filter_by(event_id=event.id, status='registered').count()
+    waitlisted = EventRegistration.query.filter_by(event_id=event.id, status='waitlisted').count()
+    assert registered == CAPACITY
+    assert waitlisted == ATTENDEES - CAPACITY
+    assert db.session.get(Event, event.id).registration_count == registered
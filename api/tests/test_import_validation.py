@@ -0,0 +1,80 @@
+"""The columnar validator must accept and reject exactly what the row path does"""
+import io
+
+import pytest
+
+# The columnar path only exists with pandas; openpyxl builds the .xlsx fixtures
+pytest.importorskip('pandas')
+openpyxl = pytest.importorskip('openpyxl')
+
+from src.routes import data_import
+from src.utils.import_readers import CSVRowReader, ExcelRowReader
+
+HEADER = ['first_name', 'last_name', 'email', 'graduation_year', 'department', 'graduation_month', 'skills']
+
+# graduation_year / graduation_month cells as they appear in uploads
+CELLS = [
+    ('2015', '6'),
+    ('+2015', '-1'),
+    (' 2015 ', ''),
+    ('2015.0', '6'),
+    ('2015.', '6.0'),
+    ('2015.5', '6'),
+    ('1e3', '6'),
+    ('twenty', 'June'),
+    ('', ''),
+    ('1850', '6'),
+    ('3000', '6'),
+]
+
+
+def _rows(cells):
+    return [
+        [f'First{i}', f'Last{i}', f'person{i}@example.edu', year, 'Engineering', month, 'python, sql']
+        for i, (year, month) in enumerate(cells)
+    ]
+
+
+def _csv(rows):
+    text = io.StringIO()
+    for row in [HEADER] + rows:
+        text.write(','.join(f'"{cell}"' for cell in row) + '\n')
+    return io.BytesIO(text.getvalue().encode('utf-8'))
+
+
+def _xlsx(rows):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append(row)
+    stream = io.BytesIO()
+    workbook.save(stream)
+    stream.seek(0)
+    return stream
+
+
+def _both_paths(open_reader, monkeypatch):
+    # A fresh reader per path: pandas closes the stream when it is done with it
+    columnar = data_import.clean_and_validate_data(next(open_reader().frames(1000)), 'alumni')
+    with monkeypatch.context() as patch:
+        patch.setattr(data_import, 'PANDAS_AVAILABLE', False)
+        by_row = data_import.clean_and_validate_data(next(open_reader().chunks(1000)), 'alumni')
+    return columnar, by_row
+
+
+def test_csv_integer_cells_match_row_path(monkeypatch):
+    columnar, by_row = _both_paths(lambda: CSVRowReader(_csv(_rows(CELLS))), monkeypatch)
+
+    assert columnar == by_row
+    cleaned, errors = columnar
+    assert [record['graduation_year'] for record in cleaned] == [2015, 2015, 2015]
+    assert {'Graduation year must be a valid number'} <= {error for record in errors for error in record['errors']}
+
+
+@pytest.mark.parametrize('year, month', [(2015, 6), (2015.0, 6.0), ('2015', '6'), ('2015.0', 6)])
+def test_excel_integer_cells_match_row_path(year, month, monkeypatch):
+    rows = _rows([(year, month)])
+    columnar, by_row = _both_paths(lambda: ExcelRowReader(_xlsx(rows)), monkeypatch)
+
+    assert columnar == by_row
@@ -0,0 +1,39 @@
+"""Query-count regression test: the jobs listing must not run queries per job"""
+import uuid
+
+from src.models.job import Job, JobApplication
+
+
+def _post_jobs(db, make_user, viewer, job_type, count):
+    for n in range(count):
+        poster = make_user(alumni=True)
+        job = Job(title=f'Job {n}', company='Acme', job_type=job_type, posted_by=poster.id, status='active')
+        db.session.add(job)
+        db.session.flush()
+        db.session.add(JobApplication(job_id=job.id, applicant_id=make_user().id))
+        if n % 2:
+            db.session.add(JobApplication(job_id=job.id, applicant_id=viewer.id))
+    db.session.commit()
+
+
+def _list_jobs(client, count_queries, job_type):
+    with count_queries() as queries:
+        response = client.get(f'/api/jobs?job_type={job_type}&limit=50')
+    assert response.status_code == 200
+    return response.get_json()['jobs'], len(queries)
+
+
+def test_jobs_listing_query_count_does_not_grow_with_page_size(db, make_user, client_as, count_queries):
+    viewer = make_user(alumni=True)
+    client = client_as(viewer)
+    counts = {}
+    for size in (2, 20):
+        job_type = f'qc-{uuid.uuid4().hex[:8]}'
+        _post_jobs(db, make_user, viewer, job_type, size)
+        jobs, counts[size] = _list_jobs(client, count_queries, job_type)
+
+        assert len(jobs) == size
+        assert all(job['posted_by_user'] and job['posted_by_alumni'] for job in jobs)
+        assert all(job['application_count'] == 1 + (job['user_applied'] is True) for job in jobs)
+
+    assert counts[20] == counts[2], f'jobs listing ran {counts[2]} queries for 2 jobs but {counts[20]} for 20'
@@ -0,0 +1,87 @@
+"""Databases created before a model change are brought up to date on startup"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateTable
+
+from src.models.event import Event, EventRegistration
+from src.utils.schema_upgrades import upgrade_schema
+
+
+def _schema(db):
+    inspector = inspect(db.engine)
+    columns = {column['name'] for column in inspector.get_columns('event')}
+    indexes = {index['name'] for index in inspector.get_indexes('event_registration')}
+    return columns, indexes
+
+
+def _legacy_registrations(db):
+    """Rebuild event_registration as it was created before its constraint and index"""
+    ddl = str(CreateTable(EventRegistration.__table__).compile(db.engine))
+    ddl = '\n'.join(line for line in ddl.splitlines() if 'uq_event_registration_user' not in line)
+    db.session.execute(text('ALTER TABLE event_registration RENAME TO event_registration_old'))
+    db.session.execute(text(ddl))
+    db.session.execute(text('INSERT INTO event_registration SELECT * FROM event_registration_old'))
+    db.session.execute(text('DROP TABLE event_registration_old'))
+
+
+def test_missing_event_columns_and_indexes_are_added_and_backfilled(db, make_user):
+    organizer, attendee, other = make_user(), make_user(), make_user()
+    event = Event(title='Homecoming', event_date=datetime.utcnow() + timedelta(days=7), organizer_id=organizer.id)
+    db.session.add(event)
+    db.session.flush()
+    db.session.add_all([
+        EventRegistration(event_id=event.id, user_id=attendee.id, status='registered'),
+        EventRegistration(event_id=event.id, user_id=other.id, status='waitlisted'),
+    ])
+    db.session.commit()
+    event_id = event.id
+
+    # The schema as it was before registration_count and its indexes
+    _legacy_registrations(db)
+    db.session.execute(text('ALTER TABLE event DROP COLUMN registration_count'))
+    db.session.commit()
+    db.session.expire_all()
+
+    # A duplicate from before the constraint keeps it from being created
+    db.session.execute(text(
+        "INSERT INTO event_registration (event_id, user_id, status) VALUES (:event_id, :user_id, 'registered')"
+    ), {'event_id': event_id, 'user_id': attendee.id})
+    db.session.commit()
+
+    assert upgrade_schema() == ['event.registration_count', 'ix_event_registration_event_status']
+    columns, indexes = _schema(db)
+    assert 'registration_count' in columns
+    assert 'uq_event_registration_user' not in indexes
+    assert db.session.get(Event, event_id).registration_count == 2
+
+    # Once the duplicate is gone the next startup adds the constraint
+    duplicate = EventRegistration.query.filter_by(event_id=event_id, user_id=attendee.id) \
+        .order_by(EventRegistration.id.desc()).first()
+    db.session.delete(duplicate)
+    db.session.commit()
+    assert upgrade_schema() == ['uq_event_registration_user']
+    assert upgrade_schema() == []
+    assert Event.reconcile_registration_counts() == 1
+    assert db.session.get(Event, event_id).registration_count == 1
+
+
+def test_missing_networking_score_is_added_and_scored(db, make_user):
+    from src.models.alumni import Alumni
+
+    user = make_user(alumni=True)
+    alumni_id = Alumni.query.filter_by(user_id=user.id).one().id
+    db.session.execute(text('DROP INDEX ix_alumni_networking_score'))
+    db.session.execute(text('DROP INDEX ix_alumni_mentor_networking_score'))
+    db.session.execute(text('ALTER TABLE alumni DROP COLUMN networking_score'))
+    db.session.execute(text("UPDATE alumni SET is_mentor = 1, linkedin_url = 'https://linkedin.example' WHERE id = :id"),
+                       {'id': alumni_id})
+    db.session.commit()
+    db.session.expire_all()
+
+    assert upgrade_schema() == [
+        'alumni.networking_score', 'ix_alumni_networking_score', 'ix_alumni_mentor_networking_score'
+    ]
+    alumni = db.session.get(Alumni, alumni_id)
+    assert alumni.networking_score == alumni.get_networking_score() > 0
+    assert upgrade_schema() == []
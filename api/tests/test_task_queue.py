@@ -0,0 +1,60 @@
+"""A worker survives a database error while recording a task's outcome"""
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from src.models.background_task import BackgroundTask
+from src.utils.task_queue import TaskQueue, task_handler
+
+ran = []
+
+
+@task_handler('test_record_outcome')
+def record_outcome_task(run):
+    ran.append(run.task_id)
+
+
+def test_worker_keeps_running_when_finishing_a_task_fails(app, db, monkeypatch):
+    queue = TaskQueue(app, mode='external', poll_interval=0.05, lease_seconds=1)
+    tasks = [queue.enqueue('test_record_outcome') for _ in range(2)]
+    db.session.commit()
+    task_ids = [task.id for task in tasks]
+
+    finish = queue._finish
+    failures = []
+
+    def locked_once(task_id, worker_id, **values):
+        if not failures:
+            failures.append(task_id)
+            raise OperationalError('UPDATE background_tasks', {}, Exception('database is locked'))
+        return finish(task_id, worker_id, **values)
+
+    monkeypatch.setattr(queue, '_finish', locked_once)
+    stop = threading.Event()
+
+    def work():
+        with app.app_context():
+            try:
+                queue.work(queue.worker_id('test'), stop=stop)
+            finally:
+                db.session.remove()
+
+    worker = threading.Thread(target=work, daemon=True)
+    worker.start()
+    try:
+        deadline = time.monotonic() + 15
+        while time.monotonic() < deadline:
+            db.session.expire_all()
+            statuses = [db.session.get(BackgroundTask, task_id).status for task_id in task_ids]
+            if statuses == ['succeeded', 'succeeded']:
+                break
+            time.sleep(0.1)
+        assert worker.is_alive()
+    finally:
+        stop.set()
+        queue._wake.set()
+        worker.join(5)
+
+    assert failures
+    assert statuses == ['succeeded', 'succeeded']